@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Response
+from app.utils.metrics import registry
+
+router = APIRouter()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", tags=["metrics"])
+async def metrics():
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
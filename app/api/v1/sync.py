@@ -1,5 +1,6 @@
-from fastapi import APIRouter, HTTPException, status, Body, Request
+from fastapi import APIRouter, HTTPException, status, Body, Request, Response
 from app.services.sync_manager import SyncManager
+from app.services.queue import QueueFullError
 from app.services.config_manager import ConfigService
 from app.core.logger import logger
 from app.models.config import ConfigOverride
@@ -8,8 +9,9 @@ from typing import Literal
 from app.services.poller import CommonCRMPoller
 from app.core.context import context
 from fastapi import Query
-from app.services.rules_engine import RulesEngine
+from app.services.rules_registry import rules_registry
 from app.services.status import status_tracker
+from app.utils.tracing import tracer, StageSummaryExporter
 from app.helpers import sqlite_to_salesforce_bidirectional_sync
 
 router = APIRouter()
@@ -31,6 +33,9 @@ async def sync_record(request: SyncRequest):
         logger.info(f"Received sync request: {request}")
         await sync_manager.enqueue_sync(request.crm, request.dict())
         return {"message": "Sync request accepted"}
+    except QueueFullError as e:
+        logger.warning(f"Rejecting sync request, queue full: {e}")
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
     except Exception as e:
         logger.exception("Error accepting sync request")
         raise HTTPException(status_code=500, detail=str(e))
@@ -61,6 +66,14 @@ async def get_sync_status():
     return status_tracker.get_status()
 
 
+@router.get("/traces/summary")
+async def get_trace_summary():
+    summary = tracer.exporter(StageSummaryExporter)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Enable the summary exporter under [tracing] in config.ini")
+    return summary.summary()
+
+
 @router.get("/status/{record_id}")
 async def get_status(record_id: str):
     try:
@@ -83,12 +96,16 @@ async def update_rules(request: Request):
 
 
 @router.get("/rules")
-async def get_rules():
+async def get_rules(request: Request):
     """
-    Returns the currently loaded rules.json config.
+    Returns the currently loaded rules.json config. Honours If-None-Match with the snapshot's ETag.
     """
-    rules_engine = RulesEngine()
-    return rules_engine.rules
+    snapshot = rules_registry.snapshot(sync_manager.rules.rules_path)
+    headers = {"ETag": snapshot.etag, "X-Rules-Version": str(snapshot.version)}
+    if_none_match = request.headers.get("if-none-match", "")
+    if snapshot.etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")) or if_none_match == "*":
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
 
 
 @router.post("/poll/{crm}")
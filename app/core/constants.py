@@ -3,4 +3,43 @@ DEFAULT_FLUSH_INTERVAL_SECONDS = 30
 DEFAULT_RATE_LIMIT_PER_MINUTE = 600
 DEFAULT_MAX_REQUESTS = 60
 DEFAULT_WINDOW_SIZE = 60
-
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_FSYNC_EVERY = 1000
+DEFAULT_READ_CHUNK_SIZE = 1024 * 1024
+DEFAULT_HTTP_MAX_CONNECTIONS = 100
+DEFAULT_HTTP_MAX_KEEPALIVE = 20
+DEFAULT_HTTP_KEEPALIVE_EXPIRY = 30.0
+DEFAULT_HTTP_TIMEOUT = 10.0
+DEFAULT_HTTP_CONNECT_TIMEOUT = 5.0
+DEFAULT_HTTP2 = False
+DEFAULT_PUSH_CONCURRENCY = 10
+DEFAULT_QUEUE_MAXSIZE = 10000
+DEFAULT_QUEUE_POLICY = "block"
+DEFAULT_QUEUE_MAX_ATTEMPTS = 3
+DEFAULT_QUEUE_RETRY_BACKOFF = 1.0
+DEFAULT_QUEUE_MAX_RETRY_BACKOFF = 60.0
+DEFAULT_SPILL_DIR = "data/spill"
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+DEFAULT_DURABLE_DIR = "data/wal"
+DEFAULT_REDIS_URL = "redis://localhost:6379/0"
+DEFAULT_REDIS_TIMEOUT = 0.5
+DEFAULT_REDIS_RETRY_INTERVAL = 5.0
+DEFAULT_VECTORIZE_MIN_ROWS = 4096
+DEFAULT_RULES_POLL_INTERVAL = 0.25
+DEFAULT_PUSH_WORKERS = 8
+DEFAULT_STATUS_STRIPES = 16
+DEFAULT_STATUS_MAX_ENTRIES = 1_000_000
+DEFAULT_STATUS_TTL = 86400
+DEFAULT_STATUS_SPILL_BATCH = 1000
+DEFAULT_TRACE_SAMPLE_RATE = 0.01
+DEFAULT_TRACE_JSON_PATH = "logs/traces.jsonl"
+DEFAULT_TRACE_FLUSH_SPANS = 100
+DEFAULT_MOCK_CRM_URL = "http://127.0.0.1:8001"
+MOCK_CRM_URL_ENV = "MOCK_CRM_URL"
+DEFAULT_DEDUP_CAPACITY = 1_000_000
+DEFAULT_DEDUP_ERROR_RATE = 0.01
+DEFAULT_DEDUP_BATCH = 1000
+DEFAULT_DEDUP_CACHE = 500_000
+DEFAULT_PG_POOL_MIN = 1
+DEFAULT_PG_POOL_MAX = 10
+DEFAULT_PG_MAX_ROWS_PER_POLL = 50_000
@@ -5,6 +5,8 @@ from app.systems.postgres import PostgresSource
 from app.systems.file import FileSource, FileSink
 from app.core.logger import logger
 from app.crms.registry import crm_registry
+from app.core.constants import DEFAULT_PAGE_SIZE, DEFAULT_FSYNC_EVERY, DEFAULT_PG_POOL_MIN, DEFAULT_PG_POOL_MAX, \
+    DEFAULT_PG_MAX_ROWS_PER_POLL
 
 config = configparser.ConfigParser()
 config.read("config.ini")
@@ -22,7 +24,15 @@ def load_systems_from_config(path: str):
     if a_type == "sqlite_source":
         from_sys = SQLiteSource(
             db_path=system_a_conf["db_path"],
-            table_name=system_a_conf["table"]
+            table_name=system_a_conf["table"],
+            watermark_column=system_a_conf.get("watermark_column"),
+            page_size=system_a_conf.get("page_size", DEFAULT_PAGE_SIZE),
+            checkpoint_path=system_a_conf.get("checkpoint_path"),
+            max_rows_per_poll=system_a_conf.get("max_rows_per_poll"),
+            dedup_path=system_a_conf.get("dedup_path"),
+            version_column=system_a_conf.get("version_column"),
+            cdc=system_a_conf.get("cdc", False),
+            key_column=system_a_conf.get("key_column", "record_id")
         )
 
     elif a_type == "postgres_source":
@@ -32,10 +42,29 @@ def load_systems_from_config(path: str):
             raise Exception(f"Missing config for {section} in config.ini")
 
         dsn = config[section]["dsn"]
-        from_sys = PostgresSource(dsn=dsn, table=system_a_conf["table"])
+        from_sys = PostgresSource(
+            dsn=dsn,
+            table=system_a_conf["table"],
+            watermark_column=system_a_conf.get("watermark_column"),
+            key_column=system_a_conf.get("key_column", "record_id"),
+            page_size=system_a_conf.get("page_size", DEFAULT_PAGE_SIZE),
+            checkpoint_path=system_a_conf.get("checkpoint_path"),
+            max_rows_per_poll=system_a_conf.get("max_rows_per_poll", DEFAULT_PG_MAX_ROWS_PER_POLL),
+            notify_channel=system_a_conf.get("notify_channel"),
+            notify_trigger=system_a_conf.get("notify_trigger", False),
+            min_pool_size=int(config[section].get("min_pool_size", DEFAULT_PG_POOL_MIN)),
+            max_pool_size=int(config[section].get("max_pool_size", DEFAULT_PG_POOL_MAX))
+        )
 
     elif a_type == "file_source":
-        from_sys = FileSource(system_a_conf["path"])
+        from_sys = FileSource(
+            system_a_conf["path"],
+            format=system_a_conf.get("format"),
+            checkpoint_path=system_a_conf.get("checkpoint_path"),
+            max_records_per_poll=system_a_conf.get("max_records_per_poll"),
+            dedup_path=system_a_conf.get("dedup_path"),
+            version_field=system_a_conf.get("version_field")
+        )
 
     else:
         raise Exception(f"Unsupported system A type: {a_type}")
@@ -43,7 +72,12 @@ def load_systems_from_config(path: str):
     # --------- SYSTEM B (sink) ---------
     b_type = system_b_conf["type"]
     if b_type == "file_sink":
-        to_sys = FileSink(system_b_conf["path"])
+        to_sys = FileSink(
+            system_b_conf["path"],
+            format=system_b_conf.get("format"),
+            fsync_every=system_b_conf.get("fsync_every", DEFAULT_FSYNC_EVERY),
+            index_path=system_b_conf.get("index_path")
+        )
 
     elif b_type in crm_registry:
         crm_key = system_b_conf["crm_key"]
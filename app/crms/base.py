@@ -1,5 +1,65 @@
+import asyncio
+import os
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from abc import ABC, abstractmethod
-from typing import Dict
+from typing import Awaitable, Callable, Dict, List, Optional
+import httpx
+from app.crms.http import http_pool
+from app.core.config import ConfigManager
+from app.core.constants import DEFAULT_PUSH_CONCURRENCY, DEFAULT_MOCK_CRM_URL, MOCK_CRM_URL_ENV
+from app.core.logger import logger
+from app.models.record import PushResult
+
+# bulk endpoints answering with these are treated as unavailable
+BULK_UNSUPPORTED_STATUSES = (404, 405, 501)
+
+
+def mock_server_url() -> Optional[str]:
+    """
+    Base URL of the local mock CRM server: the MOCK_CRM_URL environment variable, or `[mock_crm] url`
+    when `[mock_crm] enabled = true` in config.ini.
+    """
+    url = os.environ.get(MOCK_CRM_URL_ENV)
+    if url:
+        return url.rstrip("/")
+    config = ConfigManager.get_instance()
+    if config.get("mock_crm", "enabled", fallback="false").lower() != "true":
+        return None
+    return config.get("mock_crm", "url", fallback=DEFAULT_MOCK_CRM_URL).rstrip("/")
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """
+    Seconds a 429 / 503 response asked us to wait via Retry-After (delta-seconds or an HTTP date).
+    """
+    if not isinstance(error, httpx.HTTPStatusError) or error.response.status_code not in (429, 503):
+        return None
+    value = error.response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def align_results(records: List, results: List[PushResult], crm: str) -> List[PushResult]:
+    """
+    Exactly one PushResult per record: records a bulk response has no entry for are failed,
+    extra entries are dropped.
+    """
+    if len(results) == len(records):
+        return results
+    logger.error(f"{crm} returned {len(results)} results for a batch of {len(records)} records")
+    missing = len(records) - len(results)
+    return list(results[:len(records)]) + [
+        PushResult(success=False, error=f"{crm} returned no result for this record") for _ in range(missing)
+    ]
 
 
 class BaseCRM(ABC):
@@ -19,6 +79,27 @@ class BaseCRM(ABC):
     async def push(self, data: dict):
         pass
 
+    async def push_batch(self, records: List[dict]) -> List[PushResult]:
+        """
+        Pushes already-transformed records and returns one PushResult per record, in order.
+        CRMs with bulk APIs override this; the default pushes concurrently one by one.
+        """
+        return await self.push_concurrently(records, self.push)
+
+    async def push_concurrently(self, records: List[dict], push: Callable[[dict], Awaitable],
+                                concurrency: int = DEFAULT_PUSH_CONCURRENCY) -> List[PushResult]:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def push_one(record: dict) -> PushResult:
+            async with semaphore:
+                try:
+                    await push(record)
+                    return PushResult(success=True)
+                except Exception as e:
+                    return PushResult(success=False, error=str(e), retry_after=retry_after(e))
+
+        return list(await asyncio.gather(*(push_one(record) for record in records)))
+
     @abstractmethod
     def transform(self, data: dict) -> dict:
         pass
@@ -27,6 +108,22 @@ class BaseCRM(ABC):
     def identify(self) -> str:
         pass
 
+    def resolve_api_url(self, default: str) -> str:
+        """
+        The CRM's API base URL: its route on the mock CRM server in mock mode, else config `api_url`.
+        """
+        mock_url = mock_server_url()
+        if mock_url:
+            return f"{mock_url}/{self.identify()}"
+        return self.config.get("api_url", default).rstrip("/")
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """
+        Shared keep-alive client for this CRM, opened on startup and closed on shutdown.
+        """
+        return http_pool.client(self.identify())
+
     def _get_jwt_token(self) -> str:
         return "mocked-jwt-token"
         # return jwt.encode({"iss": "record_sync"}, self.secret, algorithm="HS256")
@@ -0,0 +1,101 @@
+import asyncio
+import importlib.util
+from typing import Dict, Iterable, Tuple
+import httpx
+from app.core.config import ConfigManager
+from app.core.logger import logger
+from app.core.constants import (
+    DEFAULT_HTTP_MAX_CONNECTIONS,
+    DEFAULT_HTTP_MAX_KEEPALIVE,
+    DEFAULT_HTTP_KEEPALIVE_EXPIRY,
+    DEFAULT_HTTP_TIMEOUT,
+    DEFAULT_HTTP_CONNECT_TIMEOUT,
+    DEFAULT_HTTP2,
+)
+
+
+class CRMHttpPool:
+    """
+    Owns one shared, keep-alive httpx.AsyncClient per CRM so pushes reuse
+    connections instead of paying a TCP/TLS handshake per record.
+
+    Limits are read from the [http.<crm>] section of config.ini, falling back to [http].
+    Connections are bound to the event loop that opened them, so clients are kept per
+    (crm, loop); those of a loop that has since closed are dropped on the next lookup.
+    """
+
+    def __init__(self):
+        self.clients: Dict[Tuple[str, asyncio.AbstractEventLoop], httpx.AsyncClient] = {}
+
+    def settings(self, crm: str) -> dict:
+        config = ConfigManager.get_instance()
+
+        def get(key, fallback):
+            return config.get(f"http.{crm}", key, fallback=config.get("http", key, fallback=fallback))
+
+        return {
+            "max_connections": int(get("max_connections", DEFAULT_HTTP_MAX_CONNECTIONS)),
+            "max_keepalive_connections": int(get("max_keepalive_connections", DEFAULT_HTTP_MAX_KEEPALIVE)),
+            "keepalive_expiry": float(get("keepalive_expiry", DEFAULT_HTTP_KEEPALIVE_EXPIRY)),
+            "timeout": float(get("timeout", DEFAULT_HTTP_TIMEOUT)),
+            "connect_timeout": float(get("connect_timeout", DEFAULT_HTTP_CONNECT_TIMEOUT)),
+            "http2": str(get("http2", DEFAULT_HTTP2)).lower() in ("1", "true", "yes", "on"),
+        }
+
+    def _build(self, crm: str) -> httpx.AsyncClient:
+        settings = self.settings(crm)
+        http2 = settings["http2"]
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning(f"[HTTP] HTTP/2 requested for {crm} but 'h2' is not installed, using HTTP/1.1")
+            http2 = False
+
+        logger.info(f"[HTTP] Opening pooled client for {crm}: {settings}")
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings["max_connections"],
+                max_keepalive_connections=settings["max_keepalive_connections"],
+                keepalive_expiry=settings["keepalive_expiry"],
+            ),
+            timeout=httpx.Timeout(settings["timeout"], connect=settings["connect_timeout"]),
+        )
+
+    def client(self, crm: str) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self.clients.get((crm, loop))
+        if client is None or client.is_closed:
+            self._prune()
+            client = self._build(crm)
+            self.clients[(crm, loop)] = client
+        return client
+
+    def _prune(self):
+        # a closed loop can no longer run aclose(); its sockets go with the client
+        for crm, loop in [key for key in self.clients if key[1].is_closed()]:
+            logger.debug(f"[HTTP] Dropping {crm} client of a closed event loop")
+            del self.clients[(crm, loop)]
+
+    async def startup(self, crms: Iterable[str]):
+        for crm in crms:
+            self.client(crm)
+
+    async def shutdown(self):
+        """
+        Closes every client: on the current loop directly, on other running loops through them.
+        """
+        current = asyncio.get_running_loop()
+        clients, self.clients = self.clients, {}
+        for (crm, loop), client in clients.items():
+            try:
+                if loop is current:
+                    await client.aclose()
+                elif loop.is_running():
+                    await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(client.aclose(), loop))
+                else:
+                    continue
+                logger.info(f"[HTTP] Closed pooled client for {crm}")
+            except Exception as e:
+                logger.warning(f"[HTTP] Failed to close client for {crm}: {e}")
+
+
+http_pool = CRMHttpPool()
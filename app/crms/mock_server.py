@@ -0,0 +1,349 @@
+"""
+Local stand-in for the Salesforce and Outreach APIs, for load testing the real HTTP path
+(connection pooling, 429s, retries, breaker trips) on one machine.
+
+    python -m app.crms.mock_server --port 8001 --latency-ms 40 --latency-distribution lognormal \\
+        --error-rate 0.01 --throttle-rate 0.02 --retry-after 1 --quota 600
+
+Start the sync service with MOCK_CRM_URL=http://127.0.0.1:8001 (or `[mock_crm] enabled = true`
+in config.ini) and the CRM plugins send every push, bulk push and changes query to this server
+(see BaseCRM.resolve_api_url).
+
+Salesforce shape (/salesforce):  POST services/oauth2/token, POST sobjects/{type},
+                                 POST composite/sobjects, GET query, GET query/{cursor}
+Outreach shape (/outreach):      POST oauth/token, POST prospects, POST prospects/bulk,
+                                 GET prospects?filter[updatedAt]=..&page[size]=..&page[after]=..
+Knobs can be read and changed while running through GET / PUT /_mock/settings;
+GET /_mock/stats counts responses per route and status, POST /_mock/reset clears state.
+"""
+import argparse
+import asyncio
+import math
+import random
+import time
+import uuid
+from bisect import bisect_right
+from collections import Counter
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+from app.core.constants import DEFAULT_MOCK_CRM_URL, MOCK_CRM_URL_ENV
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+SALESFORCE_COLLECTION_LIMIT = 200
+OUTREACH_BULK_LIMIT = 100
+
+
+@dataclass
+class MockSettings:
+    latency_ms: float = 0.0              # mean added latency per request
+    latency_distribution: str = "fixed"  # fixed | uniform | exponential | lognormal
+    error_rate: float = 0.0              # fraction of requests answered with 503
+    throttle_rate: float = 0.0           # fraction of requests answered with 429
+    retry_after: float = 1.0             # Retry-After seconds sent with random 429s
+    quota: int = 0                       # requests per quota_window per bearer token, 0 = unlimited
+    quota_window: float = 60.0
+    item_error_rate: float = 0.0         # fraction of records rejected inside a successful response
+    page_size: int = 200                 # records per changes-query page
+    max_records: int = 1_000_000         # pushed records kept for changes queries
+    seed: Optional[int] = None
+
+    def validate(self):
+        if self.latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"latency_distribution must be one of {LATENCY_DISTRIBUTIONS}")
+        for name in ("error_rate", "throttle_rate", "item_error_rate"):
+            if not 0 <= getattr(self, name) <= 1:
+                raise ValueError(f"{name} must be between 0 and 1")
+        if self.page_size < 1:
+            raise ValueError("page_size must be positive")
+
+
+class MockCRMState:
+    def __init__(self, settings: MockSettings):
+        settings.validate()
+        self.settings = settings
+        self.rng = random.Random(settings.seed)
+        self.reset()
+
+    def reset(self):
+        self.records: Dict[str, List[dict]] = {"salesforce": [], "outreach": []}
+        self.seqs: Dict[str, List[int]] = {"salesforce": [], "outreach": []}
+        self.sequence = 0
+        self.quotas: Dict[str, list] = {}
+        self.stats: Counter = Counter()
+
+    def update(self, changes: dict):
+        known = {field.name for field in fields(MockSettings)}
+        unknown = set(changes) - known
+        if unknown:
+            raise ValueError(f"Unknown settings: {sorted(unknown)}")
+        settings = MockSettings(**{**asdict(self.settings), **changes})
+        settings.validate()
+        self.settings = settings
+        if "seed" in changes:
+            self.rng = random.Random(settings.seed)
+
+    def latency(self) -> float:
+        mean = self.settings.latency_ms / 1000
+        if mean <= 0:
+            return 0.0
+        distribution = self.settings.latency_distribution
+        if distribution == "uniform":
+            return self.rng.uniform(0, 2 * mean)
+        if distribution == "exponential":
+            return self.rng.expovariate(1 / mean)
+        if distribution == "lognormal":
+            # sigma = 1 gives a long tail; mu keeps the mean at latency_ms
+            return self.rng.lognormvariate(math.log(mean) - 0.5, 1.0)
+        return mean
+
+    def take_quota(self, token: str) -> Optional[float]:
+        """
+        Counts a request against `token`; returns the seconds until the window resets when over quota.
+        """
+        if not self.settings.quota:
+            return None
+        now = time.monotonic()
+        window = self.quotas.get(token)
+        if window is None or now - window[0] >= self.settings.quota_window:
+            window = self.quotas[token] = [now, 0]
+        if window[1] >= self.settings.quota:
+            return self.settings.quota_window - (now - window[0])
+        window[1] += 1
+        return None
+
+    def store(self, crm: str, record: dict) -> dict:
+        self.sequence += 1
+        record["_seq"] = self.sequence
+        record["_updated_at"] = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        records, seqs = self.records[crm], self.seqs[crm]
+        records.append(record)
+        seqs.append(self.sequence)
+        excess = len(records) - self.settings.max_records
+        if excess > 0:
+            del records[:excess]
+            del seqs[:excess]
+        return record
+
+    def page(self, crm: str, since: Optional[str], after: int, size: Optional[int] = None) -> tuple:
+        """
+        Up to `size` (default page_size) records with a sequence after `after`, updated after `since`,
+        plus the cursor of the next page (None on the last one).
+        """
+        size = min(size or self.settings.page_size, self.settings.page_size)
+        records, seqs = self.records[crm], self.seqs[crm]
+        selected = []
+        for index in range(bisect_right(seqs, after), len(records)):
+            record = records[index]
+            if since and record["_updated_at"] <= since:
+                continue
+            selected.append(record)
+            if len(selected) == size + 1:
+                break
+        more = len(selected) > size
+        selected = selected[:size]
+        return selected, (selected[-1]["_seq"] if more else None)
+
+    def item_fails(self) -> bool:
+        return self.settings.item_error_rate > 0 and self.rng.random() < self.settings.item_error_rate
+
+
+def _token(request: Request) -> str:
+    authorization = request.headers.get("authorization", "")
+    return authorization[7:] if authorization.lower().startswith("bearer ") else "anonymous"
+
+
+def _public(record: dict) -> dict:
+    return {key: value for key, value in record.items() if not key.startswith("_")}
+
+
+def create_app(settings: Optional[MockSettings] = None) -> FastAPI:
+    state = MockCRMState(settings or MockSettings())
+    app = FastAPI(title="Mock CRM", description="Salesforce- and Outreach-shaped endpoints for load testing")
+    app.state.mock = state
+
+    async def gate(request: Request):
+        """
+        Applies latency, per-token quotas, random 429s and random 503s before a route runs.
+        """
+        route = f"{request.method} {request.scope['route'].path}"
+        delay = state.latency()
+        if delay:
+            await asyncio.sleep(delay)
+        retry_after = state.take_quota(_token(request))
+        if retry_after is None and state.settings.throttle_rate and state.rng.random() < state.settings.throttle_rate:
+            retry_after = state.settings.retry_after
+        if retry_after is not None:
+            state.stats[f"{route} 429"] += 1
+            raise HTTPException(status_code=429, detail="Rate limit exceeded",
+                                headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+        if state.settings.error_rate and state.rng.random() < state.settings.error_rate:
+            state.stats[f"{route} 503"] += 1
+            raise HTTPException(status_code=503, detail="Injected failure")
+        state.stats[f"{route} ok"] += 1
+
+    async def issue_token(request: Request, prefix: str) -> dict:
+        form = parse_qs((await request.body()).decode())
+        client_id = form.get("client_id", ["client"])[0]
+        return {"access_token": f"{prefix}-{client_id}-{uuid.uuid4().hex}", "token_type": "Bearer",
+                "expires_in": 7200}
+
+    # ---------- Salesforce ----------
+    salesforce = APIRouter(prefix="/salesforce", dependencies=[Depends(gate)])
+
+    @salesforce.post("/services/oauth2/token")
+    async def salesforce_token(request: Request):
+        token = await issue_token(request, "sf")
+        token["instance_url"] = str(request.base_url).rstrip("/") + "/salesforce"
+        return token
+
+    @salesforce.post("/sobjects/{sobject}", status_code=201)
+    async def salesforce_create(sobject: str, record: dict):
+        if state.item_fails():
+            return JSONResponse(status_code=400, content=[
+                {"message": "Injected validation error", "errorCode": "FIELD_CUSTOM_VALIDATION_EXCEPTION"}])
+        stored = state.store("salesforce", {**record, "_type": sobject, "Id": uuid.uuid4().hex[:18]})
+        return {"id": stored["Id"], "success": True, "errors": []}
+
+    @salesforce.post("/composite/sobjects")
+    async def salesforce_collection(payload: dict):
+        records = payload.get("records", [])
+        if len(records) > SALESFORCE_COLLECTION_LIMIT:
+            raise HTTPException(status_code=400, detail=f"At most {SALESFORCE_COLLECTION_LIMIT} records per request")
+        results = []
+        for record in records:
+            if state.item_fails():
+                results.append({"id": None, "success": False,
+                                "errors": [{"message": "Injected validation error",
+                                            "statusCode": "FIELD_CUSTOM_VALIDATION_EXCEPTION"}]})
+                continue
+            values = {key: value for key, value in record.items() if key != "attributes"}
+            stored = state.store("salesforce", {**values, "_type": record.get("attributes", {}).get("type"),
+                                                "Id": uuid.uuid4().hex[:18]})
+            results.append({"id": stored["Id"], "success": True, "errors": []})
+        return results
+
+    def salesforce_page(since: Optional[str], after: int) -> dict:
+        records, cursor = state.page("salesforce", since, after)
+        body = {
+            "totalSize": len(records),
+            "done": cursor is None,
+            "records": [{**_public(record), "LastModifiedDate": record["_updated_at"]} for record in records],
+        }
+        if cursor is not None:
+            body["nextRecordsUrl"] = f"/salesforce/query/{cursor}-{since or ''}"
+        return body
+
+    @salesforce.get("/query")
+    async def salesforce_query(since: Optional[str] = None, q: Optional[str] = None):
+        return salesforce_page(since, 0)
+
+    @salesforce.get("/query/{cursor}")
+    async def salesforce_query_more(cursor: str):
+        after, _, since = cursor.partition("-")
+        if not after.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid query cursor")
+        return salesforce_page(since or None, int(after))
+
+    # ---------- Outreach ----------
+    outreach = APIRouter(prefix="/outreach", dependencies=[Depends(gate)])
+
+    @outreach.post("/oauth/token")
+    async def outreach_token(request: Request):
+        return await issue_token(request, "ot")
+
+    def prospect(record: dict) -> dict:
+        return {"type": "prospect", "id": str(record["_seq"]),
+                "attributes": {**_public(record), "updatedAt": record["_updated_at"]}}
+
+    @outreach.post("/prospects", status_code=201)
+    async def outreach_create(record: dict):
+        if state.item_fails():
+            return JSONResponse(status_code=422, content={"errors": [{"detail": "Injected validation error"}]})
+        return {"data": prospect(state.store("outreach", dict(record)))}
+
+    @outreach.post("/prospects/bulk")
+    async def outreach_bulk(payload: dict):
+        items = payload.get("data", [])
+        if len(items) > OUTREACH_BULK_LIMIT:
+            raise HTTPException(status_code=400, detail=f"At most {OUTREACH_BULK_LIMIT} prospects per request")
+        data = []
+        for item in items:
+            if state.item_fails():
+                data.append({"errors": [{"detail": "Injected validation error"}]})
+            else:
+                data.append(prospect(state.store("outreach", dict(item.get("attributes", {})))))
+        return {"data": data}
+
+    @outreach.get("/prospects")
+    async def outreach_list(request: Request):
+        params = request.query_params
+        since = params.get("filter[updatedAt]", "").split("..")[0] or None
+        after = params.get("page[after]", "0")
+        if not after.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid page cursor")
+        size = params.get("page[size]", "")
+        records, cursor = state.page("outreach", since, int(after), int(size) if size.isdigit() else None)
+        body = {"data": [prospect(record) for record in records], "links": {}}
+        if cursor is not None:
+            query = request.url.include_query_params(**{"page[after]": str(cursor)})
+            body["links"]["next"] = str(query)
+        return body
+
+    # ---------- control ----------
+    control = APIRouter(prefix="/_mock")
+
+    @control.get("/settings")
+    async def get_settings():
+        return asdict(state.settings)
+
+    @control.put("/settings")
+    async def put_settings(changes: dict):
+        try:
+            state.update(changes)
+        except (TypeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return asdict(state.settings)
+
+    @control.get("/stats")
+    async def get_stats():
+        return {"responses": dict(state.stats),
+                "records": {crm: len(records) for crm, records in state.records.items()}}
+
+    @control.post("/reset")
+    async def reset():
+        state.reset()
+        return {"status": "ok"}
+
+    app.include_router(salesforce)
+    app.include_router(outreach)
+    app.include_router(control)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(DEFAULT_MOCK_CRM_URL.rsplit(":", 1)[1]))
+    defaults = MockSettings()
+    for field in fields(MockSettings):
+        option = "--" + field.name.replace("_", "-")
+        kind = int if field.name in ("quota", "page_size", "max_records", "seed") else (
+            str if field.name == "latency_distribution" else float)
+        parser.add_argument(option, type=kind, default=getattr(defaults, field.name))
+    args = parser.parse_args()
+
+    import uvicorn
+
+    settings = MockSettings(**{field.name: getattr(args, field.name) for field in fields(MockSettings)})
+    app = create_app(settings)
+    print(f"Mock CRM on http://{args.host}:{args.port}; start the sync service with "
+          f"{MOCK_CRM_URL_ENV}=http://{args.host}:{args.port} to send CRM traffic here")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
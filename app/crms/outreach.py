@@ -1,8 +1,14 @@
-from app.crms.base import BaseCRM
+import asyncio
+from typing import List
+from app.crms.base import BaseCRM, BULK_UNSUPPORTED_STATUSES, align_results, retry_after, mock_server_url
 from app.utils.circuit_breaker import CircuitBreaker
 from app.core.logger import logger
 import httpx
 from app.crms.registry import register_crm
+from app.models.record import PushResult
+
+DEFAULT_API_URL = "https://api.outreach.io/api/v2"
+BULK_BATCH_LIMIT = 100  # max prospects per bulk request
 
 
 @register_crm("outreach")
@@ -14,6 +20,8 @@ class OutreachCRM(BaseCRM):
             failure_threshold=5,
             recovery_timeout=60
         )
+        self.api_url = self.resolve_api_url(DEFAULT_API_URL)
+        self.mock_server = mock_server_url() is not None
 
     @classmethod
     def config_schema(cls):
@@ -58,11 +66,10 @@ class OutreachCRM(BaseCRM):
                 "Authorization": f"Bearer {token}",
                 "Content-Type": "application/json"
             }
-            url = "https://api.outreach.io/api/v2/prospects"
+            url = f"{self.api_url}/prospects"
 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, json=data, headers=headers)
-                response.raise_for_status()
+            response = await self.http_client.post(url, json=data, headers=headers)
+            response.raise_for_status()
 
             self.circuit_breaker.record_success()
         except Exception as e:
@@ -70,8 +77,73 @@ class OutreachCRM(BaseCRM):
             self.circuit_breaker.record_failure()
             raise
 
+    async def push_batch(self, records: List[dict]) -> List[PushResult]:
+        """
+        Pushes prospects through the bulk endpoint, up to 100 per request.
+        Falls back to concurrent single pushes when a bulk request is not possible.
+        """
+        chunks = [records[start:start + BULK_BATCH_LIMIT]
+                  for start in range(0, len(records), BULK_BATCH_LIMIT)]
+        chunk_results = await asyncio.gather(*(self._push_bulk(chunk) for chunk in chunks))
+        return [result for results in chunk_results for result in results]
+
+    async def _push_bulk(self, chunk: List[dict]) -> List[PushResult]:
+        if len(chunk) == 1:
+            return await self.push_concurrently(chunk, self.push)
+
+        if not self.circuit_breaker.allow_request():
+            logger.warning("Outreach circuit breaker is OPEN, skipping batch push")
+            return [PushResult(success=False, error="Outreach circuit breaker is OPEN") for _ in chunk]
+
+        try:
+            token = self._get_jwt_token()
+            headers = {
+                "Authorization": f"Bearer {token}",
+                "Content-Type": "application/json"
+            }
+            payload = {"data": [{"type": "prospect", "attributes": record} for record in chunk]}
+            response = await self.http_client.post(f"{self.api_url}/prospects/bulk", json=payload,
+                                                   headers=headers)
+            if response.status_code in BULK_UNSUPPORTED_STATUSES:
+                logger.warning(f"Outreach bulk API unavailable ({response.status_code}), "
+                               f"falling back to single pushes")
+                return await self.push_concurrently(chunk, self.push)
+            response.raise_for_status()
+            self.circuit_breaker.record_success()
+        except Exception as e:
+            logger.error(f"Batch push to Outreach failed: {e}")
+            self.circuit_breaker.record_failure()
+            return [PushResult(success=False, error=str(e), retry_after=retry_after(e)) for _ in chunk]
+
+        results = [
+            PushResult(success=False, error="; ".join(err.get("detail", "") for err in item["errors"]))
+            if item.get("errors") else PushResult(success=True, crm_id=item.get("id"))
+            for item in response.json().get("data", [])
+        ]
+        return align_results(chunk, results, "Outreach")
+
+    async def list_changed_prospects(self, since_timestamp) -> List[dict]:
+        """
+        Lists prospects updated since `since_timestamp`, following the `links.next` cursor.
+        """
+        headers = {"Authorization": f"Bearer {self._get_jwt_token()}"}
+        params = {"filter[updatedAt]": f"{since_timestamp.isoformat()}..inf", "page[size]": BULK_BATCH_LIMIT}
+        url, changes = f"{self.api_url}/prospects", []
+        while url:
+            response = await self.http_client.get(url, params=params, headers=headers)
+            response.raise_for_status()
+            page = response.json()
+            for item in page.get("data", []):
+                data = {key: value for key, value in item.get("attributes", {}).items() if key != "updatedAt"}
+                changes.append({"operation": "update", "record_id": str(item["id"]), "data": data,
+                                "crm": "outreach"})
+            url, params = page.get("links", {}).get("next"), None
+        return changes
+
     async def fetch_recent_changes(self, since_timestamp):
         logger.info(f"Fetching Outreach changes since {since_timestamp.isoformat()}")
+        if self.mock_server:
+            return await self.list_changed_prospects(since_timestamp)
 
         return [
             {
@@ -1,46 +1,59 @@
-from .base import BaseCRM
+import asyncio
+from .base import BaseCRM, BULK_UNSUPPORTED_STATUSES, align_results, retry_after, mock_server_url
 from app.core.logger import logger
-from app.utils.circuit_breaker import CircuitBreaker
 from app.crms.registry import register_crm
 import httpx
-from typing import Dict
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
 from app.services.status import status_tracker
 from datetime import datetime
-from app.utils.rate_limiter import SlidingWindowRateLimiter
-from app.core.constants import DEFAULT_MAX_REQUESTS, DEFAULT_WINDOW_SIZE
-from app.settings.settings import CustomerSettings
+from app.utils.rate_limiter import RateLimitTimeout, customer_limits
+from app.utils.redis_state import build_rate_limiter, build_circuit_breaker
+from app.models.record import PushResult
+from app.utils.metrics import BREAKER_STATE, BREAKER_STATES, RATE_LIMITED
+from app.utils.tracing import tracer
+from app.utils.dedup import DedupIndex
 
-rate_limiter = SlidingWindowRateLimiter()
+rate_limiter = build_rate_limiter()
+
+DEFAULT_API_URL = "https://fake.salesforce.com"
+COMPOSITE_BATCH_LIMIT = 200  # max records per sObject Collections request
 
 
 @register_crm("salesforce")
 class SalesforceCRM(BaseCRM):
     mock_store = []  # fake in-memory DB
+    mock_index = DedupIndex("salesforce.mock_store")  # record_ids written to mock_store, lives as long as it
 
     def __init__(self, config):
         super().__init__(config)
         self.config = config
-        SlidingWindowRateLimiter.max_requests = DEFAULT_MAX_REQUESTS
-        SlidingWindowRateLimiter.window = DEFAULT_WINDOW_SIZE
-        if "customer_id" in config:
-            SlidingWindowRateLimiter.max_requests = CustomerSettings.settings.get(config["customer_id"],
-                                                                                  CustomerSettings.settings.get(
-                                                                                      "default")).get("max_requests")
-            SlidingWindowRateLimiter.window = CustomerSettings.settings.get(config["customer_id"],
-                                                                            CustomerSettings.settings.get(
-                                                                                "default")).get("window_size")
-
-            print("Customer : ", config["customer_id"])
-            print("Rate Limits are as follows \n")
-            print(SlidingWindowRateLimiter.max_requests)
-            print(SlidingWindowRateLimiter.window)
-            print("Rate Limits are ended \n")
-
-        self.circuit_breaker = CircuitBreaker(
+        # each customer gets its own bucket, so one tenant's limits never leak into another's
+        customer_id = config.get("customer_id")
+        self.customer = customer_id or "default"
+        self.rate_key = f"{self.customer}:salesforce"
+        rate_limiter.configure(self.rate_key, *customer_limits(customer_id))
+        logger.info(f"[RateLimiter] {self.rate_key} limited to {customer_limits(customer_id)} (requests, window)")
+        # callers wait for capacity; with a timeout they fail instead of waiting longer
+        timeout = config.get("rate_limit_timeout")
+        self.rate_limit_timeout = float(timeout) if timeout is not None else None
+
+        self.circuit_breaker = build_circuit_breaker(
+            self.rate_key,
+            rate_limiter,
             failure_threshold=5,
             recovery_timeout=60
         )
+        breaker = self.circuit_breaker
+        BREAKER_STATE.labels("salesforce", self.customer).set_function(lambda: BREAKER_STATES[breaker.state])
         self.secret = "salesforce_secret"
+        self.api_url = self.resolve_api_url(DEFAULT_API_URL)
+        # against the local mock CRM server the mock paths below go over HTTP too
+        self.mock_server = mock_server_url() is not None
+
+    async def _acquire(self):
+        with tracer.span("rate_limiter.acquire", customer=self.customer):
+            await rate_limiter.acquire(self.rate_key, timeout=self.rate_limit_timeout)
 
     @classmethod
     def config_schema(cls):
@@ -67,35 +80,53 @@ class SalesforceCRM(BaseCRM):
 
     # push mock
     async def push(self, data: dict):
-        if not rate_limiter.allow("salesforce"):
-            logger.warning(f"[RateLimiter] CRM salesforce rate limit exceeded. Skipping or delaying push.")
-            # Optionally retry or delay
-            return
-        else:
-            logger.info("Salesforce Rate Limiting Not breached")
+        if self.mock_server:
+            return await self.push_actual(data)
+        await self._acquire()
         SalesforceCRM.mock_store.append(data)
+        SalesforceCRM.mock_index.add_records([data])
         status_tracker.update_stat("last_sync_success", datetime.utcnow().isoformat())
         status_tracker.increment("total_synced")
         logger.info(f"[Mock Salesforce] Record pushed: {data}")
 
+    # push batch mock
+    async def push_batch(self, records: List[dict]) -> List[PushResult]:
+        if self.mock_server:
+            return await self.push_batch_actual(records)
+        results = []
+        for start in range(0, len(records), COMPOSITE_BATCH_LIMIT):
+            chunk = records[start:start + COMPOSITE_BATCH_LIMIT]
+            # one collection request counts once against the rate limit
+            try:
+                await self._acquire()
+            except RateLimitTimeout as e:
+                logger.warning(f"[RateLimiter] {e}. Failing batch of {len(chunk)}.")
+                RATE_LIMITED.labels("salesforce", self.customer).inc(len(chunk))
+                results.extend(PushResult(success=False, error=str(e)) for _ in chunk)
+                continue
+            SalesforceCRM.mock_store.extend(chunk)
+            SalesforceCRM.mock_index.add_records(chunk)
+            status_tracker.update_stat("last_sync_success", datetime.utcnow().isoformat())
+            status_tracker.increment("total_synced", len(chunk))
+            logger.info(f"[Mock Salesforce] Batch of {len(chunk)} records pushed")
+            results.extend(PushResult(success=True) for _ in chunk)
+        return results
+
     # pull mock
     async def pull(self):
-        if not rate_limiter.allow("salesforce"):
-            logger.warning(f"[RateLimiter] CRM salesforce rate limit exceeded. Skipping or delaying push.")
-            # Optionally retry or delay
-            return []
-        else:
-            logger.info("Salesforce Rate Limiting Not breached")
+        if self.mock_server:
+            # the records as pushed, like the in-process mock store
+            return [change["data"] for change in await self.query_changes()]
+        await self._acquire()
         logger.info("[Mock Salesforce] Pulling mock data...")
         return SalesforceCRM.mock_store.copy()
 
     async def push_actual(self, data: dict):
-        if not rate_limiter.allow("salesforce"):
-            logger.warning(f"[RateLimiter] CRM salesforce rate limit exceeded. Skipping or delaying push.")
-            # Optionally retry or delay
-            return
-        else:
-            logger.info("Salesforce Rate Limiting Not breached")
+        try:
+            await self._acquire()
+        except RateLimitTimeout:
+            RATE_LIMITED.labels("salesforce", self.customer).inc()
+            raise
 
         if not self.circuit_breaker.allow_request():
             logger.warning("Salesforce circuit breaker is OPEN, skipping push")
@@ -112,11 +143,11 @@ class SalesforceCRM(BaseCRM):
                 "Content-Type": "application/json"
             }
 
-            url = "https://fake.salesforce.com/sobjects/Account"
+            url = f"{self.api_url}/sobjects/Account"
 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, json=data, headers=headers)
-                response.raise_for_status()  # This raises HTTPStatusError on 500
+            with tracer.span("crm.http", customer=self.customer, endpoint="sobjects"):
+                response = await self.http_client.post(url, json=data, headers=headers)
+            response.raise_for_status()  # This raises HTTPStatusError on 500
 
             status_tracker.update_stat("last_sync_success", datetime.utcnow().isoformat())
             status_tracker.increment("total_synced")
@@ -127,19 +158,76 @@ class SalesforceCRM(BaseCRM):
             self.circuit_breaker.record_failure()
             raise
 
+    async def push_batch_actual(self, records: List[dict]) -> List[PushResult]:
+        """
+        Pushes records through the sObject Collections API, up to 200 per request.
+        Falls back to concurrent single pushes when a collection request is not possible.
+        """
+        chunks = [records[start:start + COMPOSITE_BATCH_LIMIT]
+                  for start in range(0, len(records), COMPOSITE_BATCH_LIMIT)]
+        chunk_results = await asyncio.gather(*(self._push_collection(chunk) for chunk in chunks))
+        return [result for results in chunk_results for result in results]
+
+    async def _push_collection(self, chunk: List[dict]) -> List[PushResult]:
+        if len(chunk) == 1:
+            return await self.push_concurrently(chunk, self.push_actual)
+
+        try:
+            await self._acquire()
+        except RateLimitTimeout as e:
+            logger.warning(f"[RateLimiter] {e}. Failing batch of {len(chunk)}.")
+            RATE_LIMITED.labels("salesforce", self.customer).inc(len(chunk))
+            return [PushResult(success=False, error=str(e)) for _ in chunk]
+        if not self.circuit_breaker.allow_request():
+            logger.warning("Salesforce circuit breaker is OPEN, skipping batch push")
+            return [PushResult(success=False, error="Salesforce circuit breaker is OPEN") for _ in chunk]
+
+        try:
+            token = self._get_jwt_token()
+            headers = {
+                "Authorization": f"Bearer {token}",
+                "Content-Type": "application/json"
+            }
+            payload = {
+                "allOrNone": False,
+                "records": [{"attributes": {"type": "Account"}, **record} for record in chunk]
+            }
+            with tracer.span("crm.http", customer=self.customer, endpoint="composite", records=len(chunk)):
+                response = await self.http_client.post(f"{self.api_url}/composite/sobjects", json=payload,
+                                                       headers=headers)
+            if response.status_code in BULK_UNSUPPORTED_STATUSES:
+                logger.warning(f"Salesforce collections API unavailable ({response.status_code}), "
+                               f"falling back to single pushes")
+                return await self.push_concurrently(chunk, self.push_actual)
+            response.raise_for_status()
+            self.circuit_breaker.record_success()
+        except Exception as e:
+            logger.error(f"Batch push to Salesforce failed: {e}")
+            self.circuit_breaker.record_failure()
+            return [PushResult(success=False, error=str(e), retry_after=retry_after(e)) for _ in chunk]
+
+        results = [
+            PushResult(
+                success=bool(item.get("success")),
+                crm_id=item.get("id"),
+                error="; ".join(err.get("message", "") for err in item.get("errors", [])) or None
+            )
+            for item in response.json()
+        ]
+        results = align_results(chunk, results, "Salesforce")
+        synced = sum(result.success for result in results)
+        if synced:
+            status_tracker.update_stat("last_sync_success", datetime.utcnow().isoformat())
+            status_tracker.increment("total_synced", synced)
+        return results
+
     async def write_record(self, record: Dict, allow_duplicates: bool = False):
-        if not rate_limiter.allow("salesforce"):
-            logger.warning(f"[RateLimiter] CRM salesforce rate limit exceeded. Skipping or delaying push.")
-            # Optionally retry or delay
-            return
-        else:
-            logger.info("Salesforce Rate Limiting Not breached")
+        await self._acquire()
 
-        if not allow_duplicates:
-            record_ids = {r.get("record_id") for r in SalesforceCRM.mock_store if "record_id" in r}
-            if record["record_id"] in record_ids:
-                logger.info(f"[Dedup] Skipping already synced record {record['record_id']}")
-                return
+        added = SalesforceCRM.mock_index.add(record["record_id"])
+        if not added and not allow_duplicates:
+            logger.info(f"[Dedup] Skipping already synced record {record['record_id']}")
+            return
 
         SalesforceCRM.mock_store.append(record)
         status_tracker.update_stat("last_sync_success", datetime.utcnow().isoformat())
@@ -147,11 +235,34 @@ class SalesforceCRM(BaseCRM):
 
         logger.info(f"Wrote record {record['record_id']} to salesforce")
 
+    async def query_changes(self, since_timestamp: Optional[datetime] = None) -> List[dict]:
+        """
+        Reads changed records page by page from the query endpoint, following nextRecordsUrl.
+        """
+        headers = {"Authorization": f"Bearer {self._get_jwt_token()}"}
+        params = {"since": since_timestamp.isoformat()} if since_timestamp else {}
+        url, changes = f"{self.api_url}/query", []
+        while url:
+            await self._acquire()
+            with tracer.span("crm.http", customer=self.customer, endpoint="query"):
+                response = await self.http_client.get(url, params=params, headers=headers)
+            response.raise_for_status()
+            page = response.json()
+            for record in page.get("records", []):
+                data = {key: value for key, value in record.items() if key not in ("Id", "LastModifiedDate")}
+                changes.append({"operation": "update", "record_id": record["Id"], "data": data,
+                                "crm": "salesforce"})
+            url = urljoin(self.api_url, page["nextRecordsUrl"]) if not page.get("done", True) else None
+            params = {}
+        return changes
+
     async def fetch_recent_changes(self, since_timestamp):
         """
         Use SOQL or a dummy pull to get records modified after since_timestamp
         """
         logger.info(f"Fetching Salesforce changes since {since_timestamp.isoformat()}")
+        if self.mock_server:
+            return await self.query_changes(since_timestamp)
 
         # for now, a mocked record:
         return [
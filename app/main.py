@@ -1,10 +1,15 @@
 from fastapi import FastAPI
 from app.api.v1 import sync, crm_info
+from app.api import metrics
 from app.core.logger import logger
 from app.services.poller import CommonCRMPoller
-from app.services.sync_manager import SyncManager
+from app.crms.http import http_pool
+from app.crms.registry import crm_registry
+from app.services.rules_registry import rules_registry
+from app.utils.tracing import tracer
 
-sync_manager = SyncManager()
+# share the SyncManager that serves the /v1/sync routes
+sync_manager = sync.sync_manager
 poller = CommonCRMPoller(sync_manager)
 
 app = FastAPI(
@@ -16,11 +21,16 @@ app = FastAPI(
 # register the router
 app.include_router(sync.router, prefix="/v1/sync", tags=["sync"])
 app.include_router(crm_info.router, prefix="/v1/crms", tags=["crms"])
+# Prometheus scrapes /metrics at the root
+app.include_router(metrics.router)
 
 
 @app.on_event("startup")
 async def startup_event():
     logger.info("Record Sync Service is starting up...")
+    await http_pool.startup(crm_registry.keys())
+    rules_registry.start()
+    sync_manager.start()
 
     # Uncomment if needed -- Bi Directional syncing between sqlite (System A) and file (System B)
     # sqlite_to_file_bidirectional_sync()
@@ -35,3 +45,7 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Record Sync Service is shutting down...")
+    await sync_manager.stop()
+    await rules_registry.stop()
+    await http_pool.shutdown()
+    tracer.flush()
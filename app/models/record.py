@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import Optional
 
 class Record(BaseModel):
     id: str
@@ -6,3 +7,10 @@ class Record(BaseModel):
     data: dict
     crm: str
     status: str
+
+
+class PushResult(BaseModel):
+    success: bool
+    crm_id: Optional[str] = None
+    error: Optional[str] = None
+    retry_after: Optional[float] = None  # seconds the CRM asked us to wait (Retry-After)
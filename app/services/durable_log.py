@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+from typing import Iterable, Iterator, List, Optional, Tuple
+from app.core.constants import DEFAULT_SEGMENT_BYTES
+from app.core.logger import logger
+from app.utils.checkpoint import CheckpointStore
+
+SEGMENT_SUFFIX = ".log"
+
+
+class DurableLog:
+    """
+    Append-only segment log backing a durable CRM queue.
+
+    Every record gets a monotonically increasing offset. Appends issued while a write is in
+    flight are group-committed (one write + one fsync per group). Consumers ack offsets in
+    any order; the committed offset advances over the contiguous acked prefix and is
+    checkpointed, fully acked segments are deleted, and `replay` returns everything after
+    the committed offset on startup.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = DEFAULT_SEGMENT_BYTES, fsync: bool = True):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+
+        self.checkpoints = CheckpointStore(os.path.join(directory, "committed.json"))
+        self.committed = self.checkpoints.get("committed", -1)
+        self.acked = set()
+        self.segments = sorted(
+            int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX)
+        )
+        self.next_offset = max(self._recover_tail(), self.committed) + 1
+
+        self.file = None
+        self.file_size = 0
+        self.fresh_segment = False  # set when a torn write could not be cut off the current segment
+        self.pending: List[Tuple[int, str, asyncio.Future]] = []
+        self.committer: Optional[asyncio.Task] = None
+
+    def _segment_path(self, base: int) -> str:
+        return os.path.join(self.directory, f"{base:020d}{SEGMENT_SUFFIX}")
+
+    def _recover_tail(self) -> int:
+        """
+        Returns the last written offset, cutting off a torn line left by a crash mid-write.
+        Undecodable lines before the last good one are left for `replay` to skip.
+        """
+        if not self.segments:
+            return -1
+        path = self._segment_path(self.segments[-1])
+        last_offset, good_bytes, end = self.segments[-1] - 1, 0, 0
+        with open(path, "rb") as f:
+            for line in f:
+                end += len(line)
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    last_offset = json.loads(line)[0]
+                except (ValueError, IndexError, TypeError, KeyError):
+                    continue
+                good_bytes = end
+        if good_bytes < os.path.getsize(path):
+            logger.warning(f"[DurableLog] Truncating torn write at byte {good_bytes} of {path}")
+            with open(path, "r+b") as f:
+                f.truncate(good_bytes)
+        return last_offset
+
+    def replay(self, until: Optional[int] = None) -> Iterator[Tuple[int, dict]]:
+        """
+        Yields (offset, record) for every record that was appended but not yet committed, up to
+        offset `until`. Records are read one line at a time, so a consumer can pull the backlog
+        lazily. Offsets missing from the log (a group commit that failed) are acked on the way,
+        so they cannot hold the committed offset back; so are torn lines, which are skipped.
+        """
+        expected = self.committed + 1
+        for base in list(self.segments):
+            with open(self._segment_path(base), "rb") as f:
+                for line in f:
+                    try:
+                        offset, record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn by a failed write, or an append still being written
+                    if until is not None and offset > until:
+                        return
+                    if offset > expected:
+                        self.ack(range(expected, offset))
+                    expected = max(expected, offset + 1)
+                    if offset > self.committed and offset not in self.acked:
+                        yield offset, record
+
+    async def append(self, record: dict) -> int:
+        """
+        Returns the record's offset once it has been written (and fsynced) to disk.
+        """
+        offset = self.next_offset
+        self.next_offset += 1
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((offset, json.dumps([offset, record]) + "\n", future))
+        if self.committer is None or self.committer.done():
+            self.committer = asyncio.create_task(self._group_commit())
+        # shielded so a cancelled producer does not abandon a write in progress
+        await asyncio.shield(future)
+        return offset
+
+    async def _group_commit(self):
+        while self.pending:
+            group, self.pending = self.pending, []
+            try:
+                await asyncio.to_thread(self._write, group[0][0], "".join(line for _, line, _ in group))
+            except Exception as e:
+                logger.error(f"[DurableLog] Group commit of {len(group)} records failed: {e}")
+                # these offsets never reached disk, do not let them stall the committed offset
+                self.ack(offset for offset, _, _ in group)
+                for _, _, future in group:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for _, _, future in group:
+                if not future.done():
+                    future.set_result(None)
+
+    def _write(self, first_offset: int, data: str):
+        if self.file is None or self.file_size >= self.segment_bytes:
+            self._roll(first_offset)
+        size = self.file_size
+        try:
+            self.file.write(data)
+            self.file.flush()
+            if self.fsync:
+                os.fsync(self.file.fileno())
+        except Exception:
+            self._cut_torn_write(size)
+            raise
+        self.file_size += len(data)
+
+    def _cut_torn_write(self, size: int):
+        """
+        Truncates the segment back to `size` after a failed write (e.g. ENOSPC partway), so the
+        next group is not appended after torn bytes. If that fails too, appends move on to a new
+        segment and replay skips the torn line.
+        """
+        path = self.file.name
+        try:
+            self.file.close()
+        except OSError:
+            pass  # the buffered rest of the failed write
+        self.file = None
+        try:
+            os.truncate(path, size)
+        except OSError as e:
+            logger.error(f"[DurableLog] Could not cut a torn write off {path}, starting a new segment: {e}")
+            self.fresh_segment = True
+
+    def _roll(self, base: int):
+        if self.file is None and self.segments and not self.fresh_segment:
+            # keep appending to the segment left over from the previous run while it has room
+            last = self._segment_path(self.segments[-1])
+            if os.path.getsize(last) < self.segment_bytes:
+                self._open(self.segments[-1])
+                return
+        if self.file is not None:
+            self.file.close()
+        self.fresh_segment = False
+        self.segments.append(base)
+        self._open(base)
+
+    def _open(self, base: int):
+        path = self._segment_path(base)
+        self.file = open(path, "a")
+        self.file_size = os.path.getsize(path)
+
+    def ack(self, offsets: Iterable[Optional[int]]):
+        for offset in offsets:
+            if offset is not None and offset > self.committed:
+                self.acked.add(offset)
+        committed = self.committed
+        while committed + 1 in self.acked:
+            committed += 1
+            self.acked.remove(committed)
+        if committed != self.committed:
+            self.committed = committed
+            self.checkpoints.set("committed", committed)
+            self._drop_committed_segments()
+
+    def _drop_committed_segments(self):
+        # a segment is removable once the next one starts at or below committed + 1
+        while len(self.segments) > 1 and self.segments[1] - 1 <= self.committed:
+            os.remove(self._segment_path(self.segments.pop(0)))
+
+    async def close(self):
+        if self.committer is not None:
+            await self.committer
+        if self.file is not None:
+            self.file.close()
+            self.file = None
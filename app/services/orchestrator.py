@@ -1,17 +1,41 @@
+import inspect
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, List
 from app.core.logger import logger
 
 
 class SyncOrchestrator:
-    def __init__(self, source, sink):
+    def __init__(self, source, sink, rules=None):
         self.source = source
         self.sink = sink
+        self.rules = rules
 
     async def sync_all(self, allow_duplicates: bool = False) -> int:
         logger.info("Starting record-to-record sync...")
-        records = await self.source.fetch_records()
         synced = 0
-        for record in records:
-            await self.sink.write_record(record, allow_duplicates=allow_duplicates)
-            synced += 1
-        logger.info(f"Finished syncing {len(records)} records.")
+        async with aclosing(self._batches()) as batches:
+            async for records in batches:
+                if self.rules is not None:
+                    # filter and map the backfill in bulk rather than record by record
+                    records = self.rules.select_batch(records)
+                if hasattr(self.sink, "write_records"):
+                    await self.sink.write_records(records, allow_duplicates=allow_duplicates)
+                    synced += len(records)
+                else:
+                    for record in records:
+                        await self.sink.write_record(record, allow_duplicates=allow_duplicates)
+                        synced += 1
+        logger.info(f"Finished syncing {synced} records.")
         return synced
+
+    async def _batches(self) -> AsyncIterator[List[Dict]]:
+        """
+        The source's records batch by batch when it streams them (an async `iter_records()`,
+        e.g. PostgresSource), so a large table is never held in memory; else one batch.
+        """
+        if inspect.isasyncgenfunction(getattr(self.source, "iter_records", None)):
+            async with aclosing(self.source.iter_records()) as batches:
+                async for batch in batches:
+                    yield batch
+        else:
+            yield await self.source.fetch_records()
@@ -2,6 +2,8 @@ import asyncio
 from app.core.logger import logger
 from app.services.rules_engine import RulesEngine
 from app.services.status import status_tracker
+from app.utils.metrics import STAGE_LATENCY
+from app.utils.tracing import tracer
 
 
 class FilePoller:
@@ -14,16 +16,41 @@ class FilePoller:
 
     async def poll_loop(self):
         status_tracker.stats["pollers_active"].append("file")
-        while True:
-            try:
+        try:
+            while True:
+                try:
+                    await self.poll_once()
+                except Exception as e:
+                    logger.exception(f"[FilePoller] Sync failed: {e}")
+                await asyncio.sleep(self.interval)
+        finally:
+            if hasattr(self.source, "close"):
+                await self.source.close()
+
+    async def poll_once(self) -> int:
+        """
+        Runs one poll; returns the number of records read from the source.
+        """
+        with tracer.span("poll.batch", source="file") as span:
+            with STAGE_LATENCY.labels("poll", "file").time(), tracer.span("poll.fetch"):
                 records = await self.source.fetch_new_records()
+            span.set("records", len(records))
 
-                for r in records:
-                    if not self.rules.match(r):
-                        continue
-                    transformed = self.rules.transform(r)
-                    await self.sink.write_record(transformed)
-                    logger.info(f"[File → SQLite] Synced {transformed.get('record_id')}")
-            except Exception as e:
-                logger.exception(f"[FilePoller] Sync failed: {e}")
-            await asyncio.sleep(self.interval)
+            with STAGE_LATENCY.labels("rules", "file").time(), tracer.span("rules.match"):
+                mask = self.rules.match_batch(records)
+            with STAGE_LATENCY.labels("transform", "file").time(), tracer.span("rules.transform"):
+                batch = self.rules.transform_batch(records, mask)
+            with STAGE_LATENCY.labels("push", "file").time(), tracer.span("sink.write", records=len(batch)):
+                if hasattr(self.sink, "write_records"):
+                    if batch:
+                        await self.sink.write_records(batch)
+                        logger.info(f"[File → SQLite] Synced {len(batch)} records")
+                else:
+                    for transformed in batch:
+                        with tracer.span("sink.write_record", record_id=transformed.get("record_id")):
+                            await self.sink.write_record(transformed)
+                        logger.info(f"[File → SQLite] Synced {transformed.get('record_id')}")
+            if hasattr(self.source, "ack"):
+                # only now that the sink has them are the records remembered as synced
+                await self.source.ack()
+        return len(records)
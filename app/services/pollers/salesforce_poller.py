@@ -2,34 +2,62 @@ import asyncio
 from app.core.logger import logger
 from app.services.rules_engine import RulesEngine
 from app.services.status import status_tracker
+from app.utils.dedup import DedupIndex
+from app.utils.metrics import STAGE_LATENCY
+from app.utils.tracing import tracer
 
 
 class SalesforcePoller:
-    def __init__(self, source_crm, sqlite_sink, interval=5, rules_path="rules.json"):
+    def __init__(self, source_crm, sqlite_sink, interval=5, rules_path="rules.json", dedup_path=None,
+                 version_field=None):
         self.source_crm = source_crm
         self.sqlite_sink = sqlite_sink
         self.rules = RulesEngine(rules_path)
         self.interval = interval
-        self.synced_ids = set()
+        customer = getattr(source_crm, "customer", "default")
+        self.dedup = DedupIndex.from_config(f"salesforce:{customer}", dedup_path)
+        self.version_field = version_field
 
     async def poll_loop(self):
         status_tracker.stats["pollers_active"].append("salesforce")
         while True:
             try:
-                records = await self.source_crm.pull()
-                for record in records:
-                    rid = record.get("record_id")
-                    if rid in self.synced_ids:
-                        continue
-                    if not self.rules.match(record):
-                        continue
-                    transformed = self.rules.transform(record)
-                    if not transformed:
-                        logger.warning(f"[SalesforcePoller] Skipping empty transformed record: {record}")
-                        continue
-                    await self.sqlite_sink.write_record(transformed)
-                    self.synced_ids.add(rid)
-                    logger.info(f"[Salesforce → SQLite] Synced record_id {rid}")
+                await self.poll_once()
             except Exception as e:
                 logger.exception(f"[SalesforcePoller] Sync failed: {e}")
             await asyncio.sleep(self.interval)
+
+    async def poll_once(self) -> int:
+        """
+        Runs one poll; returns the number of records read from the source.
+        """
+        with tracer.span("poll.batch", source="salesforce") as span:
+            with STAGE_LATENCY.labels("poll", "salesforce").time(), tracer.span("poll.fetch"):
+                records = await self.source_crm.pull()
+            records = self.dedup.filter_unseen(records, self.version_field)
+            span.set("records", len(records))
+            with STAGE_LATENCY.labels("rules", "salesforce").time(), tracer.span("rules.match"):
+                mask = self.rules.match_batch(records)
+            selected = [record for record, keep in zip(records, mask) if keep]
+            with STAGE_LATENCY.labels("transform", "salesforce").time(), tracer.span("rules.transform"):
+                transformed_batch = self.rules.transform_batch(selected)
+            batch, synced = [], []
+            for record, transformed in zip(selected, transformed_batch):
+                if not transformed:
+                    logger.warning(f"[SalesforcePoller] Skipping empty transformed record: {record}")
+                    continue
+                batch.append(transformed)
+                synced.append(record)
+
+            if batch:
+                with STAGE_LATENCY.labels("push", "salesforce").time(), \
+                        tracer.span("sink.write", records=len(batch)):
+                    if hasattr(self.sqlite_sink, "write_records"):
+                        await self.sqlite_sink.write_records(batch)
+                    else:
+                        for transformed in batch:
+                            with tracer.span("sink.write_record", record_id=transformed.get("record_id")):
+                                await self.sqlite_sink.write_record(transformed)
+                self.dedup.add_records(synced, self.version_field)
+                logger.info(f"[Salesforce → SQLite] Synced {len(batch)} records")
+        return len(records)
@@ -2,6 +2,8 @@ import asyncio
 from app.core.logger import logger
 from app.services.rules_engine import RulesEngine
 from app.services.status import status_tracker
+from app.utils.metrics import STAGE_LATENCY
+from app.utils.tracing import tracer
 
 class SQLitePoller:
     def __init__(self, source, sink, interval=5, rules_path="rules.json"):
@@ -9,24 +11,79 @@ class SQLitePoller:
         self.sink = sink
         self.interval = interval  # seconds
         self.rules = RulesEngine(rules_path)
+        if getattr(self.source, "cdc", False) and hasattr(self.sink, "push"):
+            # push() only creates or updates: a delete would reach the CRM as a stub record
+            raise ValueError(f"{type(self.sink).__name__} cannot apply deletes, so it cannot be fed by a CDC "
+                             f"source; read {self.source.table_name} by watermark or full scan instead")
+        if hasattr(self.source, "push_down"):
+            # let the source drop rows the filters reject before they are read
+            self.source.push_down(self.rules)
 
     async def poll_loop(self):
         status_tracker.stats["pollers_active"].append("sqlite")
         while True:
             try:
+                await self.poll_once()
+            except Exception as e:
+                logger.exception(f"[Poller] Error syncing records: {e}")
+
+            # sources that can be notified of changes (Postgres LISTEN) cut the sleep short
+            if hasattr(self.source, "wait_for_change"):
+                await self.source.wait_for_change(self.interval)
+            else:
+                await asyncio.sleep(self.interval)
+
+    async def poll_once(self) -> int:
+        """
+        Runs one poll; returns the number of records read from the source.
+        """
+        with tracer.span("poll.batch", source="sqlite") as span:
+            with STAGE_LATENCY.labels("poll", "sqlite").time(), tracer.span("poll.fetch"):
                 new_records = await self.source.fetch_new_records()
-                for record in new_records:
-                    if not self.rules.match(record):
-                        continue
-                    transformed = self.rules.transform(record)
-                    if hasattr(self.sink, "push"):
-                        await self.sink.push(transformed)
+            span.set("records", len(new_records))
+            changes = getattr(self.source, "cdc", False)
+            if changes:
+                batch = self._transform_changes(new_records)
+            else:
+                with STAGE_LATENCY.labels("rules", "sqlite").time(), tracer.span("rules.match"):
+                    mask = self.rules.match_batch(new_records)
+                with STAGE_LATENCY.labels("transform", "sqlite").time(), tracer.span("rules.transform"):
+                    batch = self.rules.transform_batch(new_records, mask)
+            with STAGE_LATENCY.labels("push", "sqlite").time(), tracer.span("sink.write", records=len(batch)):
+                if hasattr(self.sink, "push"):
+                    for transformed in batch:
+                        with tracer.span("sink.push", record_id=transformed.get("record_id")):
+                            await self.sink.push(transformed)
+                        logger.info(f"[Realtime Sync] Record {transformed.get('record_id')} synced")
+                    batch = []
+                if batch:
+                    if hasattr(self.sink, "write_records"):
+                        await self.sink.write_records(batch)
                     elif hasattr(self.sink, "write_record"):
-                        await self.sink.write_record(transformed)
+                        for transformed in batch:
+                            await self.sink.write_record(transformed)
                     else:
                         raise Exception(f"Unsupported sink type: {type(self.sink)}")
-                    logger.info(f"[Realtime Sync] Record {record['record_id']} synced")
-            except Exception as e:
-                logger.exception(f"[Poller] Error syncing records: {e}")
+                    logger.info(f"[Realtime Sync] {len(batch)} records synced")
+            if hasattr(self.source, "ack"):
+                # only now that the sink has them may the source move past these records
+                await self.source.ack()
+        return len(new_records)
+
+    def _transform_changes(self, changes):
+        """
+        Applies the rules to changelog records, keeping each one's `operation`. Deletes skip the
+        filters (the row is gone) and only carry the mapped key.
+        """
+        deletes = [record for record in changes if record["operation"] == "delete"]
+        upserts = [record for record in changes if record["operation"] != "delete"]
+        with STAGE_LATENCY.labels("rules", "sqlite").time(), tracer.span("rules.match"):
+            mask = self.rules.match_batch(upserts)
+        with STAGE_LATENCY.labels("transform", "sqlite").time(), tracer.span("rules.transform"):
+            batch = self.rules.transform_batch(upserts, mask)
+        for transformed, record in zip(batch, (record for record, keep in zip(upserts, mask) if keep)):
+            transformed["operation"] = record["operation"]
 
-            await asyncio.sleep(self.interval)
+        key = self.source.key_column
+        target = dict(self.rules.compiled.mappings).get(key, key)
+        return [{target: record[key], "operation": "delete"} for record in deletes] + batch
@@ -0,0 +1,119 @@
+import asyncio
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Set
+from app.core.logger import logger
+from app.crms.base import align_results
+from app.models.record import PushResult
+from app.services.status_manager import StatusManager
+from app.utils.metrics import FAILED, PUSHED, STAGE_LATENCY
+from app.utils.tracing import tracer
+
+
+class PushPool:
+    """
+    Runs up to `concurrency` push_batch calls for one CRM at a time, so a slow batch no
+    longer holds up the ones behind it.
+
+    Updates to one record_id never reorder: a batch containing a record that is still being
+    pushed by an earlier batch waits for it, and repeated ids within a batch go out in
+    successive calls. Per-record statuses are written to the StatusManager, and a batch's
+    `on_done` callback learns which of its records were pushed and how long the CRM asked
+    us to wait before trying again (Retry-After), if it did.
+    """
+
+    def __init__(self, crm: str, plugin, status: StatusManager, concurrency: int):
+        self.crm = crm
+        self.plugin = plugin
+        self.status = status
+        self.concurrency = concurrency
+        self.slots = asyncio.Semaphore(concurrency)
+        self.tasks: Set[asyncio.Task] = set()
+        self.in_flight: Dict[str, asyncio.Task] = {}
+
+    async def submit(self, records: List[dict], transformed: List[dict],
+                     on_done: Optional[Callable[[List[bool], Optional[float]], None]] = None):
+        """
+        Starts pushing a batch once a slot is free; waiting here is the flusher's backpressure.
+        When the batch is finished, `on_done` gets one flag per record telling whether it was pushed,
+        and the longest Retry-After of its failed pushes (None without one).
+        """
+        await self.slots.acquire()
+        predecessors = {self.in_flight[r["record_id"]] for r in records if r["record_id"] in self.in_flight}
+        task = asyncio.create_task(self._run(records, transformed, on_done, predecessors))
+        for record in records:
+            self.in_flight[record["record_id"]] = task
+        self.tasks.add(task)
+        task.add_done_callback(lambda done: self._finished(done, records))
+
+    def _finished(self, task: asyncio.Task, records: List[dict]):
+        self.tasks.discard(task)
+        for record in records:
+            if self.in_flight.get(record["record_id"]) is task:
+                del self.in_flight[record["record_id"]]
+
+    async def _run(self, records, transformed, on_done, predecessors):
+        pushed: List[Optional[bool]] = [None] * len(records)
+        waits: List[float] = []
+        cancelled = False
+        try:
+            if predecessors:
+                await asyncio.wait(predecessors)
+            for generation in self._generations(records, transformed):
+                indexes, payloads = zip(*generation)
+                results = await self._push([records[index] for index in indexes], payloads)
+                for index, result in zip(indexes, results):
+                    pushed[index] = result.success
+                    if result.retry_after is not None:
+                        waits.append(result.retry_after)
+        except Exception as e:
+            logger.exception(f"Push of {len(records)} records to {self.crm} failed: {e}")
+            for index, record in enumerate(records):
+                if pushed[index] is None:
+                    pushed[index] = False
+                    self.status.set_status(record["record_id"], "failed")
+                    FAILED.labels(self.crm, record.get("customer_id") or "default").inc()
+        except asyncio.CancelledError:
+            cancelled = True  # never pushed: a durable queue replays these
+            raise
+        finally:
+            self.slots.release()
+            if on_done and not cancelled:
+                on_done([self._settled(record, success) for record, success in zip(records, pushed)],
+                        max(waits) if waits else None)
+
+    def _settled(self, record: dict, success: Optional[bool]) -> bool:
+        # a failed update a later batch is already pushing again is superseded, not retried
+        later = self.in_flight.get(record["record_id"])
+        return bool(success) or (later is not None and later is not asyncio.current_task())
+
+    @staticmethod
+    def _generations(records, transformed):
+        # the n-th occurrence of a record_id goes into the n-th call, as (index, payload) pairs
+        generations = defaultdict(list)
+        seen = defaultdict(int)
+        for index, (record, payload) in enumerate(zip(records, transformed)):
+            generations[seen[record["record_id"]]].append((index, payload))
+            seen[record["record_id"]] += 1
+        return [generations[i] for i in range(len(generations))]
+
+    async def _push(self, records, transformed) -> List[PushResult]:
+        # a batch is only attributed to a customer when it holds no one else's records
+        customers = {record.get("customer_id") for record in records}
+        customer = customers.pop() if len(customers) == 1 else None
+        with STAGE_LATENCY.labels("push", self.crm).time(), \
+                tracer.span("crm.push_batch", customer=customer, records=len(records)):
+            results = align_results(records, await self.plugin.push_batch(list(transformed)), self.crm)
+        for record, result in zip(records, results):
+            customer = record.get("customer_id") or "default"
+            if result.success:
+                self.status.set_status(record["record_id"], "synced")
+                PUSHED.labels(self.crm, customer).inc()
+            else:
+                self.status.set_status(record["record_id"], "failed")
+                FAILED.labels(self.crm, customer).inc()
+                logger.error(f"Failed to push record {record['record_id']} to {self.crm}: {result.error}")
+        return results
+
+    async def join(self):
+        while self.tasks:
+            await asyncio.wait(set(self.tasks))
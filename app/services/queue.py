@@ -1,33 +1,391 @@
-from collections import defaultdict, deque
-from threading import Lock
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+from app.core.config import ConfigManager
+from app.core.constants import (
+    DEFAULT_QUEUE_MAXSIZE,
+    DEFAULT_QUEUE_POLICY,
+    DEFAULT_QUEUE_MAX_ATTEMPTS,
+    DEFAULT_QUEUE_RETRY_BACKOFF,
+    DEFAULT_QUEUE_MAX_RETRY_BACKOFF,
+    DEFAULT_SPILL_DIR,
+    DEFAULT_DURABLE_DIR,
+)
 from app.core.logger import logger
+from app.services.durable_log import DurableLog
 from app.services.status import status_tracker
-from app.utils.rate_limiter import SlidingWindowRateLimiter
+from app.utils.metrics import QUEUE_DEPTH
+
+QUEUE_POLICIES = ("block", "reject", "spill")
+
+# a queued record: (durable-log offset or None, record, failed push attempts so far)
+Entry = Tuple[Optional[int], dict, int]
+
+
+class QueueFullError(Exception):
+    """
+    Raised when a bounded CRM queue cannot accept a record (reject policy, or block policy timed out).
+    """
+
+
+class Batch(list):
+    """
+    A flushed batch of records; `offsets` holds their durable-log offsets (None when not durable)
+    so the consumer can ack them once pushed, `attempts` their failed pushes so far.
+    """
 
-rate_limiter = SlidingWindowRateLimiter()
-class QueueManager:
     def __init__(self):
-        self.queues = defaultdict(deque)
-        self.locks = defaultdict(Lock)
+        super().__init__()
+        self.offsets: List[Optional[int]] = []
+        self.attempts: List[int] = []
 
-    def enqueue(self, crm: str, record: dict):
-        if not rate_limiter.allow(crm):
-            logger.warning(f"[RateLimiter] CRM '{crm}' rate limit exceeded. Skipping or delaying push.")
-            # Optionally retry or delay
+    def entries(self) -> List[Entry]:
+        return list(zip(self.offsets, self, self.attempts))
+
+
+class SpillFile:
+    """
+    Overflow for the spill policy: records are appended as JSON lines and read back in order
+    once the in-memory queue has room. Delivery is at-least-once across restarts.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.read_offset = 0
+        self.count = 0
+        self.writer = None
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                self.count = sum(1 for line in f if line.strip())
+
+    def append(self, record: dict):
+        if self.writer is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.writer = open(self.path, "a")
+        self.writer.write(json.dumps(record) + "\n")
+        self.writer.flush()
+        self.count += 1
+
+    def read(self, limit: int) -> List[dict]:
+        records = []
+        if not self.count or limit <= 0:
+            return records
+        with open(self.path, "rb") as f:
+            f.seek(self.read_offset)
+            while len(records) < limit:
+                line = f.readline()
+                if not line:
+                    break
+                self.read_offset += len(line)
+                if line.strip():
+                    records.append(json.loads(line))
+        self.count -= len(records)
+        if not self.count:
+            # fully drained, start a fresh file
+            if self.writer is not None:
+                self.writer.close()
+                self.writer = None
+            os.remove(self.path)
+            self.read_offset = 0
+        return records
+
+
+class CRMQueue:
+    """
+    Bounded FIFO for one CRM. Producers waiting for room (block policy) are woken in FIFO
+    order, and each woken producer has a slot reserved so newcomers cannot overtake it.
+    With a durable log, a record is only queued once it has been committed to disk.
+    After a failed push the queue backs off (`backoff()`) before its head is flushed again.
+    """
+
+    def __init__(self, crm: str, maxsize: int, policy: str, spill_dir: str, log: Optional[DurableLog] = None,
+                 max_attempts: int = DEFAULT_QUEUE_MAX_ATTEMPTS, retry_backoff: float = DEFAULT_QUEUE_RETRY_BACKOFF,
+                 max_retry_backoff: float = DEFAULT_QUEUE_MAX_RETRY_BACKOFF):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unsupported queue policy: {policy}")
+        if policy == "spill" and log is not None:
+            raise ValueError("The spill policy cannot be combined with a durable queue")
+        self.crm = crm
+        self.maxsize = maxsize
+        self.policy = policy
+        self.log = log
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        # monotonic time before which retried records are not pushed again
+        self.retry_at = 0.0
+        self.entries = deque()
+        self.putters = deque()
+        self.reserved = 0
+        self.spill = SpillFile(os.path.join(spill_dir, f"{crm}.jsonl")) if policy == "spill" else None
+        if self.spill and self.spill.count:
+            logger.info(f"[Queue] Recovered {self.spill.count} spilled records for {crm}")
+            self.refill()
+        # uncommitted records of a durable log, read into memory as room frees up
+        self.backlog = None
+        self.backlog_size = 0
+        if self.log:
+            self.backlog_size = sum(1 for _ in self.log.replay())
+            if self.backlog_size:
+                logger.info(f"[Queue] Replaying {self.backlog_size} uncommitted records for {crm}")
+                self.backlog = self.log.replay(until=self.log.next_offset - 1)
+                self.refill()
+
+    def __len__(self) -> int:
+        return len(self.entries) + self.backlog_size + (self.spill.count if self.spill else 0)
+
+    @property
+    def records(self) -> List[dict]:
+        return [entry[1] for entry in self.entries]
+
+    def full(self) -> bool:
+        # the replay backlog counts, so new records only get in once all of it is in memory
+        return len(self.entries) + self.reserved + self.backlog_size >= self.maxsize
+
+    def put_nowait(self, record: dict):
+        if self.log:
+            raise RuntimeError(f"Durable queue for CRM '{self.crm}' must be fed with `await put()`")
+        if self.spill and (self.spill.count or self.full()):
+            # once spilling, keep FIFO order by routing new records through the spill file
+            self.spill.append(record)
             return
-        with self.locks[crm]:
-            self.queues[crm].append(record)
-            status_tracker.update_stat("queue_size", len(self.queues))
-            logger.debug(f"Queued record for {crm}. Queue size: {len(self.queues[crm])}")
-
-    def flush(self, crm: str, batch_size: int):
-        with self.locks[crm]:
-            batch = []
-            while len(batch) and len(batch) < batch_size:
-                batch.append(self.queues[crm].popleft())
-            logger.info(f"Flushed batch of size {len(batch)} for CRM {crm}")
-            return batch
+        if self.full() or self.putters:
+            raise QueueFullError(f"Queue for CRM '{self.crm}' is full ({self.maxsize} records)")
+        self.entries.append((None, record, 0))
+
+    async def put(self, record: dict, timeout: Optional[float] = None):
+        if not self.log:
+            if self.policy == "block":
+                await self._reserve(timeout)
+                self.reserved -= 1
+                self.entries.append((None, record, 0))
+            else:
+                self.put_nowait(record)
+            return
+
+        if self.policy == "block":
+            await self._reserve(timeout)
+        elif self.full() or self.putters:
+            raise QueueFullError(f"Queue for CRM '{self.crm}' is full ({self.maxsize} records)")
+        else:
+            self.reserved += 1
+        # the slot stays reserved while the record is group-committed
+        try:
+            offset = await self.log.append(record)
+        except BaseException:
+            self.reserved -= 1
+            self.wakeup()
+            raise
+        self.reserved -= 1
+        self.entries.append((offset, record, 0))
+
+    async def _reserve(self, timeout: Optional[float]):
+        if not self.full() and not self.putters:
+            self.reserved += 1
+            return
+
+        putter = asyncio.get_running_loop().create_future()
+        self.putters.append(putter)
+        try:
+            await asyncio.wait_for(putter, timeout)
+        except asyncio.TimeoutError:
+            # a wakeup racing the timeout still hands us a slot
+            if putter.cancelled():
+                self._forget(putter)
+                raise QueueFullError(f"Timed out waiting for room in queue for CRM '{self.crm}'")
+        except asyncio.CancelledError:
+            if putter.cancelled():
+                self._forget(putter)
+            else:
+                self.reserved -= 1
+                self.wakeup()
+            raise
+
+    def _forget(self, putter: asyncio.Future):
+        if putter in self.putters:
+            self.putters.remove(putter)
+
+    def pop(self, batch_size: int) -> Batch:
+        batch = Batch()
+        while self.entries and len(batch) < batch_size:
+            offset, record, attempts = self.entries.popleft()
+            batch.append(record)
+            batch.offsets.append(offset)
+            batch.attempts.append(attempts)
+        self.refill()
+        self.wakeup()
+        return batch
+
+    def retry(self, entries: List[Entry], retry_after: Optional[float] = None) -> Tuple[List[Entry], List[Entry]]:
+        """
+        Puts records whose push failed back at the head of the queue, in order, for another
+        attempt. A durable record keeps its offset, so it stays in the log until it is acked.
+        The queue then backs off exponentially in the attempts made, and at least `retry_after`
+        seconds when the CRM asked for that. Returns the entries queued again and those out of attempts.
+        """
+        retried, exhausted = [], []
+        for offset, record, attempts in entries:
+            if attempts + 1 < self.max_attempts:
+                retried.append((offset, record, attempts + 1))
+            else:
+                exhausted.append((offset, record, attempts + 1))
+        self.entries.extendleft(reversed(retried))
+        if retried:
+            attempts = max(attempts for _, _, attempts in retried)
+            delay = min(self.retry_backoff * 2 ** (attempts - 1), self.max_retry_backoff)
+            self.retry_at = max(self.retry_at, time.monotonic() + max(delay, retry_after or 0))
+        return retried, exhausted
+
+    def backoff(self) -> float:
+        """
+        Seconds left before retried records may be pushed again; 0 when not backing off.
+        """
+        return max(0.0, self.retry_at - time.monotonic())
+
+    def refill(self):
+        if self.spill and self.spill.count:
+            free = self.maxsize - len(self.entries)
+            self.entries.extend((None, record, 0) for record in self.spill.read(free))
+        if self.backlog is not None:
+            free = self.maxsize - len(self.entries)
+            replayed = [(offset, record, 0) for offset, record in islice(self.backlog, max(0, free))]
+            self.entries.extend(replayed)
+            self.backlog_size -= len(replayed)
+            if len(replayed) < free or self.backlog_size <= 0:
+                self.backlog.close()
+                self.backlog = None
+                self.backlog_size = 0
+
+    def wakeup(self):
+        while self.putters and not self.full():
+            putter = self.putters.popleft()
+            if not putter.done():
+                putter.set_result(None)
+                self.reserved += 1
+
+
+class QueueManager:
+    """
+    Per-CRM bounded queues with explicit backpressure when a queue is full:
+
+    - block:  `put` waits (optionally with a timeout) until the flusher frees room
+    - reject: raises QueueFullError so the caller can signal the producer (HTTP 429)
+    - spill:  overflows to a JSONL file under spill_dir and is read back in order
+
+    With `durable_dir` (or `queue_durable = true` in config.ini) every accepted record is
+    group-committed to a per-CRM DurableLog first, acked once pushed, and replayed on startup.
+    A record whose push failed is queued again, up to `queue_max_attempts` pushes in total,
+    after a backoff of `queue_retry_backoff` seconds doubling per attempt (at most
+    `queue_max_retry_backoff`), or longer when the CRM sent a Retry-After.
+    """
+
+    def __init__(self, maxsize: Optional[int] = None, policy: Optional[str] = None,
+                 spill_dir: str = DEFAULT_SPILL_DIR, durable_dir: Optional[str] = None):
+        self.maxsize = maxsize
+        self.policy = policy
+        self.spill_dir = spill_dir
+        self.durable_dir = durable_dir
+        self.queues: Dict[str, CRMQueue] = {}
+
+    def queue(self, crm: str) -> CRMQueue:
+        queue = self.queues.get(crm)
+        if queue is None:
+            config = ConfigManager.get_instance()
+
+            def setting(key, fallback):
+                return config.get(crm, key, fallback=config.get("default", key, fallback=fallback))
+
+            durable_dir = self.durable_dir
+            if durable_dir is None and setting("queue_durable", "false").lower() == "true":
+                durable_dir = setting("queue_durable_dir", DEFAULT_DURABLE_DIR)
+            log = None
+            if durable_dir:
+                log = DurableLog(os.path.join(durable_dir, crm),
+                                 fsync=setting("queue_durable_fsync", "true").lower() == "true")
+
+            queue = CRMQueue(
+                crm,
+                maxsize=self.maxsize or int(setting("queue_maxsize", DEFAULT_QUEUE_MAXSIZE)),
+                policy=self.policy or setting("queue_policy", DEFAULT_QUEUE_POLICY),
+                spill_dir=self.spill_dir,
+                log=log,
+                max_attempts=int(setting("queue_max_attempts", DEFAULT_QUEUE_MAX_ATTEMPTS)),
+                retry_backoff=float(setting("queue_retry_backoff", DEFAULT_QUEUE_RETRY_BACKOFF)),
+                max_retry_backoff=float(setting("queue_max_retry_backoff", DEFAULT_QUEUE_MAX_RETRY_BACKOFF)),
+            )
+            self.queues[crm] = queue
+            # read at scrape time, so the gauge is never stale
+            QUEUE_DEPTH.labels(crm).set_function(queue.__len__)
+        return queue
+
+    def enqueue(self, crm: str, record: dict):
+        """
+        Non-blocking enqueue; raises QueueFullError when the record cannot be accepted right now.
+        """
+        self.queue(crm).put_nowait(record)
+        self._record_depth(crm)
+
+    async def put(self, crm: str, record: dict, timeout: Optional[float] = None):
+        """
+        Enqueue applying the CRM's backpressure policy; under `block` this waits for room.
+        """
+        await self.queue(crm).put(record, timeout=timeout)
+        self._record_depth(crm)
+
+    def flush(self, crm: str, batch_size: int) -> Batch:
+        batch = self.queue(crm).pop(batch_size)
+        self._record_depth(crm)
+        logger.info(f"Flushed batch of size {len(batch)} for CRM {crm}")
+        return batch
+
+    def ack(self, crm: str, offsets: List[Optional[int]]):
+        """
+        Marks flushed records as handled so a durable queue will not replay them.
+        """
+        log = self.queue(crm).log
+        if log:
+            log.ack(offsets)
+
+    def retry(self, crm: str, entries: List[Entry], retry_after: Optional[float] = None) -> List[dict]:
+        """
+        Re-queues flushed records whose push failed; returns the ones queued again. Records out
+        of attempts are acked and left failed.
+        """
+        retried, exhausted = self.queue(crm).retry(entries, retry_after)
+        for _, record, attempts in exhausted:
+            logger.error(f"Giving up on record {record.get('record_id')} for {crm} after {attempts} attempts")
+        self.ack(crm, [offset for offset, _, _ in exhausted])
+        self._record_depth(crm)
+        return [record for _, record, _ in retried]
+
+    async def close(self):
+        for queue in self.queues.values():
+            if queue.backlog is not None:
+                queue.backlog.close()
+            if queue.log:
+                await queue.log.close()
+
+    def backoff(self, crm: str) -> float:
+        return self.queue(crm).backoff()
+
+    def size(self, crm: str) -> int:
+        return len(self.queue(crm))
+
+    def depths(self) -> Dict[str, int]:
+        return {crm: len(queue) for crm, queue in self.queues.items()}
 
     def get_pending(self, crm: str):
-        with self.locks[crm]:
-            return list(self.queues[crm])
+        """
+        Records held in memory for a CRM (spilled records and the unread replay backlog are not included).
+        """
+        return self.queue(crm).records
+
+    def _record_depth(self, crm: str):
+        depths = self.depths()
+        status_tracker.update_stat("queue_depth", depths)
+        status_tracker.update_stat("queue_size", sum(depths.values()))
+        logger.debug(f"Queue size for {crm}: {depths[crm]}")
@@ -0,0 +1,268 @@
+import copy
+from dataclasses import dataclass, field
+from itertools import compress
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+from app.core.constants import DEFAULT_VECTORIZE_MIN_ROWS
+from app.core.logger import logger
+from app.services.rules_filters import FilterScope, compile_filter_tree, is_plain_equality, sql_filter
+
+try:
+    import numpy as np
+except ImportError:  # optional, only used for large columnar batches
+    np = None
+
+Predicate = Callable[[dict], bool]
+Projection = Callable[[dict], dict]
+Columns = Mapping[str, Sequence]
+RecordBatch = Union[List[dict], Columns]
+SCALARS = (str, int, float, bool, type(None))
+
+EMPTY: dict = {}
+
+
+def _allow_all(record: dict) -> bool:
+    return True
+
+
+def compile_sync_predicate(rules: dict) -> Predicate:
+    """
+    Per-CRM `required_fields` / `disallow_if` rules, checked against record["data"].
+    """
+    required = tuple(rules.get("required_fields", ()))
+    # each disallow_if entry is a filter of its own: an equality or an operator dict
+    disallow = tuple(compile_filters({name: condition}) for name, condition in rules.get("disallow_if", {}).items())
+    if not required and not disallow:
+        return _allow_all
+
+    def should_sync(record: dict) -> bool:
+        data = record.get("data", EMPTY)
+        for name in required:
+            if not data.get(name):
+                return False
+        for disallowed in disallow:
+            if disallowed(data):
+                return False
+        return True
+
+    return should_sync
+
+
+def _build(name: str, body: str, constants: dict, arg: str = "record") -> Callable:
+    """
+    Builds `def name(arg): return <body>` with `constants` bound as globals. Rule keys and
+    values are only ever referenced through those names, never spliced into the source.
+    """
+    namespace = dict(constants)
+    exec(f"def {name}({arg}):\n    return {body}\n", namespace)
+    return namespace[name]
+
+
+def compile_filters(filters: dict) -> Predicate:
+    """
+    Top-level `filters` (see app/services/rules_filters.py), compiled into one boolean expression.
+    """
+    if not filters:
+        return _allow_all
+    scope = FilterScope()
+    node = compile_filter_tree(filters, scope)
+    return _build("match", node.expr, scope.constants)
+
+
+def compile_batch_filters(filters: dict) -> Callable[[List[dict]], List[bool]]:
+    """
+    Same expression as `compile_filters`, inlined into one list comprehension over a batch.
+    """
+    if not filters:
+        return lambda records: [True] * len(records)
+    scope = FilterScope()
+    node = compile_filter_tree(filters, scope)
+    return _build("match_batch", f"[{node.expr} for record in records]", scope.constants, arg="records")
+
+
+def _mapping_display(mappings: dict, constants: dict) -> str:
+    # dict display over direct lookups, with field names bound as constants
+    items = []
+    for i, (source, target) in enumerate(mappings.items()):
+        constants[f"s{i}"], constants[f"t{i}"] = source, target
+        items.append(f"t{i}: record[s{i}]")
+    return "{" + ", ".join(items) + "}"
+
+
+def compile_mappings(mappings: dict) -> Projection:
+    """
+    Top-level `mappings` (source field -> target field), compiled into a dict display over
+    direct lookups. Records missing a source field fall back to a per-field projection.
+    """
+    pairs = tuple(mappings.items())
+    if not pairs:
+        return lambda record: {}
+    constants = {}
+    dense = _build("project", _mapping_display(mappings, constants), constants)
+
+    def project(record: dict) -> dict:
+        try:
+            return dense(record)
+        except KeyError:
+            return {target: record[source] for source, target in pairs if source in record}
+
+    return project
+
+
+def compile_batch_select(filters: dict, mappings: dict, matcher: Predicate,
+                         projection: Projection) -> Callable[[List[dict]], List[dict]]:
+    """
+    Filters and maps a batch in one list comprehension, `[{...} for record in records if ...]`,
+    so each record costs no Python call. A batch with a record missing a mapped field is redone
+    through `matcher` and `projection`.
+    """
+    if not mappings:
+        return lambda records: [{} for record in records if matcher(record)]
+    scope = FilterScope()
+    condition = f" if {compile_filter_tree(filters, scope).expr}" if filters else ""
+    constants = dict(scope.constants)
+    dense = _build("select_batch",
+                   f"[{_mapping_display(mappings, constants)} for record in records{condition}]",
+                   constants, arg="records")
+
+    def select_batch(records: List[dict]) -> List[dict]:
+        try:
+            return dense(records)
+        except KeyError:
+            return [projection(record) for record in records if matcher(record)]
+
+    return select_batch
+
+
+def _column_length(columns: Columns) -> int:
+    return len(next(iter(columns.values()), ()))
+
+
+def _select(column: Sequence, mask) -> Sequence:
+    if np is not None and isinstance(mask, np.ndarray):
+        column = column if isinstance(column, np.ndarray) else np.asarray(column, dtype=object)
+        return column[mask]
+    return list(compress(column, mask))
+
+
+@dataclass(frozen=True)
+class CompiledRules:
+    """
+    Immutable snapshot of a rules document and the callables compiled from it.
+    Engines swap whole snapshots on update, so evaluation needs no lock.
+
+    Batches are either a list of records or columns (field -> equal-length sequence).
+    Columnar batches of at least DEFAULT_VECTORIZE_MIN_ROWS rows are filtered with NumPy when it is installed.
+    """
+    rules: dict
+    predicates: Dict[str, Predicate] = field(default_factory=dict)
+    matcher: Predicate = _allow_all
+    projection: Projection = lambda record: {}
+    batch_matcher: Callable[[List[dict]], List[bool]] = lambda records: [True] * len(records)
+    batch_projection: Optional[Callable[[List[dict]], List[dict]]] = None
+    batch_select: Optional[Callable[[List[dict]], List[dict]]] = None
+    filters: Optional[tuple] = ()  # equality filters, None when operators are used
+    mappings: tuple = ()
+
+    def pushdown(self, columns: Dict[str, str]) -> Optional[Tuple[str, tuple, bool]]:
+        """
+        (where, params, needs_regexp) prefiltering a table with `columns` (name -> declared type)
+        by the filters, or None when no part of them can be evaluated in SQL like in Python.
+        """
+        return sql_filter(compile_filter_tree(self.rules.get("filters", {}), FilterScope(columns)))
+
+    def should_sync(self, crm: str, record: dict) -> bool:
+        return self.predicates.get(crm, _allow_all)(record)
+
+    def match(self, record: dict) -> bool:
+        return self.matcher(record)
+
+    def transform(self, record: dict) -> dict:
+        transformed = self.projection(record)
+        if not transformed:
+            logger.warning(f"[RulesEngine] No fields mapped for record: {record}")
+        return transformed
+
+    def match_batch(self, batch: RecordBatch):
+        """
+        Selection mask for a batch: a list of bools, or a NumPy bool array on the vectorized path.
+        """
+        if isinstance(batch, Mapping):
+            return self._match_columns(batch)
+        return self.batch_matcher(batch)
+
+    def transform_batch(self, batch: RecordBatch, mask=None) -> RecordBatch:
+        """
+        Projects the rows selected by `mask` (all rows when None). Record lists give a list of
+        mapped records; columns give the mapped columns, renamed without touching each row.
+        """
+        if isinstance(batch, Mapping):
+            return {
+                target: batch[source] if mask is None else _select(batch[source], mask)
+                for source, target in self.mappings
+                if source in batch
+            }
+        rows = batch if mask is None else list(compress(batch, mask))
+        if self.batch_projection is None:
+            return list(map(self.projection, rows))
+        return self.batch_projection(rows)
+
+    def select_batch(self, batch: RecordBatch) -> RecordBatch:
+        """
+        `transform_batch(batch, match_batch(batch))` in one pass: the mapped records that pass the filters.
+        """
+        if isinstance(batch, Mapping) or self.batch_select is None:
+            return self.transform_batch(batch, self.match_batch(batch))
+        return self.batch_select(batch)
+
+    def _match_columns(self, columns: Columns):
+        rows = _column_length(columns)
+        if self.filters is None:
+            # operator filters are evaluated row by row over the columns
+            names = list(columns)
+            return self.batch_matcher([dict(zip(names, row)) for row in zip(*columns.values())])
+        vectorize = (np is not None and rows >= DEFAULT_VECTORIZE_MIN_ROWS
+                     and all(isinstance(expected, SCALARS) for _, expected in self.filters))
+        if vectorize:
+            mask = np.ones(rows, dtype=bool)
+            for key, expected in self.filters:
+                if key in columns:
+                    mask &= np.asarray(columns[key], dtype=object) == expected
+                elif expected is not None:
+                    mask[:] = False
+            return mask
+
+        mask = [True] * rows
+        for key, expected in self.filters:
+            if key in columns:
+                mask = [selected and value == expected for selected, value in zip(mask, columns[key])]
+            elif expected is not None:
+                return [False] * rows
+        return mask
+
+
+def compile_rules(rules: dict) -> CompiledRules:
+    if not isinstance(rules, dict):
+        raise ValueError("Rules must be a dictionary")
+    # the snapshot owns its copy so later edits to the caller's dict cannot leak in
+    rules = copy.deepcopy(rules)
+    filters = rules.get("filters", {})
+    mappings = rules.get("mappings", {})
+    if not mappings:
+        logger.warning(f"[RulesEngine] No mappings configured!")
+    matcher = compile_filters(filters)
+    projection = compile_mappings(mappings)
+    return CompiledRules(
+        rules=rules,
+        predicates={
+            crm: compile_sync_predicate(crm_rules)
+            for crm, crm_rules in rules.items()
+            if isinstance(crm_rules, dict) and crm_rules and crm not in ("filters", "mappings")
+        },
+        matcher=matcher,
+        projection=projection,
+        batch_matcher=compile_batch_filters(filters),
+        batch_projection=compile_batch_select({}, mappings, _allow_all, projection),
+        batch_select=compile_batch_select(filters, mappings, matcher, projection),
+        filters=tuple(filters.items()) if is_plain_equality(filters) else None,
+        mappings=tuple(mappings.items()),
+    )
@@ -1,69 +1,46 @@
-import json
-from app.core.logger import logger
-from threading import Lock
+from app.services.rules_compiler import CompiledRules
+from app.services.rules_registry import rules_registry
 
 
 class RulesEngine:
-    def __init__(self, rules_path="rules.json"):
-        # load initial rules from a local file or hardcoded
-        try:
-            with open(rules_path, "r") as f:
-                self.rules = json.load(f)
-        except Exception:
-            logger.warning("No local rules.json found, using defaults.")
-            self.rules = {
-                "salesforce": {
-                    "required_fields": ["email"],
-                    "disallow_if": {"do_not_sync": True}
-                }
-            }
-        self.lock = Lock()
-
-    def should_sync(self, crm: str, record: dict) -> bool:
-        with self.lock:
-            rules = self.rules.get(crm)
-        if not rules:
-            return True  # no rules, allow by default
+    """
+    View over the process-wide rules registry: every engine on the same rules_path shares one
+    hot-reloaded snapshot.
+    """
 
-        data = record.get("data", {})
+    def __init__(self, rules_path="rules.json"):
+        self.rules_path = rules_path
+        # resolved and loaded once, so bad files are reported at startup and reads skip the lookup
+        self.slot = rules_registry.slot(rules_path)
 
-        # required fields
-        for field in rules.get("required_fields", []):
-            if field not in data or not data[field]:
-                return False
+    @property
+    def compiled(self) -> CompiledRules:
+        return self.slot.snapshot.compiled
 
-        # disallow if
-        for field, value in rules.get("disallow_if", {}).items():
-            if data.get(field) == value:
-                return False
+    @property
+    def rules(self) -> dict:
+        return self.compiled.rules
 
-        return True
+    # reads take the current snapshot without locking, updates replace it whole
+    def should_sync(self, crm: str, record: dict) -> bool:
+        return self.slot.snapshot.compiled.should_sync(crm, record)
 
     def match(self, record: dict) -> bool:
-        filters = self.rules.get("filters", {})
-        for key, expected in filters.items():
-            if record.get(key) != expected:
-                return False
-        return True
+        return self.slot.snapshot.compiled.matcher(record)
 
     def transform(self, record: dict) -> dict:
-        mappings = self.rules.get("mappings", {})
-        if not mappings:
-            logger.warning(f"[RulesEngine] No mappings configured!")
-        transformed = {
-            to_key: record[from_key]
-            for from_key, to_key in mappings.items()
-            if from_key in record
-        }
-        if not transformed:
-            logger.warning(f"[RulesEngine] No fields mapped for record: {record}")
-        return transformed
+        return self.slot.snapshot.compiled.transform(record)
+
+    def match_batch(self, batch):
+        return self.compiled.match_batch(batch)
+
+    def transform_batch(self, batch, mask=None):
+        return self.compiled.transform_batch(batch, mask)
+
+    def select_batch(self, batch):
+        return self.compiled.select_batch(batch)
 
     def update_rules(self, new_rules: dict):
         if not isinstance(new_rules, dict):
             raise ValueError("Rules must be a dictionary")
-        with self.lock:
-            self.rules = new_rules
-        with open("rules.json", "w") as f:
-            json.dump(new_rules, f, indent=2)
-        logger.info("Rules updated and persisted locally.")
+        rules_registry.update(self.rules_path, new_rules)
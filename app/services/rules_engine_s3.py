@@ -19,49 +19,50 @@ s3://my-config-bucket/rules.json
 import boto3
 import json
 from app.core.logger import logger
+from app.services.rules_compiler import compile_rules
 
 class RulesEngineS3:
     def __init__(self, bucket_name="my-config-bucket", key="rules.json"):
         self.s3 = boto3.client("s3")
         self.bucket = bucket_name
         self.key = key
-        self.rules = {}
+        self.compiled = None
         self.load_rules()
 
+    @property
+    def rules(self) -> dict:
+        return self.compiled.rules
+
     def load_rules(self):
         try:
             logger.info(f"Loading rules from S3://{self.bucket}/{self.key}")
             response = self.s3.get_object(Bucket=self.bucket, Key=self.key)
             content = response["Body"].read()
-            self.rules = json.loads(content)
+            self.compiled = compile_rules(json.loads(content))
             logger.info("Rules successfully loaded from S3.")
         except Exception as e:
             logger.error(f"Error loading rules from S3, fallback to defaults: {e}")
-            self.rules = {
+            self.compiled = compile_rules({
                 "salesforce": {
                     "required_fields": ["email"],
                     "disallow_if": {"do_not_sync": True}
                 }
-            }
+            })
 
     def should_sync(self, crm: str, record: dict) -> bool:
-        rules = self.rules.get(crm)
-        if not rules:
-            return True  # no rules, allow by default
+        return self.compiled.should_sync(crm, record)
 
-        data = record.get("data", {})
+    def match(self, record: dict) -> bool:
+        return self.compiled.match(record)
 
-        # required fields
-        for field in rules.get("required_fields", []):
-            if field not in data or not data[field]:
-                return False
+    def transform(self, record: dict) -> dict:
+        return self.compiled.transform(record)
 
-        # disallow if
-        for field, value in rules.get("disallow_if", {}).items():
-            if data.get(field) == value:
-                return False
+    def match_batch(self, batch):
+        return self.compiled.match_batch(batch)
 
-        return True
+    def transform_batch(self, batch, mask=None):
+        return self.compiled.transform_batch(batch, mask)
 
     def update_rules(self, new_rules: dict):
         """
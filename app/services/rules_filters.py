@@ -0,0 +1,302 @@
+"""
+Compiles the `filters` rule language into Python expressions and SQL WHERE fragments.
+
+A filter is a dict of field conditions and combinators, all of which must hold:
+
+    {
+      "status": "active",                          # equality (the original format)
+      "region": {"in": ["emea", "apac"]},          # hashed set membership
+      "age": {"gte": 18, "lt": 65},                # ranges: gt / gte / lt / lte
+      "email": {"prefix": "ops-"},                 # also: regex, eq, ne, is_null
+      "any": [{"tier": "gold"}, {"spend": {"gt": 1000}}],
+      "not": {"do_not_sync": true}
+    }
+
+Conjunctions are ordered by estimated cost / selectivity so cheap, selective tests run
+first. SQL is generated as a prefilter that never rejects a row the Python predicate
+would accept; the Python predicate stays the source of truth. It is only generated against
+a known table schema: a condition is pushed when its column exists (SQLite reads an unknown
+"column" as a string literal) and its column affinity leaves the literal unconverted, since
+e.g. a TEXT column compares `5` as `'5'` where Python sees `'5' != 5`.
+"""
+import math
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+COMBINATORS = ("all", "any", "not")
+OPERATORS = ("eq", "ne", "in", "gt", "gte", "lt", "lte", "prefix", "regex", "is_null")
+RANGE_SQL = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+SQL_VALUES = (str, int, float, bytes, type(None))
+
+
+@dataclass
+class FilterNode:
+    expr: str                  # Python expression over `record`
+    selectivity: float         # estimated fraction of records passing
+    cost: float                # relative evaluation cost
+    sql: Optional[str] = None  # WHERE fragment, None when it cannot be pushed down
+    params: tuple = ()
+    exact: bool = False        # SQL accepts exactly the rows Python does (safe under NOT)
+    regexp: bool = False       # SQL needs the REGEXP function registered
+
+    @property
+    def rank(self) -> float:
+        rejected = 1 - self.selectivity
+        return self.cost / rejected if rejected > 0 else math.inf
+
+
+class FilterScope:
+    """
+    Collects the constants a compiled filter refers to; values are bound by name and never
+    written into the generated source. `columns` (name -> declared SQLite type) is the table
+    SQL is generated for; without it nothing is pushed down.
+    """
+
+    def __init__(self, columns: Optional[Dict[str, str]] = None):
+        self.constants: Dict[str, Any] = {}
+        self.affinities = None if columns is None else \
+            {name: column_affinity(declared) for name, declared in columns.items()}
+
+    def bind(self, value) -> str:
+        name = f"c{len(self.constants)}"
+        self.constants[name] = value
+        return name
+
+    def pushable(self, field: str, op: str, value) -> bool:
+        """
+        True when SQLite evaluates `op` on `field` like Python does, so pushing it cannot drop rows.
+        """
+        # column names are matched exactly: SQLite resolves "Name" to `name`, record.get does not
+        affinity = self.affinities.get(field) if self.affinities is not None else None
+        if affinity is None:
+            return False
+        if op in ("is_null", "regex"):
+            return True
+        if op == "prefix":
+            # numeric affinity turns the '1' bound of a '1' prefix into 1, which sorts below text
+            return affinity in ("TEXT", "BLOB")
+        values = list(value) if op == "in" else [value]
+        if affinity == "BLOB":
+            return True
+        types = (str,) if affinity == "TEXT" else (int, float)
+        return all(v is None or isinstance(v, types) for v in values)
+
+
+def column_affinity(declared: Optional[str]) -> str:
+    """
+    SQLite's type affinity for a declared column type (https://sqlite.org/datatype3.html 3.1).
+    """
+    declared = (declared or "").upper()
+    if "INT" in declared:
+        return "INTEGER"
+    if "CHAR" in declared or "CLOB" in declared or "TEXT" in declared:
+        return "TEXT"
+    if "BLOB" in declared or not declared:
+        return "BLOB"
+    if "REAL" in declared or "FLOA" in declared or "DOUB" in declared:
+        return "REAL"
+    return "NUMERIC"
+
+
+def is_operator_dict(condition) -> bool:
+    return isinstance(condition, dict) and bool(condition) and all(key in OPERATORS for key in condition)
+
+
+def quote(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _prefix_upper(prefix: str) -> Optional[str]:
+    # every string starting with `prefix` sorts in [prefix, upper) under binary collation
+    last = ord(prefix[-1])
+    if last >= 0x10FFFF:
+        return None
+    return prefix[:-1] + chr(last + 1)
+
+
+def _bindable(*values) -> bool:
+    return all(isinstance(value, SQL_VALUES) for value in values)
+
+
+def _leaf(scope: FilterScope, field: str, op: str, value) -> FilterNode:
+    node = _leaf_node(scope, field, op, value)
+    if node.sql is not None and not scope.pushable(field, op, value):
+        node.sql, node.params, node.exact, node.regexp = None, (), False, False
+    return node
+
+
+def _leaf_node(scope: FilterScope, field: str, op: str, value) -> FilterNode:
+    key, column = scope.bind(field), quote(field)
+    get = f"record.get({key})"
+
+    if op in ("eq", "ne"):
+        node = FilterNode(f"{get} {'==' if op == 'eq' else '!='} {scope.bind(value)}",
+                          0.05 if op == "eq" else 0.95, 1)
+        if _bindable(value):
+            node.sql, node.params = f"{column} {'IS' if op == 'eq' else 'IS NOT'} ?", (value,)
+        return node
+    if op == "in":
+        values = list(value)
+        if not values:
+            return FilterNode("False", 0.0, 0, "0", (), exact=True)
+        try:
+            expr = f"{scope.bind(_member_test(frozenset(values), tuple(values)))}({get})"
+        except TypeError:
+            expr = f"{get} in {scope.bind(tuple(values))}"
+        node = FilterNode(expr, min(0.05 * len(values), 0.9), 1)
+        if _bindable(*values):
+            present = [v for v in values if v is not None]
+            sql = f"{column} IN ({', '.join('?' * len(present))})" if present else None
+            if len(present) < len(values):
+                sql = f"({sql} OR {column} IS NULL)" if sql else f"{column} IS NULL"
+            node.sql, node.params = sql, tuple(present)
+        return node
+    if op in RANGE_SQL:
+        node = FilterNode(f"{scope.bind(_range_test(op, value))}({get})", 0.3, 2)
+        if _bindable(value):
+            node.sql, node.params = f"{column} {RANGE_SQL[op]} ?", (value,)
+        return node
+    if op == "prefix":
+        prefix = str(value)
+        test = scope.bind(lambda v: isinstance(v, str) and v.startswith(prefix))
+        upper = _prefix_upper(prefix) if prefix else None
+        if not prefix:
+            sql, params = f"typeof({column}) = 'text'", ()
+        elif upper is None:
+            sql, params = f"substr({column}, 1, ?) = ?", (len(prefix), prefix)
+        else:
+            sql, params = f"({column} >= ? AND {column} < ?)", (prefix, upper)
+        return FilterNode(f"{test}({get})", 0.1, 2, sql, params)
+    if op == "regex":
+        pattern = re.compile(value)
+        test = scope.bind(lambda v: isinstance(v, str) and pattern.search(v) is not None)
+        return FilterNode(f"{test}({get})", 0.2, 8, f"{column} REGEXP ?", (value,), exact=True, regexp=True)
+    if op == "is_null":
+        if value:
+            return FilterNode(f"{get} is None", 0.1, 1, f"{column} IS NULL", (), exact=True)
+        return FilterNode(f"{get} is not None", 0.9, 1, f"{column} IS NOT NULL", (), exact=True)
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+def _member_test(members: frozenset, values: tuple):
+    def test(value) -> bool:
+        try:
+            return value in members
+        except TypeError:
+            # unhashable record values (lists, dicts) can still equal a member
+            return value in values
+
+    return test
+
+
+def _range_test(op: str, bound):
+    compare = {
+        "gt": lambda v: v > bound, "gte": lambda v: v >= bound,
+        "lt": lambda v: v < bound, "lte": lambda v: v <= bound,
+    }[op]
+
+    def test(value) -> bool:
+        if value is None:
+            return False
+        try:
+            return bool(compare(value))
+        except TypeError:
+            return False
+
+    return test
+
+
+def conjunction(nodes: List[FilterNode]) -> FilterNode:
+    if not nodes:
+        return FilterNode("True", 1.0, 0, None, (), exact=True)
+    if len(nodes) == 1:
+        return nodes[0]
+    nodes = sorted(nodes, key=lambda node: node.rank)
+    selectivity, cost, reach = 1.0, 0.0, 1.0
+    for node in nodes:
+        cost += reach * node.cost
+        reach *= node.selectivity
+        selectivity *= node.selectivity
+    # a superset prefilter may drop conjuncts it cannot express
+    pushed = [node for node in nodes if node.sql is not None]
+    return FilterNode(
+        expr=" and ".join(f"({node.expr})" for node in nodes),
+        selectivity=selectivity,
+        cost=cost,
+        sql=" AND ".join(f"({node.sql})" for node in pushed) if pushed else None,
+        params=tuple(param for node in pushed for param in node.params),
+        exact=len(pushed) == len(nodes) and all(node.exact for node in nodes),
+        regexp=any(node.regexp for node in pushed),
+    )
+
+
+def disjunction(nodes: List[FilterNode]) -> FilterNode:
+    if not nodes:
+        return FilterNode("False", 0.0, 0, "0", (), exact=True)
+    if len(nodes) == 1:
+        return nodes[0]
+    nodes = sorted(nodes, key=lambda node: node.cost / node.selectivity if node.selectivity else math.inf)
+    rejected, cost, reach = 1.0, 0.0, 1.0
+    for node in nodes:
+        cost += reach * node.cost
+        reach *= 1 - node.selectivity
+        rejected *= 1 - node.selectivity
+    pushable = all(node.sql is not None for node in nodes)
+    return FilterNode(
+        expr=" or ".join(f"({node.expr})" for node in nodes),
+        selectivity=1 - rejected,
+        cost=cost,
+        sql=" OR ".join(f"({node.sql})" for node in nodes) if pushable else None,
+        params=tuple(param for node in nodes for param in node.params) if pushable else (),
+        exact=pushable and all(node.exact for node in nodes),
+        regexp=pushable and any(node.regexp for node in nodes),
+    )
+
+
+def negation(node: FilterNode) -> FilterNode:
+    # NOT over a superset would reject rows Python accepts, so only exact SQL is negated
+    pushable = node.sql is not None and node.exact
+    return FilterNode(
+        expr=f"not ({node.expr})",
+        selectivity=1 - node.selectivity,
+        cost=node.cost,
+        sql=f"NOT COALESCE(({node.sql}), 0)" if pushable else None,
+        params=node.params if pushable else (),
+        exact=pushable,
+        regexp=pushable and node.regexp,
+    )
+
+
+def compile_filter_tree(filters: dict, scope: FilterScope) -> FilterNode:
+    if not isinstance(filters, dict):
+        raise ValueError(f"Filters must be a dictionary, got {filters!r}")
+    nodes = []
+    for field, condition in filters.items():
+        if field == "all":
+            nodes.append(conjunction([compile_filter_tree(item, scope) for item in condition]))
+        elif field == "any":
+            nodes.append(disjunction([compile_filter_tree(item, scope) for item in condition]))
+        elif field == "not":
+            nodes.append(negation(compile_filter_tree(condition, scope)))
+        elif is_operator_dict(condition):
+            nodes.extend(_leaf(scope, field, op, value) for op, value in condition.items())
+        else:
+            nodes.append(_leaf(scope, field, "eq", condition))
+    return conjunction(nodes)
+
+
+def is_plain_equality(filters: dict) -> bool:
+    """
+    True for the original equality-only format, which columnar batches can vectorize.
+    """
+    return all(field not in COMBINATORS and not is_operator_dict(condition) for field, condition in filters.items())
+
+
+def sql_filter(node: FilterNode) -> Optional[Tuple[str, tuple, bool]]:
+    """
+    (where_clause, params, needs_regexp) for pushing a compiled filter into SQL, if any part can be.
+    """
+    if node.sql is None or node.expr == "True":
+        return None
+    return node.sql, node.params, node.regexp
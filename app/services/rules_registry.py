@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, Optional, Tuple
+from app.core.constants import DEFAULT_RULES_POLL_INTERVAL
+from app.core.logger import logger
+from app.services.rules_compiler import CompiledRules, compile_rules
+
+DEFAULT_RULES = {
+    "salesforce": {
+        "required_fields": ["email"],
+        "disallow_if": {"do_not_sync": True}
+    }
+}
+
+
+@dataclass(frozen=True)
+class RulesSnapshot:
+    """
+    One immutable version of a rules file: the compiled rules plus the serialized body and
+    ETag served by GET /v1/sync/rules.
+    """
+    path: str
+    version: int
+    etag: str
+    body: bytes
+    compiled: CompiledRules
+    loaded_at: float
+
+    @property
+    def rules(self) -> dict:
+        return self.compiled.rules
+
+
+class RulesSlot:
+    """
+    The current snapshot of one rules file. Engines hold on to their slot, so a read is one
+    attribute lookup; publishing a new version replaces `snapshot` in place.
+    """
+    __slots__ = ("snapshot",)
+
+    def __init__(self, snapshot: RulesSnapshot):
+        self.snapshot = snapshot
+
+
+class RulesRegistry:
+    """
+    Process-wide owner of rules files. Every RulesEngine on the same path reads the same
+    snapshot, so an update (API call or edit on disk) reaches the sync manager and all pollers
+    at once. Files are watched by mtime; a file that fails to parse keeps its last good snapshot.
+    """
+
+    def __init__(self, poll_interval: float = DEFAULT_RULES_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.snapshots: Dict[str, RulesSnapshot] = {}
+        self.slots: Dict[str, RulesSlot] = {}
+        self.stats: Dict[str, Optional[Tuple[int, int, int]]] = {}
+        self.lock = Lock()
+        self.watcher: Optional[asyncio.Task] = None
+
+    def snapshot(self, path: str = "rules.json") -> RulesSnapshot:
+        return self.slot(path).snapshot
+
+    def slot(self, path: str = "rules.json") -> RulesSlot:
+        """
+        The slot tracking `path`, loading the file on first use.
+        """
+        path = os.path.abspath(path)
+        slot = self.slots.get(path)
+        if slot is None:
+            self._load(path)
+            slot = self.slots[path]
+        return slot
+
+    def update(self, path: str, rules: dict) -> RulesSnapshot:
+        """
+        Validates, persists and publishes new rules for `path`.
+        """
+        path = os.path.abspath(path)
+        compiled = compile_rules(rules)
+        with self.lock:
+            body = json.dumps(rules, indent=2).encode()
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+            snapshot = self._publish(path, body, compiled)
+        logger.info(f"[Rules] {path} updated to version {snapshot.version}")
+        return snapshot
+
+    def refresh(self):
+        """
+        Reloads every known rules file whose mtime, size or inode changed.
+        """
+        for path in list(self.snapshots):
+            if self._stat(path) != self.stats.get(path):
+                self._load(path)
+
+    def _stat(self, path: str) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _load(self, path: str) -> RulesSnapshot:
+        with self.lock:
+            stat = self._stat(path)
+            current = self.snapshots.get(path)
+            if current is not None and stat == self.stats.get(path):
+                return current  # another caller loaded it first
+            try:
+                with open(path, "rb") as f:
+                    body = f.read()
+                compiled = compile_rules(json.loads(body))
+            except FileNotFoundError:
+                if current is not None:
+                    self.stats[path] = stat
+                    return current
+                logger.warning(f"No local {os.path.basename(path)} found, using defaults.")
+                body = json.dumps(DEFAULT_RULES, indent=2).encode()
+                compiled = compile_rules(DEFAULT_RULES)
+            except Exception as e:
+                self.stats[path] = stat
+                if current is not None:
+                    logger.error(f"[Rules] Keeping version {current.version} of {path}, reload failed: {e}")
+                    return current
+                logger.error(f"[Rules] Could not load {path}, using defaults: {e}")
+                body = json.dumps(DEFAULT_RULES, indent=2).encode()
+                compiled = compile_rules(DEFAULT_RULES)
+            snapshot = self._publish(path, body, compiled, stat)
+        logger.info(f"[Rules] Loaded version {snapshot.version} of {path}")
+        return snapshot
+
+    def _publish(self, path: str, body: bytes, compiled: CompiledRules, stat=None) -> RulesSnapshot:
+        current = self.snapshots.get(path)
+        snapshot = RulesSnapshot(
+            path=path,
+            version=current.version + 1 if current else 1,
+            etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+            body=body,
+            compiled=compiled,
+            loaded_at=time.time(),
+        )
+        self.stats[path] = stat if stat is not None else self._stat(path)
+        self.snapshots[path] = snapshot
+        slot = self.slots.get(path)
+        if slot is None:
+            self.slots[path] = RulesSlot(snapshot)
+        else:
+            slot.snapshot = snapshot
+        return snapshot
+
+    def start(self):
+        if self.watcher is None or self.watcher.done():
+            self.watcher = asyncio.create_task(self.watch())
+
+    async def stop(self):
+        if self.watcher is not None:
+            self.watcher.cancel()
+            try:
+                await self.watcher
+            except asyncio.CancelledError:
+                pass
+            self.watcher = None
+
+    async def watch(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logger.exception(f"[Rules] Watch failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+
+rules_registry = RulesRegistry()
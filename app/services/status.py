@@ -1,4 +1,5 @@
 import datetime
+from threading import Lock
 
 
 class StatusTracker:
@@ -6,18 +7,22 @@ class StatusTracker:
         self.start_time = datetime.datetime.utcnow()
         self.stats = {
             "queue_size": 0,
+            "queue_depth": {},
             "retries_pending": 0,
             "last_sync_success": None,
             "last_sync_failed": None,
             "total_synced": 0,
             "pollers_active": [],
         }
+        self.lock = Lock()
 
     def update_stat(self, key, value):
         self.stats[key] = value
 
     def increment(self, key, by=1):
-        self.stats[key] += by
+        # read-modify-write, so concurrent pushes must not interleave
+        with self.lock:
+            self.stats[key] += by
 
     def get_status(self):
         return {
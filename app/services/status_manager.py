@@ -1,15 +1,149 @@
+import os
+import sqlite3
+import time
+from collections import OrderedDict
 from threading import Lock
+from typing import Dict, List, Optional, Tuple
+from app.core.config import ConfigManager
+from app.core.constants import (
+    DEFAULT_STATUS_STRIPES,
+    DEFAULT_STATUS_MAX_ENTRIES,
+    DEFAULT_STATUS_TTL,
+    DEFAULT_STATUS_SPILL_BATCH,
+)
 
+# interned status codes; unseen statuses are appended on first use
+STATUSES = ["unknown", "queued", "synced", "failed", "skipped_by_rule"]
+CODE_BITS = 8
+CODE_MASK = (1 << CODE_BITS) - 1
 
-class StatusManager:
-    def __init__(self):
-        self.status_store = {}
+
+class StatusSpill:
+    """
+    On-disk SQLite index of statuses evicted from memory, written in batches.
+    """
+
+    def __init__(self, path: str, batch_size: int = DEFAULT_STATUS_SPILL_BATCH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS record_status "
+            "(record_id TEXT PRIMARY KEY, code INTEGER NOT NULL, updated_at INTEGER NOT NULL) WITHOUT ROWID"
+        )
+        self.batch_size = batch_size
+        self.pending: List[Tuple[str, int, int]] = []
         self.lock = Lock()
 
-    def set_status(self, record_id: str, status: str):
+    def add(self, record_id: str, code: int):
         with self.lock:
-            self.status_store[record_id] = status
+            self.pending.append((str(record_id), code, int(time.time())))
+            if len(self.pending) >= self.batch_size:
+                self._flush()
 
-    def get_status(self, record_id: str) -> str:
+    def get(self, record_id: str) -> Optional[int]:
         with self.lock:
-            return self.status_store.get(record_id, "unknown")
+            self._flush()
+            row = self.db.execute("SELECT code FROM record_status WHERE record_id = ?", (str(record_id),)).fetchone()
+        return row[0] if row else None
+
+    def _flush(self):
+        if self.pending:
+            self.db.executemany(
+                "INSERT INTO record_status VALUES (?, ?, ?) ON CONFLICT(record_id) DO UPDATE "
+                "SET code = excluded.code, updated_at = excluded.updated_at",
+                self.pending,
+            )
+            self.db.commit()
+            self.pending = []
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.db.close()
+
+
+class StatusManager:
+    """
+    Bounded per-record status store.
+
+    Record IDs are hashed onto `stripes` LRU maps, each with its own lock for writers; reads
+    take no lock. An entry is one int packing the expiry time and an interned status code.
+    Entries older than `ttl` seconds or beyond `max_entries` are evicted, into the SQLite
+    spill index when `spill_path` is set, so older records can still be looked up.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_STATUS_MAX_ENTRIES, ttl: float = DEFAULT_STATUS_TTL,
+                 stripes: int = DEFAULT_STATUS_STRIPES, spill_path: Optional[str] = None):
+        self.ttl = ttl
+        self.stripe_count = stripes
+        self.stripe_capacity = max(1, max_entries // stripes)
+        self.stripes = [OrderedDict() for _ in range(stripes)]
+        self.locks = [Lock() for _ in range(stripes)]
+        self.codes: Dict[str, int] = {status: code for code, status in enumerate(STATUSES)}
+        self.statuses = list(STATUSES)
+        self.codes_lock = Lock()
+        self.spill = StatusSpill(spill_path) if spill_path else None
+
+    @classmethod
+    def from_config(cls) -> "StatusManager":
+        config = ConfigManager.get_instance()
+        return cls(
+            max_entries=int(config.get("status", "max_entries", fallback=DEFAULT_STATUS_MAX_ENTRIES)),
+            ttl=float(config.get("status", "ttl_seconds", fallback=DEFAULT_STATUS_TTL)),
+            stripes=int(config.get("status", "stripes", fallback=DEFAULT_STATUS_STRIPES)),
+            spill_path=config.get("status", "spill_path", fallback=None) or None,
+        )
+
+    def _code(self, status: str) -> int:
+        code = self.codes.get(status)
+        if code is None:
+            with self.codes_lock:
+                code = self.codes.get(status)
+                if code is None:
+                    if len(self.statuses) > CODE_MASK:
+                        raise ValueError(f"Too many distinct statuses to intern {status!r}")
+                    code = len(self.statuses)
+                    self.statuses.append(status)
+                    self.codes[status] = code
+        return code
+
+    def set_status(self, record_id: str, status: str):
+        code = self._code(status)
+        now = time.time()
+        index = hash(record_id) % self.stripe_count
+        stripe = self.stripes[index]
+        evicted = []
+        with self.locks[index]:
+            stripe[record_id] = (int(now + self.ttl) << CODE_BITS) | code
+            stripe.move_to_end(record_id)
+            # oldest first: entries beyond capacity, then anything already expired
+            while len(stripe) > self.stripe_capacity or (stripe and self._expired(next(iter(stripe.values())), now)):
+                evicted.append(stripe.popitem(last=False))
+        if self.spill:
+            for evicted_id, packed in evicted:
+                self.spill.add(evicted_id, packed & CODE_MASK)
+
+    @staticmethod
+    def _expired(packed: int, now: float) -> bool:
+        return (packed >> CODE_BITS) < now
+
+    def get_status(self, record_id: str) -> str:
+        packed = self.stripes[hash(record_id) % self.stripe_count].get(record_id)
+        if packed is not None:
+            # an expired entry not yet evicted is still newer than anything spilled
+            if self.spill or not self._expired(packed, time.time()):
+                return self.statuses[packed & CODE_MASK]
+        if self.spill:
+            code = self.spill.get(record_id)
+            if code is not None:
+                return self.statuses[code]
+        return "unknown"
+
+    def __len__(self) -> int:
+        return sum(len(stripe) for stripe in self.stripes)
+
+    def close(self):
+        if self.spill:
+            self.spill.close()
@@ -1,48 +1,175 @@
-from app.services.queue import QueueManager
+from app.services.queue import Entry, QueueManager
 from app.crms.salesforce import SalesforceCRM
 from app.services.status_manager import StatusManager
+from app.services.push_pool import PushPool
 from app.services.rules_engine import RulesEngine
 from app.core.logger import logger
-from app.core.constants import DEFAULT_BATCH_SIZE
+from app.utils.metrics import ENQUEUED, FAILED, SKIPPED, STAGE_LATENCY
+from app.utils.tracing import tracer
+from app.core.config import ConfigManager
+from app.core.constants import DEFAULT_BATCH_SIZE, DEFAULT_FLUSH_INTERVAL_SECONDS, DEFAULT_PUSH_WORKERS
 import asyncio
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
 from app.crms.outreach import OutreachCRM
 
 
 class SyncManager:
     def __init__(self):
         self.queue = QueueManager()
-        self.status = StatusManager()
+        self.status = StatusManager.from_config()
         self.rules = RulesEngine()
         self.crm_plugins = {
             "salesforce": SalesforceCRM(config={}),
             "outreach": OutreachCRM(config={})
         }
+        self.flushers = {}
+        self.flush_events = defaultdict(asyncio.Event)
+        self.pools: Dict[str, PushPool] = {}
+        # sampled records waiting in a queue: record_id -> (enqueue span, enqueued at ns)
+        self.traced: Dict[str, tuple] = {}
 
     async def enqueue_sync(self, crm: str, record: dict):
         if crm not in self.crm_plugins:
             raise ValueError("Unsupported CRM")
-        if not self.rules.should_sync(crm, record):
-            logger.info(f"Skipping sync of {record['record_id']} due to rule evaluation.")
-            self.status.set_status(record['record_id'], "skipped_by_rule")
-            return
-        self.queue.enqueue(crm, record)
-        self.status.set_status(record['record_id'], "queued")
-        await self.try_flush(crm)
+        customer = record.get("customer_id") or "default"
+        with tracer.span("sync.enqueue", crm=crm, customer=customer, record_id=record['record_id']) as span:
+            with STAGE_LATENCY.labels("rules", crm).time(), tracer.span("rules.should_sync"):
+                allowed = self.rules.should_sync(crm, record)
+            if not allowed:
+                logger.info(f"Skipping sync of {record['record_id']} due to rule evaluation.")
+                self.status.set_status(record['record_id'], "skipped_by_rule")
+                SKIPPED.labels(crm, customer).inc()
+                return
+            # applies the CRM's backpressure policy: waits for room, rejects or spills to disk
+            with tracer.span("queue.put"):
+                await self.queue.put(crm, record)
+            self.status.set_status(record['record_id'], "queued")
+            ENQUEUED.labels(crm, customer).inc()
+            if span.sampled:
+                self.traced[record['record_id']] = (span, time.time_ns())
+        # pushing is left to the background flusher so callers never wait on the CRM
+        batch_size, _ = self.batch_settings(crm)
+        if self.queue.size(crm) >= batch_size:
+            self.flush_events[crm].set()
 
-    async def try_flush(self, crm: str):
-        # in production, use a timer or background thread
-        batch = self.queue.flush(crm, DEFAULT_BATCH_SIZE)
-        if not batch:
-            return
-        for record in batch:
-            plugin = self.crm_plugins[crm]
+    def batch_settings(self, crm: str) -> Tuple[int, float]:
+        """
+        Reads batch_size / flush_interval for a CRM from config.ini on every call,
+        so /v1/sync/config-override applies from the next batch.
+        """
+        config = ConfigManager.get_instance()
+        batch_size = config.get(crm, "batch_size", fallback=config.get("default", "batch_size",
+                                                                       fallback=DEFAULT_BATCH_SIZE))
+        flush_interval = config.get(crm, "flush_interval", fallback=config.get("default", "flush_interval",
+                                                                               fallback=DEFAULT_FLUSH_INTERVAL_SECONDS))
+        return int(batch_size), float(flush_interval)
+
+    def pool(self, crm: str) -> PushPool:
+        pool = self.pools.get(crm)
+        if pool is None:
+            config = ConfigManager.get_instance()
+            workers = config.get(crm, "push_workers", fallback=config.get("default", "push_workers",
+                                                                          fallback=DEFAULT_PUSH_WORKERS))
+            pool = PushPool(crm, self.crm_plugins[crm], self.status, int(workers))
+            self.pools[crm] = pool
+        return pool
+
+    def settle(self, crm: str, entries: List[Entry], pushed: List[bool], retry_after: Optional[float] = None):
+        """
+        Acks the pushed records of a batch so a durable queue may forget them; the failed ones
+        are queued again for another attempt once the queue's backoff has passed.
+        """
+        self.queue.ack(crm, [offset for (offset, _, _), ok in zip(entries, pushed) if ok])
+        failed = [entry for entry, ok in zip(entries, pushed) if not ok]
+        if failed:
+            for record in self.queue.retry(crm, failed, retry_after):
+                self.status.set_status(record['record_id'], "queued")
+            # the flusher sleeps until the backoff ends rather than for a whole flush_interval
+            self.flush_events[crm].set()
+
+    def start(self):
+        for crm in self.crm_plugins:
+            if crm not in self.flushers or self.flushers[crm].done():
+                self.flushers[crm] = asyncio.create_task(self.flush_loop(crm))
+        logger.info(f"Started background flushers for {list(self.flushers)}")
+
+    async def stop(self):
+        flushers, self.flushers = self.flushers, {}
+        for task in flushers.values():
+            task.cancel()
+        await asyncio.gather(*flushers.values(), return_exceptions=True)
+        # push whatever was accepted before shutdown, backing off or not
+        for crm in flushers:
+            await self.drain(crm, wait_backoff=False)
+        for pool in self.pools.values():
+            await pool.join()
+        await self.queue.close()
+        self.status.close()
+        logger.info("Stopped background flushers")
+
+    async def flush_loop(self, crm: str):
+        """
+        Drains the CRM queue whenever batch_size records are pending or flush_interval elapses,
+        and once a retry backoff ends.
+        """
+        while True:
+            _, flush_interval = self.batch_settings(crm)
+            backoff = self.queue.backoff(crm)
+            try:
+                await asyncio.wait_for(self.flush_events[crm].wait(), timeout=backoff or flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.flush_events[crm].clear()
+            await self.drain(crm)
+
+    async def drain(self, crm: str, wait_backoff: bool = True):
+        """
+        Flushes until the queue is empty, or until it is backing off from failed pushes.
+        """
+        while self.queue.size(crm) and not (wait_backoff and self.queue.backoff(crm)):
             try:
-                transformed = plugin.transform(record)
-                await plugin.push(transformed)
-                self.status.set_status(record['record_id'], "synced")
+                await self.try_flush(crm)
             except Exception as e:
-                self.status.set_status(record['record_id'], "failed")
-                logger.error(f"Failed to push record to {crm}: {e}")
+                logger.exception(f"Background flush failed for {crm}: {e}")
+                return
+
+    async def try_flush(self, crm: str, batch_size: Optional[int] = None):
+        """
+        Hands the next batch to the CRM's push pool; returns once it is in flight, not when it finishes.
+        """
+        batch = self.queue.flush(crm, batch_size or self.batch_settings(crm)[0])
+        if not batch:
+            return
+        plugin = self.crm_plugins[crm]
+        entries, transformed, dropped = [], [], []
+        with tracer.span("sync.flush", crm=crm, records=len(batch)):
+            if self.traced:
+                now = time.time_ns()
+                for record in batch:
+                    enqueued = self.traced.pop(record['record_id'], None)
+                    if enqueued:
+                        tracer.record("queue.wait", enqueued[0], enqueued[1], now, crm=crm)
+            with STAGE_LATENCY.labels("transform", crm).time():
+                for entry in batch.entries():
+                    offset, record, _ = entry
+                    try:
+                        with tracer.span("crm.transform", customer=record.get("customer_id"),
+                                         record_id=record['record_id']):
+                            transformed.append(plugin.transform(record))
+                        entries.append(entry)
+                    except Exception as e:
+                        # a record that cannot be transformed never will be, so it is not retried
+                        self.status.set_status(record['record_id'], "failed")
+                        FAILED.labels(crm, record.get("customer_id") or "default").inc()
+                        logger.error(f"Failed to transform record for {crm}: {e}")
+                        dropped.append(offset)
+            self.queue.ack(crm, dropped)
+            # the push task inherits this span, so its spans land in the same trace
+            await self.pool(crm).submit([record for _, record, _ in entries], transformed,
+                                        on_done=lambda pushed, retry_after: self.settle(crm, entries, pushed,
+                                                                                        retry_after))
 
     async def manual_retry(self, record_id: str):
         # for demonstration only
@@ -1,21 +1,57 @@
+import asyncio
+import codecs
 import json
 from app.systems.base import BaseSystem
 from app.core.logger import logger
-from typing import List, Dict
+from app.core.constants import DEFAULT_FSYNC_EVERY, DEFAULT_READ_CHUNK_SIZE
+from app.utils.checkpoint import CheckpointStore
+from app.utils.dedup import DedupIndex
+from itertools import islice
+from typing import List, Dict, Optional, Iterator, Tuple
 import os
+import re
 import uuid
 from datetime import datetime
 
+WHITESPACE = re.compile(r"\s*")
+# what is left of the buffer when a value was cut off inside a number, literal or escape
+PARTIAL_TOKEN = re.compile(r"[\w.+\-\\]*")
+SQLITE_HEADER = b"SQLite format 3\x00"
+# operations (from a CDC source) that change a record the sink may already hold
+CHANGE_OPERATIONS = ("update", "delete")
+
 
 class FileSource(BaseSystem):
-    def __init__(self, path: str):
+    def __init__(self, path: str, format: Optional[str] = None, checkpoint_path: Optional[str] = None,
+                 chunk_size: int = DEFAULT_READ_CHUNK_SIZE, max_records_per_poll: Optional[int] = None,
+                 dedup_path: Optional[str] = None, version_field: Optional[str] = None):
         self.path = path
-        self.synced_ids = set()
+        self.dedup_path = dedup_path
+        self.version_field = version_field
+        self.dedup = None
+        self.pending: List[Dict] = []  # delivered by the last fetch, marked as synced on ack()
+
+        # "json" re-reads a JSON array (legacy); "jsonl" and "json-stream" (concatenated
+        # JSON values) tail the file and only parse bytes appended since the last poll
+        self.format = format or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "json")
+        self.chunk_size = chunk_size
+        self.max_records_per_poll = max_records_per_poll
+        self.checkpoints = CheckpointStore(checkpoint_path)
+        # `offset`/`inode` is the read position; `committed` the acked one, which fetches start
+        # from and ack() checkpoints. A handle on a rotated-away file stays open in
+        # `committed_file` until its records are acked.
+        self.committed = self.checkpoints.get(self.path, {})
+        self.offset = self.committed.get("offset", 0)
+        self.inode = self.committed.get("inode")
+        self.file = None
+        self.committed_file = None
 
     async def fetch_records(self) -> List[Dict]:
         logger.info(f"Reading from file: {self.path}")
         if not os.path.exists(self.path):
             return []
+        if self.format != "json":
+            return await asyncio.to_thread(lambda: list(self.iter_records()))
         with open(self.path, "r") as f:
             return json.load(f)
 
@@ -23,6 +59,12 @@ class FileSource(BaseSystem):
         raise NotImplementedError("FileSource is read-only")
 
     async def fetch_new_records(self):
+        if self.format != "json":
+            self._rewind()
+            return await asyncio.to_thread(
+                lambda: list(islice(self.iter_new_records(), self.max_records_per_poll))
+            )
+
         if not os.path.exists(self.path):
             return []
 
@@ -32,23 +74,192 @@ class FileSource(BaseSystem):
             except json.JSONDecodeError:
                 records = []
 
-        new = []
-        for r in records:
-            rid = r.get("record_id")
-            if rid and rid not in self.synced_ids:
-                self.synced_ids.add(rid)
-                new.append(r)
-        return new
+        # only the legacy JSON array is re-read in full and needs de-duplication
+        if self.dedup is None:
+            self.dedup = DedupIndex.from_config(f"file:{os.path.abspath(self.path)}", self.dedup_path)
+        self.pending = self.dedup.filter_unseen(records, self.version_field)
+        return self.pending
+
+    def _rewind(self):
+        """
+        Moves the read position back to the committed one, so records a fetch returned but
+        nobody acked (the sink write failed) are read again.
+        """
+        if self.committed_file is not None:
+            if self.file is not None:
+                self.file.close()
+            self.file, self.committed_file = self.committed_file, None
+            self.inode = os.fstat(self.file.fileno()).st_ino
+        if self.committed.get("inode") in (None, self.inode):
+            # nothing committed yet means the start of the current file
+            self.offset = self.committed.get("offset", 0)
+
+    async def ack(self):
+        """
+        Commits the records returned by the last fetch: the tail position is checkpointed, or
+        a legacy JSON array's records are marked as synced. Until then every fetch delivers
+        them again. Call it once they have been delivered.
+        """
+        if self.pending:
+            self.dedup.add_records(self.pending, self.version_field)
+            self.pending = []
+        position = {"offset": self.offset, "inode": self.inode}
+        if self.format != "json" and position != self.committed:
+            self.committed = position
+            self.checkpoints.set(self.path, position)
+            if self.committed_file is not None:
+                self.committed_file.close()
+                self.committed_file = None
+
+    async def close(self):
+        for handle in (self.file, self.committed_file):
+            if handle is not None:
+                handle.close()
+        self.file = self.committed_file = None
+        if self.dedup is not None:
+            self.dedup.close()
+            self.dedup = None
+
+    def iter_records(self) -> Iterator[Dict]:
+        """
+        Streams every record in the file from the beginning without touching the tail position.
+        """
+        with open(self.path, "rb") as f:
+            for record, _ in self._parse(f, 0):
+                yield record
+
+    def iter_new_records(self) -> Iterator[Dict]:
+        """
+        Yields records appended since the read position. The position only advances past
+        records that were actually yielded, so a consumer may stop at any point.
+        Rotation is handled by draining the old handle before following the new file;
+        truncation (copytruncate) restarts from the beginning.
+        """
+        while True:
+            if self.file is None and not self._open_current():
+                return
+
+            if os.fstat(self.file.fileno()).st_size < self.offset:
+                logger.warning(f"[FileSource] {self.path} was truncated, re-reading from start")
+                self.offset = 0
+
+            for record, end in self._parse(self.file, self.offset):
+                self.offset = end
+                yield record
+
+            try:
+                current_inode = os.stat(self.path).st_ino
+            except FileNotFoundError:
+                return  # rotated away, the replacement is not there yet
+            if current_inode == self.inode:
+                return
+
+            logger.info(f"[FileSource] {self.path} was rotated, following the new file")
+            if self.committed.get("inode") in (None, self.inode) and self.committed_file is None:
+                self.committed_file = self.file  # unacked records may still have to be re-read
+            else:
+                self.file.close()
+            self.file = None
+            self.inode = None
+            self.offset = 0
+
+    def _open_current(self) -> bool:
+        try:
+            self.file = open(self.path, "rb")
+        except FileNotFoundError:
+            return False
+        inode = os.fstat(self.file.fileno()).st_ino
+        if inode != self.inode:
+            # a different file from the checkpointed one
+            self.offset = 0
+        self.inode = inode
+        return True
+
+    def _parse(self, f, offset: int) -> Iterator[Tuple[Dict, int]]:
+        f.seek(offset)
+        if self.format == "jsonl":
+            yield from self._parse_lines(f, offset)
+        else:
+            yield from self._parse_concatenated(f, offset)
+
+    def _parse_lines(self, f, offset: int) -> Iterator[Tuple[Dict, int]]:
+        for line in iter(f.readline, b""):
+            if not line.endswith(b"\n"):
+                return  # partially written record, picked up on the next poll
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"[FileSource] Skipping malformed line ending at byte {offset} of {self.path}")
+                continue
+            if not isinstance(record, dict):
+                logger.warning(f"[FileSource] Skipping non-object line ending at byte {offset} of {self.path}")
+                continue
+            yield record, offset
+
+    def _parse_concatenated(self, f, offset: int) -> Iterator[Tuple[Dict, int]]:
+        """
+        Yields JSON objects from concatenated values. A value cut off by the end of the buffer
+        waits for more bytes; a malformed one is skipped up to the next `{`, and bare scalars
+        or arrays are skipped too, so a bad value never stalls the reader.
+        """
+        decoder = json.JSONDecoder()
+        utf8 = codecs.getincrementaldecoder("utf-8")()
+        text = ""
+        while True:
+            chunk = f.read(self.chunk_size)
+            text += utf8.decode(chunk, final=not chunk)
+            pos = 0
+            while True:
+                start = WHITESPACE.match(text, pos).end()
+                if start == len(text):
+                    break
+                try:
+                    record, end = decoder.raw_decode(text, start)
+                except json.JSONDecodeError as e:
+                    if e.msg.startswith("Unterminated string") or PARTIAL_TOKEN.fullmatch(text, e.pos):
+                        break  # incomplete value, wait for more bytes
+                    end = text.find("{", start + 1)
+                    end = len(text) if end < 0 else end
+                    logger.warning(f"[FileSource] Skipping malformed JSON at byte {offset} of {self.path}: {e.msg}")
+                    offset += len(text[pos:end].encode("utf-8"))
+                    pos = end
+                    continue
+                offset += len(text[pos:end].encode("utf-8"))
+                pos = end
+                if not isinstance(record, dict):
+                    logger.warning(f"[FileSource] Skipping non-object value ending at byte {offset} of {self.path}")
+                    continue
+                yield record, offset
+            # keep only the unparsed tail in memory
+            text = text[pos:]
+            if not chunk:
+                return
 
 
 class FileSink(BaseSystem):
-    def __init__(self, path: str):
+    def __init__(self, path: str, format: Optional[str] = None, fsync_every: int = DEFAULT_FSYNC_EVERY,
+                 index_path: Optional[str] = None):
         self.path = path
+        # "json" rewrites a JSON array (legacy), "jsonl" appends one record per line
+        self.format = format or ("jsonl" if path.endswith(".jsonl") else "json")
+        self.fsync_every = fsync_every
+        self.index_path = index_path or f"{path}.ids"
+        self.dedup = None
+        self.unsynced = 0
+        self.data_file = None
+        self.write_lock = asyncio.Lock()
 
     async def fetch_records(self) -> List[Dict]:
         raise NotImplementedError("FileSink is write-only")
 
     async def write_record(self, record: Dict, allow_duplicates: bool = False):
+        if self.format == "jsonl":
+            await self.write_records([record], allow_duplicates=allow_duplicates)
+            return
+
         existing = []
         if os.path.exists(self.path):
             with open(self.path, "r") as f:
@@ -57,14 +268,121 @@ class FileSink(BaseSystem):
                 except json.JSONDecodeError:
                     existing = []
 
-        if not allow_duplicates:
-            record_ids = {r.get("record_id") for r in existing if "record_id" in r}
-            if record["record_id"] in record_ids:
-                logger.info(f"[Dedup] Skipping already synced record {record['record_id']}")
-                return
+        # the array holds current state: updates replace the record in place, deletes drop it
+        operation = record.get("operation")
+        rid = record["record_id"]
+        record = {key: value for key, value in record.items() if key != "operation"}
+        exists = any(r.get("record_id") == rid for r in existing)
+        if operation == "delete":
+            existing = [r for r in existing if r.get("record_id") != rid]
+        elif operation == "update" and exists:
+            existing = [record if r.get("record_id") == rid else r for r in existing]
+        elif exists and not allow_duplicates and operation != "update":
+            logger.info(f"[Dedup] Skipping already synced record {rid}")
+            return
+        else:
+            existing.append(record)
 
-        existing.append(record)
         with open(self.path, "w") as f:
             json.dump(existing, f, indent=2)
 
         logger.info(f"Wrote record {record['record_id']} to {self.path}")
+
+    async def write_records(self, records: List[Dict], allow_duplicates: bool = False):
+        if self.format != "jsonl":
+            for record in records:
+                await self.write_record(record, allow_duplicates=allow_duplicates)
+            return
+
+        async with self.write_lock:
+            written = await asyncio.to_thread(self._append_batch, records, allow_duplicates)
+        if written:
+            logger.info(f"Appended {written} records to {self.path}")
+
+    def _open(self):
+        if self.dedup is None:
+            self.dedup = self._load_index()
+        if self.data_file is None:
+            self.data_file = open(self.path, "a", buffering=1024 * 1024)
+
+    def _load_index(self) -> DedupIndex:
+        """
+        Opens the persistent record-ID index. When it is missing (first run or an older
+        sink file) it is rebuilt once from the JSONL data file; an index in the older
+        one-ID-per-line format is converted.
+        """
+        ids = []
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "rb") as f:
+                legacy = f.read(len(SQLITE_HEADER)) != SQLITE_HEADER
+            if legacy:
+                with open(self.index_path, "r") as f:
+                    ids = [json.loads(line) for line in f if line.strip()]
+                os.remove(self.index_path)
+        elif os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                for line in f:
+                    try:
+                        rid = json.loads(line).get("record_id")
+                    except (json.JSONDecodeError, AttributeError):
+                        continue
+                    if rid is not None:
+                        ids.append(rid)
+
+        index = DedupIndex(f"file_sink:{os.path.abspath(self.path)}", self.index_path)
+        index.add_many((rid, None) for rid in ids)
+        index.flush()
+        return index
+
+    def _append_batch(self, records: List[Dict], allow_duplicates: bool) -> int:
+        self._open()
+        written, synced, deleted = records, [], []
+        if not allow_duplicates:
+            # updates and deletes are appended as change events; creates are de-duplicated, except
+            # records without an ID which cannot be
+            creates = [record for record in records if record.get("operation") not in CHANGE_OPERATIONS]
+            fresh = self.dedup.filter_unseen(creates, keep_unkeyed=True)
+            if len(creates) == len(records):
+                written = fresh
+            else:
+                kept = {id(record) for record in fresh}
+                written = [record for record in records
+                           if id(record) in kept or record.get("operation") in CHANGE_OPERATIONS]
+            if len(written) < len(records):
+                logger.info(f"[Dedup] Skipping {len(records) - len(written)} already synced records")
+            synced = [record for record in written if record.get("operation") != "delete"]
+            deleted = [record["record_id"] for record in written
+                       if record.get("operation") == "delete" and record.get("record_id") is not None]
+        lines = [json.dumps(record) + "\n" for record in written]
+
+        if not lines:
+            return 0
+
+        # one buffered write per batch; data goes first so the index never
+        # claims a record that is not in the file
+        self.data_file.write("".join(lines))
+        self.data_file.flush()
+        self.dedup.add_records(synced)
+        if deleted:
+            # a deleted record may be created again
+            self.dedup.discard(deleted)
+
+        self.unsynced += len(lines)
+        if self.fsync_every and self.unsynced >= self.fsync_every:
+            self._fsync()
+        return len(lines)
+
+    def _fsync(self):
+        os.fsync(self.data_file.fileno())
+        self.dedup.flush()
+        self.unsynced = 0
+
+    async def close(self):
+        async with self.write_lock:
+            if self.data_file is None:
+                return
+            self._fsync()
+            self.data_file.close()
+            self.dedup.close()
+            self.data_file = None
+            self.dedup = None
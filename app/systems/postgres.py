@@ -1,8 +1,248 @@
+"""
+PostgreSQL source on an asyncpg connection pool.
+
+Incremental reads are keyset-paginated on (watermark_column, key_column) and, like
+SQLiteSource's, read from the acked position, which ack() checkpoints. When more than one page
+is waiting (a first sync or a long outage) the rest of the backlog is streamed through a named
+server-side cursor, `page_size` rows per FETCH, so a multi-million-row table is read in constant
+memory from one snapshot; a poll returns at most `max_rows_per_poll` rows of it.
+
+With `notify_channel` the source LISTENs on a dedicated connection and `wait_for_change`
+returns as soon as a NOTIFY arrives, so the poller wakes on change instead of sleeping its
+full interval. `notify_trigger` installs a statement-level trigger that sends the NOTIFY.
+"""
+import asyncio
+import itertools
+import re
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from app.core.constants import DEFAULT_PAGE_SIZE, DEFAULT_PG_POOL_MIN, DEFAULT_PG_POOL_MAX, \
+    DEFAULT_PG_MAX_ROWS_PER_POLL
+from app.core.logger import logger
+from app.utils.checkpoint import CheckpointStore
+
+_cursor_ids = itertools.count(1)
+
+
+def _asyncpg():
+    try:
+        import asyncpg
+    except ImportError as e:
+        raise RuntimeError("PostgresSource requires the asyncpg package") from e
+    return asyncpg
+
+
+def _quote(identifier: str) -> str:
+    return ".".join('"' + part.replace('"', '""') + '"' for part in identifier.split("."))
+
+
 class PostgresSource:
-    def __init__(self, dsn: str, table: str):
+    def __init__(self, dsn: str, table: str, watermark_column: Optional[str] = None, key_column: str = "record_id",
+                 page_size: int = DEFAULT_PAGE_SIZE, checkpoint_path: Optional[str] = None,
+                 max_rows_per_poll: Optional[int] = DEFAULT_PG_MAX_ROWS_PER_POLL, notify_channel: Optional[str] = None,
+                 notify_trigger: bool = False, min_pool_size: int = DEFAULT_PG_POOL_MIN,
+                 max_pool_size: int = DEFAULT_PG_POOL_MAX):
         self.dsn = dsn
         self.table = table
+        self.min_pool_size = min_pool_size
+        self.max_pool_size = max_pool_size
+        self.pool = None
+        self.connect_lock = asyncio.Lock()
+
+        # keyset on (watermark_column, key_column), or on the key alone; values are kept as text
+        # and cast to the column types in SQL, so the checkpoint stays plain JSON
+        self.key_column = key_column
+        self.watermark_column = watermark_column or key_column
+        self.keyset = [self.watermark_column] if self.watermark_column == key_column \
+            else [self.watermark_column, key_column]
+        self.types: Optional[List[str]] = None
+        self.page_size = page_size
+        self.max_rows_per_poll = max_rows_per_poll
+        self.checkpoints = CheckpointStore(checkpoint_path)
+        self.watermark_key = f"{self.table}:{self.watermark_column}"
+        self.watermark = self.checkpoints.get(self.watermark_key)
+        self.read_watermark = self.watermark
+
+        self.notify_channel = notify_channel
+        self.notify_trigger = notify_trigger
+        self.listener = None
+        self.changed = asyncio.Event()
+
+    async def connect(self):
+        async with self.connect_lock:
+            if self.pool is None:
+                asyncpg = _asyncpg()
+                pool = await asyncpg.create_pool(self.dsn, min_size=self.min_pool_size, max_size=self.max_pool_size)
+                try:
+                    self.types = await self._keyset_types(pool)
+                    if self.notify_channel and self.notify_trigger:
+                        await self.install_notify_trigger(pool)
+                except Exception:
+                    await pool.close()
+                    raise
+                self.pool = pool
+        return self.pool
+
+    async def close(self):
+        if self.listener is not None:
+            await self.listener.close()
+            self.listener = None
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def _keyset_types(self, pool) -> List[str]:
+        rows = await pool.fetch(
+            "SELECT attname, format_type(atttypid, atttypmod) FROM pg_attribute "
+            "WHERE attrelid = $1::regclass AND attnum > 0 AND NOT attisdropped",
+            self.table,
+        )
+        types = {row[0]: row[1] for row in rows}
+        missing = [column for column in self.keyset if column not in types]
+        if missing:
+            raise ValueError(f"Columns {missing} not found in {self.table}")
+        return [types[column] for column in self.keyset]
+
+    def _page_query(self) -> Tuple[str, list]:
+        """
+        Rows after `read_watermark` in keyset order. Non-key watermarks are paired with the key
+        so rows sharing a watermark value (e.g. same updated_at) are never skipped.
+        """
+        order = ", ".join(_quote(column) for column in self.keyset)
+        conditions = [f"{_quote(self.watermark_column)} IS NOT NULL"]
+        params = []
+        if self.read_watermark is not None:
+            placeholders = ", ".join(f"${i + 1}::text::{sql_type}" for i, sql_type in enumerate(self.types))
+            conditions.append(f"({order}) > ({placeholders})")
+            params = list(self.read_watermark)
+        query = f"SELECT * FROM {_quote(self.table)} WHERE {' AND '.join(conditions)} ORDER BY {order}"
+        return query, params
+
+    def _consume(self, rows) -> List[Dict]:
+        records = [dict(row) for row in rows]
+        last = records[-1]
+        self.read_watermark = [str(last[column]) for column in self.keyset]
+        return records
+
+    async def _stream(self, query: str, params: list) -> AsyncIterator[list]:
+        """
+        Runs `query` through a named server-side cursor in a read-only snapshot, yielding
+        `page_size` rows per FETCH.
+        """
+        pool = await self.connect()
+        name = f"sync_cursor_{next(_cursor_ids)}"
+        async with pool.acquire() as conn, conn.transaction(isolation="repeatable_read", readonly=True):
+            await conn.execute(f"DECLARE {name} NO SCROLL CURSOR FOR {query}", *params)
+            while True:
+                rows = await conn.fetch(f"FETCH FORWARD {self.page_size} FROM {name}")
+                if rows:
+                    yield rows
+                if len(rows) < self.page_size:
+                    return
+
+    async def iter_new_batches(self) -> AsyncIterator[List[Dict]]:
+        """
+        Yields batches of rows after the acked watermark; ack() after a batch checkpoints the
+        position it reached. One keyset page covers a normal poll; a larger backlog continues
+        through a cursor.
+        """
+        pool = await self.connect()
+        self.read_watermark = self.watermark
+        query, params = self._page_query()
+        rows = await pool.fetch(f"{query} LIMIT ${len(params) + 1}", *params, self.page_size)
+        if rows:
+            yield self._consume(rows)
+        if len(rows) < self.page_size:
+            return
+
+        logger.info(f"[PostgresSource] Backlog on {self.table}, streaming it through a server-side cursor")
+        query, params = self._page_query()
+        async with aclosing(self._stream(query, params)) as stream:
+            async for rows in stream:
+                yield self._consume(rows)
+
+    async def fetch_new_records(self) -> List[Dict]:
+        new_records = []
+        async with aclosing(self.iter_new_batches()) as batches:
+            async for batch in batches:
+                new_records.extend(batch)
+                if self.max_rows_per_poll and len(new_records) >= self.max_rows_per_poll:
+                    break
+        if new_records:
+            logger.debug(f"[PostgresSource] Read {len(new_records)} rows from {self.table} "
+                         f"up to {self.read_watermark}")
+        return new_records
+
+    async def ack(self):
+        """
+        Checkpoints the position reached by the last fetch. Call it once the records have been delivered.
+        """
+        if self.read_watermark != self.watermark:
+            self.watermark = self.read_watermark
+            self.checkpoints.set(self.watermark_key, self.watermark)
+
+    async def fetch_records(self) -> List[Dict]:
+        records = []
+        async for batch in self.iter_records():
+            records.extend(batch)
+        return records
+
+    async def iter_records(self) -> AsyncIterator[List[Dict]]:
+        """
+        Streams the whole table in batches without touching the watermark, e.g. for a backfill.
+        """
+        order = ", ".join(_quote(column) for column in self.keyset)
+        async with aclosing(self._stream(f"SELECT * FROM {_quote(self.table)} ORDER BY {order}", [])) as stream:
+            async for rows in stream:
+                yield [dict(row) for row in rows]
+
+    async def install_notify_trigger(self, pool=None):
+        """
+        Creates a statement-level trigger on the table that NOTIFYs notify_channel after any write.
+        """
+        pool = pool or await self.connect()
+        function = _quote(re.sub(r"\W", "_", self.table) + "_sync_notify")
+        channel = self.notify_channel.replace("'", "''")
+        await pool.execute(f"""
+            CREATE OR REPLACE FUNCTION {function}() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                PERFORM pg_notify('{channel}', TG_TABLE_NAME);
+                RETURN NULL;
+            END $$;
+            DROP TRIGGER IF EXISTS sync_notify ON {_quote(self.table)};
+            CREATE TRIGGER sync_notify AFTER INSERT OR UPDATE OR DELETE ON {_quote(self.table)}
+                FOR EACH STATEMENT EXECUTE FUNCTION {function}();
+        """)
+        logger.info(f"[PostgresSource] NOTIFY trigger on {self.table} sends to {self.notify_channel}")
+
+    def _notified(self, connection, pid, channel, payload):
+        self.changed.set()
+
+    async def listen(self):
+        if self.listener is None or self.listener.is_closed():
+            asyncpg = _asyncpg()
+            self.listener = await asyncpg.connect(self.dsn)
+            await self.listener.add_listener(self.notify_channel, self._notified)
+            logger.info(f"[PostgresSource] Listening on {self.notify_channel}")
 
-    async def fetch_records(self):
-        # Dummy implementation for now
-        return []
+    async def wait_for_change(self, timeout: float) -> bool:
+        """
+        Sleeps up to `timeout` seconds; returns True early when a NOTIFY arrived on notify_channel.
+        Notifications received while the caller was polling wake the next wait immediately.
+        """
+        if not self.notify_channel:
+            await asyncio.sleep(timeout)
+            return False
+        try:
+            await self.listen()
+        except Exception as e:
+            logger.warning(f"[PostgresSource] LISTEN on {self.notify_channel} failed, sleeping instead: {e}")
+            self.listener = None
+            await asyncio.sleep(timeout)
+            return False
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.changed.clear()
+        return True
@@ -1,11 +1,65 @@
-from typing import List, Dict
+import os
+import re
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
+from app.core.constants import DEFAULT_PAGE_SIZE
+from app.core.logger import logger
+from app.utils.checkpoint import CheckpointStore
+from app.utils.dedup import DedupIndex
+
+
+# compact operation codes written by the CDC triggers
+CDC_OPERATIONS = {"c": "create", "u": "update", "d": "delete"}
+
+
+@lru_cache(maxsize=256)
+def _pattern(pattern: str):
+    return re.compile(pattern)
+
+
+def _regexp(pattern: str, value) -> bool:
+    # SQLite evaluates `value REGEXP pattern` as regexp(pattern, value)
+    return isinstance(value, str) and _pattern(pattern).search(value) is not None
 
 
 class SQLiteSource:
-    def __init__(self, db_path: str, table_name: str):
+    def __init__(self, db_path: str, table_name: str, watermark_column: Optional[str] = None,
+                 page_size: int = DEFAULT_PAGE_SIZE, checkpoint_path: Optional[str] = None,
+                 max_rows_per_poll: Optional[int] = None, dedup_path: Optional[str] = None,
+                 version_column: Optional[str] = None, cdc: bool = False, key_column: str = "record_id"):
         self.db_path = db_path
         self.table_name = table_name
-        self.synced_ids = set()
+        # full-scan mode only: rows already synced, optionally per `version_column` value
+        self.dedup_path = dedup_path
+        self.version_column = version_column
+        self.dedup = None
+        self.pending: List[Dict] = []  # returned by the last full scan, marked as synced on ack()
+
+        # watermark mode: keyset pagination on `rowid`, `record_id`, `updated_at`, ...; fetches
+        # read from the acked `watermark` and ack() checkpoints the position they reached
+        self.watermark_column = watermark_column
+        self.page_size = page_size
+        self.max_rows_per_poll = max_rows_per_poll
+        self.checkpoints = CheckpointStore(checkpoint_path)
+        self.watermark_key = f"{self.table_name}:{self.watermark_column}"
+        self.watermark = self.checkpoints.get(self.watermark_key)
+        self.read_watermark = self.watermark
+        self.watermark_indexed = False
+
+        # rules whose filters are pushed into the WHERE clause, see push_down(); the clause is
+        # cached with the snapshot and table schema it was generated for
+        self.rules = None
+        self.pushed = None
+
+        # CDC mode: triggers log every insert/update/delete to `<table>_changelog`; consumers
+        # read it in sequence order and ack() what they processed, which truncates it
+        self.cdc = cdc
+        self.key_column = key_column
+        self.changelog = f"{table_name}_changelog"
+        self.cdc_installed = False
+        self.acked_seq = 0
+        self.read_seq = 0
 
     async def fetch_records(self) -> List[Dict]:
         # Dummy stub for testing
@@ -14,20 +68,242 @@ class SQLiteSource:
             {"record_id": 2, "name": "Bob"}
         ]
 
-    async def fetch_new_records(self) -> List[Dict]:
+    def push_down(self, rules):
+        """
+        Filters rows in SQLite with the current snapshot of `rules` (a RulesEngine), so rows its
+        filters reject are never read. The pushed clause is a prefilter; callers still apply the rules.
+        """
+        self.rules = rules
+
+    async def _filter_clause(self, db) -> Optional[Tuple[str, tuple, bool]]:
+        # deletes carry no columns to filter on, so changelog reads are never prefiltered
+        if self.rules is None or self.cdc:
+            return None
+        cursor = await db.execute(f"PRAGMA table_info({self.table_name})")
+        columns = {row[1]: row[2] for row in await cursor.fetchall()}
+        await cursor.close()
+        compiled = self.rules.compiled
+        if self.pushed is None or self.pushed[0] is not compiled or self.pushed[1] != columns:
+            self.pushed = (compiled, columns, compiled.pushdown(columns))
+        return self.pushed[2]
+
+    @asynccontextmanager
+    async def _connect(self):
         import aiosqlite
 
         async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute(f"SELECT * FROM {self.table_name}")
+            if self.rules is not None:
+                await db.create_function("regexp", 2, _regexp, deterministic=True)
+            yield db
+
+    async def fetch_new_records(self) -> List[Dict]:
+        if self.cdc:
+            return await self._fetch_changes()
+        if self.watermark_column:
+            return await self._fetch_after_watermark()
+
+        async with self._connect() as db:
+            pushed = await self._filter_clause(db)
+            where, params = (f"WHERE {pushed[0]}", pushed[1]) if pushed else ("", ())
+            cursor = await db.execute(f"SELECT * FROM {self.table_name} {where}", params)
             rows = await cursor.fetchall()
             columns = [desc[0] for desc in cursor.description]
 
+        records = [dict(zip(columns, row)) for row in rows]
+        if self.dedup is None:
+            self.dedup = DedupIndex.from_config(f"sqlite:{os.path.abspath(self.db_path)}:{self.table_name}",
+                                                self.dedup_path)
+        self.pending = self.dedup.filter_unseen(records, self.version_column)
+        return self.pending
+
+    def _page_query(self, pushed: Optional[Tuple[str, tuple, bool]] = None):
+        """
+        Builds the keyset query for the page after `read_watermark`. Non-rowid columns are paired
+        with rowid so rows sharing a watermark value (e.g. same updated_at) are never skipped.
+        """
+        conditions = []
+        if self.watermark_column == "rowid":
+            if self.read_watermark is not None:
+                conditions.append("rowid > ?")
+            order = "rowid"
+        else:
+            column = f'"{self.watermark_column}"'
+            conditions.append(f"{column} IS NOT NULL")
+            if self.read_watermark is not None:
+                conditions.append(f"({column}, rowid) > (?, ?)")
+            order = f"{column}, rowid"
+        params = list(self.read_watermark) if self.read_watermark is not None else []
+        if pushed:
+            conditions.append(f"({pushed[0]})")
+            params.extend(pushed[1])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"SELECT rowid, * FROM {self.table_name} {where} ORDER BY {order} LIMIT ?"
+        return query, params + [self.page_size]
+
+    def _advance_watermark(self, record: Dict, rowid: int):
+        if self.watermark_column == "rowid":
+            self.read_watermark = [rowid]
+        else:
+            self.read_watermark = [record[self.watermark_column], rowid]
+
+    async def _index_watermark(self, db):
+        """
+        Keyset pages are only cheap with an index on the watermark column (rowid needs none).
+        Creates one when missing; on a read-only database the reads work but scan the table.
+        """
+        self.watermark_indexed = True
+        if self.watermark_column == "rowid":
+            return
+        name = re.sub(r"\W", "_", f"{self.table_name}_{self.watermark_column}_sync_idx")
+        try:
+            await db.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON {self.table_name} ("{self.watermark_column}")')
+            await db.commit()
+        except Exception as e:
+            logger.warning(f"[SQLiteSource] Could not index {self.table_name}.{self.watermark_column}, "
+                           f"every poll will scan the table: {e}")
+
+    async def _fetch_after_watermark(self) -> List[Dict]:
+        """
+        Reads the rows after the acked watermark, so rows not yet acked are delivered again.
+        """
         new_records = []
-        for row in rows:
-            record = dict(zip(columns, row))
-            rid = record.get("record_id")
-            if rid and rid not in self.synced_ids:
-                new_records.append(record)
-                self.synced_ids.add(rid)
+        self.read_watermark = self.watermark
+        async with self._connect() as db:
+            if not self.watermark_indexed:
+                await self._index_watermark(db)
+            pushed = await self._filter_clause(db)
+            while True:
+                query, params = self._page_query(pushed)
+                cursor = await db.execute(query, params)
+                rows = await cursor.fetchall()
+                # first column is the rowid used for keyset ordering, not part of the record
+                columns = [desc[0] for desc in cursor.description][1:]
+                await cursor.close()
+
+                for row in rows:
+                    record = dict(zip(columns, row[1:]))
+                    self._advance_watermark(record, row[0])
+                    new_records.append(record)
+
+                if len(rows) < self.page_size:
+                    break
+                if self.max_rows_per_poll and len(new_records) >= self.max_rows_per_poll:
+                    break
 
+        if new_records:
+            logger.debug(f"[SQLiteSource] Read {len(new_records)} rows from {self.table_name} "
+                         f"up to {self.read_watermark}")
         return new_records
+
+    async def install_cdc(self, db):
+        """
+        Creates the changelog table and its triggers. On first install every existing row is
+        logged as a create, in the same transaction, so consumers start from a full copy.
+        """
+        cursor = await db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                  (self.changelog,))
+        snapshot = await cursor.fetchone() is None
+        table, log, key = self.table_name, self.changelog, f'"{self.key_column}"'
+        insert = f"INSERT INTO {log} (op, row_id, record_key)"
+        statements = [
+            f"CREATE TABLE IF NOT EXISTS {log} (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            f"op TEXT NOT NULL, row_id INTEGER NOT NULL, record_key)",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_cdc_insert AFTER INSERT ON {table} BEGIN "
+            f"{insert} VALUES ('c', NEW.rowid, NEW.{key}); END",
+            # a changed key is a delete of the old record plus an update of the new one
+            f"CREATE TRIGGER IF NOT EXISTS {table}_cdc_update AFTER UPDATE ON {table} BEGIN "
+            f"{insert} SELECT 'd', OLD.rowid, OLD.{key} WHERE OLD.{key} IS NOT NEW.{key}; "
+            f"{insert} VALUES ('u', NEW.rowid, NEW.{key}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_cdc_delete AFTER DELETE ON {table} BEGIN "
+            f"{insert} VALUES ('d', OLD.rowid, OLD.{key}); END",
+        ]
+        if snapshot:
+            statements.append(f"{insert} SELECT 'c', rowid, {key} FROM {table} ORDER BY rowid")
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            for statement in statements:
+                await db.execute(statement)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        self.cdc_installed = True
+        logger.info(f"[SQLiteSource] CDC triggers installed on {table}"
+                    + (", existing rows logged as creates" if snapshot else ""))
+
+    async def _fetch_changes(self) -> List[Dict]:
+        """
+        Reads the changelog after the last acked sequence, so unacked changes are delivered again.
+        Rows come back with an `operation` of create, update or delete, one per key: a create
+        followed by updates stays a create, and a create followed by a delete is dropped.
+        A delete followed by a create becomes an update. Updates and creates carry the current
+        row; deletes only the key column.
+        """
+        operations: Dict = {}
+        records: Dict = {}
+        seq = self.acked_seq
+        read = 0
+        key = f'"{self.key_column}"'
+        query = (f"SELECT c.seq, c.op, c.record_key, t.rowid IS NOT NULL, t.* FROM {self.changelog} c "
+                 f"LEFT JOIN {self.table_name} t ON t.rowid = c.row_id AND t.{key} IS c.record_key "
+                 f"WHERE c.seq > ? ORDER BY c.seq LIMIT ?")
+        async with self._connect() as db:
+            if not self.cdc_installed:
+                await self.install_cdc(db)
+            while True:
+                cursor = await db.execute(query, (seq, self.page_size))
+                rows = await cursor.fetchall()
+                columns = [desc[0] for desc in cursor.description][4:]
+                await cursor.close()
+
+                for row in rows:
+                    seq, operation, record_key, found = row[0], CDC_OPERATIONS[row[1]], row[2], row[3]
+                    if operation == "delete":
+                        record = {self.key_column: record_key}
+                    else:
+                        # None when the row changed key or was deleted since; a later change covers it
+                        record = dict(zip(columns, row[4:])) if found else None
+                    previous = operations.pop(record_key, None)
+                    records.pop(record_key, None)
+                    if previous == "create":
+                        if operation == "delete":
+                            continue
+                        operation = "create"
+                    elif previous == "delete" and operation == "create":
+                        operation = "update"  # re-inserted: replace whatever the sink still holds
+                    operations[record_key] = operation
+                    records[record_key] = record
+
+                read += len(rows)
+                if len(rows) < self.page_size:
+                    break
+                if self.max_rows_per_poll and read >= self.max_rows_per_poll:
+                    break
+
+        self.read_seq = seq
+        changes = [dict(record, operation=operations[record_key])
+                   for record_key, record in records.items() if record is not None]
+        if changes:
+            logger.debug(f"[SQLiteSource] Read {read} changes ({len(changes)} records) from {self.changelog}")
+        return changes
+
+    async def ack(self):
+        """
+        Marks everything returned by the last fetch as processed: the watermark is checkpointed,
+        the changelog truncated, or full-scan rows recorded as synced. Call it once the records
+        have been delivered.
+        """
+        if not self.cdc:
+            if self.pending:
+                self.dedup.add_records(self.pending, self.version_column)
+                self.pending = []
+            if self.watermark_column and self.read_watermark != self.watermark:
+                self.watermark = self.read_watermark
+                self.checkpoints.set(self.watermark_key, self.watermark)
+            return
+        if self.read_seq <= self.acked_seq:
+            return
+        async with self._connect() as db:
+            await db.execute(f"DELETE FROM {self.changelog} WHERE seq <= ?", (self.read_seq,))
+            await db.commit()
+        self.acked_seq = self.read_seq
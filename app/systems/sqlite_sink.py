@@ -1,18 +1,172 @@
+import asyncio
 import aiosqlite
+from typing import Dict, List, Tuple
+from app.core.logger import logger
+
+# tuned for a single long-lived writer connection
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA busy_timeout=5000",
+)
+
 
 class SQLiteSink:
-    def __init__(self, db_path: str, table_name: str):
+    """
+    Writes records into a SQLite table. Records carrying an `operation` (from a CDC source)
+    are applied as such: "delete" removes the row matching conflict_key, "update" upserts it
+    and "create" is written like any other record.
+    """
+
+    def __init__(self, db_path: str, table_name: str, mode: str = "ignore", conflict_key: str = "record_id"):
         self.db_path = db_path
         self.table_name = table_name
+        # "ignore" keeps the first copy of a record (INSERT OR IGNORE),
+        # "upsert" updates the existing row on a conflict_key match
+        if mode not in ("ignore", "upsert"):
+            raise ValueError(f"Unsupported SQLiteSink mode: {mode}")
+        self.mode = mode
+        self.conflict_key = conflict_key
+        self.conflict_target = False
+        self.db = None
+        self.statements = {}
+        self.lock = asyncio.Lock()
+
+    async def connect(self) -> aiosqlite.Connection:
+        if self.db is None:
+            db = await aiosqlite.connect(self.db_path)
+            try:
+                for pragma in PRAGMAS:
+                    await db.execute(pragma)
+                if self.mode == "upsert":
+                    await self._ensure_conflict_target(db)
+                    self.conflict_target = True
+            except Exception:
+                await db.close()
+                raise
+            self.db = db
+        return self.db
+
+    async def close(self):
+        async with self.lock:
+            if self.db is not None:
+                await self.db.close()
+                self.db = None
+
+    async def write_record(self, record: dict, allow_duplicates: bool = False):
+        await self.write_records([record], allow_duplicates=allow_duplicates)
+
+    async def write_records(self, records: List[Dict], allow_duplicates: bool = False):
+        """
+        With `allow_duplicates`, records in "ignore" mode are written again (INSERT OR REPLACE)
+        instead of keeping the copy already stored.
+        """
+        if not records:
+            return
+        async with self.lock:
+            db = await self.connect()
+            runs = list(self._runs(records))
+            for operation, columns, _ in runs:
+                if operation == "delete" and self.conflict_key not in columns:
+                    raise ValueError(f"Cannot delete from {self.table_name}: a delete record has no "
+                                     f"'{self.conflict_key}' column to match rows on")
+            if not self.conflict_target and any(operation == "update" for operation, _, _ in runs):
+                await self._ensure_conflict_target(db)
+                self.conflict_target = True
+            try:
+                # all runs share one implicit transaction and a single commit
+                for operation, columns, rows in runs:
+                    if operation == "delete":
+                        key = columns.index(self.conflict_key)
+                        await db.executemany(self._delete_statement(), [(row[key],) for row in rows])
+                    else:
+                        await db.executemany(self._statement(columns, upsert=operation == "update",
+                                                             replace=allow_duplicates), rows)
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+        logger.debug(f"[SQLiteSink] Wrote {len(records)} records to {self.table_name}")
+
+    @staticmethod
+    def _runs(records: List[Dict]):
+        """
+        Groups consecutive records sharing an operation and column set so each group is one
+        executemany, without reordering writes to the same record.
+        """
+        group, rows = None, []
+        for record in records:
+            operation = record.get("operation")
+            if operation is not None:
+                record = {key: value for key, value in record.items() if key != "operation"}
+            key = (operation, tuple(record.keys()))
+            if key != group and rows:
+                yield group[0], group[1], rows
+                rows = []
+            group = key
+            rows.append(tuple(record.values()))
+        if rows:
+            yield group[0], group[1], rows
+
+    def _delete_statement(self) -> str:
+        return f"DELETE FROM {self.table_name} WHERE {self.conflict_key} = ?"
+
+    def _statement(self, columns: Tuple[str, ...], upsert: bool = False, replace: bool = False) -> str:
+        upsert = upsert or self.mode == "upsert"
+        replace = replace and not upsert
+        sql = self.statements.get((columns, upsert, replace))
+        if sql is not None:
+            return sql
+
+        column_list = ', '.join(columns)
+        placeholders = ', '.join(['?'] * len(columns))
+        if upsert:
+            updates = ', '.join(f"{c} = excluded.{c}" for c in columns if c != self.conflict_key)
+            action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+            sql = (f"INSERT INTO {self.table_name} ({column_list}) VALUES ({placeholders}) "
+                   f"ON CONFLICT({self.conflict_key}) {action}")
+        else:
+            conflict = "REPLACE" if replace else "IGNORE"
+            sql = f"INSERT OR {conflict} INTO {self.table_name} ({column_list}) VALUES ({placeholders})"
+        self.statements[(columns, upsert, replace)] = sql
+        return sql
+
+    async def _ensure_conflict_target(self, db: aiosqlite.Connection):
+        """
+        ON CONFLICT needs a primary key or unique index on conflict_key; create one if missing.
+        Raises ValueError when the table cannot have one: no such column, or duplicate keys.
+        """
+        cursor = await db.execute(f"PRAGMA table_info({self.table_name})")
+        table_info = await cursor.fetchall()
+        pk_columns = [row[1] for row in table_info if row[5]]
+        if pk_columns == [self.conflict_key]:
+            return
+        if table_info and self.conflict_key not in [row[1] for row in table_info]:
+            raise ValueError(f"Cannot upsert into {self.table_name}: it has no '{self.conflict_key}' column")
+
+        cursor = await db.execute(f"PRAGMA index_list({self.table_name})")
+        for index in await cursor.fetchall():
+            if not index[2]:  # not unique
+                continue
+            info = await db.execute(f"PRAGMA index_info({index[1]})")
+            if [row[2] for row in await info.fetchall()] == [self.conflict_key]:
+                return
+
+        cursor = await db.execute(
+            f"SELECT {self.conflict_key}, COUNT(*) FROM {self.table_name} WHERE {self.conflict_key} IS NOT NULL "
+            f"GROUP BY {self.conflict_key} HAVING COUNT(*) > 1 LIMIT 1"
+        )
+        duplicate = await cursor.fetchone()
+        if duplicate:
+            raise ValueError(f"Cannot upsert into {self.table_name}: '{self.conflict_key}' is not unique "
+                             f"({duplicate[0]!r} is stored {duplicate[1]} times), so no unique index can be "
+                             f"created; remove the duplicate rows or use mode 'ignore'")
 
-    async def write_record(self, record: dict):
-        columns = ', '.join(record.keys())
-        placeholders = ', '.join(['?'] * len(record))
-        values = list(record.values())
-
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                f"INSERT OR IGNORE INTO {self.table_name} ({columns}) VALUES ({placeholders})",
-                values
-            )
-            await db.commit()
+        logger.info(f"[SQLiteSink] Creating unique index on {self.table_name}({self.conflict_key}) for upserts")
+        await db.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {self.table_name}_{self.conflict_key}_uniq "
+            f"ON {self.table_name} ({self.conflict_key})"
+        )
+        await db.commit()
@@ -22,3 +22,11 @@ def test_override_config():
         "rate_limit_per_minute": 600
     })
     assert response.status_code == 200
+
+
+def test_get_rules_supports_etag():
+    response = client.get("/v1/sync/rules")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    cached = client.get("/v1/sync/rules", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
@@ -0,0 +1,127 @@
+import json
+import sqlite3
+import pytest
+from app.systems.file import FileSink, FileSource
+from app.systems.sqlite import SQLiteSource
+from app.utils.dedup import BloomFilter, DedupIndex
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = BloomFilter(capacity=10_000, error_rate=0.01)
+    for i in range(10_000):
+        bloom.add((f"r{i}", ""))
+
+    assert all((f"r{i}", "") in bloom for i in range(10_000))
+    false_positives = sum((f"x{i}", "") in bloom for i in range(10_000))
+    assert false_positives < 300
+
+
+def test_filter_unseen_keeps_first_occurrence_in_order():
+    index = DedupIndex("test")
+    records = [{"record_id": 2}, {"record_id": 1}, {"record_id": 2}, {"name": "no id"}, {"record_id": "3"}]
+
+    assert index.filter_unseen(records, mark=True) == [{"record_id": 2}, {"record_id": 1}, {"record_id": "3"}]
+    assert index.filter_unseen([{"record_id": 3}, {"record_id": 4}]) == [{"record_id": 4}]
+    assert index.filter_unseen([{"name": "no id"}], keep_unkeyed=True) == [{"name": "no id"}]
+
+
+def test_versions_are_tracked_separately():
+    index = DedupIndex("test")
+    assert index.add("a", version=1)
+    assert not index.add("a", version=1)
+    assert index.add("a", version=2)
+
+    records = [{"record_id": "a", "updated_at": 2}, {"record_id": "a", "updated_at": 3}]
+    assert index.filter_unseen(records, version_field="updated_at") == [{"record_id": "a", "updated_at": 3}]
+
+
+def test_index_survives_restart_and_isolates_pipelines(tmp_path):
+    path = str(tmp_path / "dedup.sqlite")
+    index = DedupIndex("a", path, batch_size=10)
+    index.add_many((i, None) for i in range(25))
+    index.close()
+
+    reopened = DedupIndex("a", path)
+    assert len(reopened) == 25
+    assert reopened.contains(24)
+    assert not reopened.contains(25)
+    assert not DedupIndex("b", path).contains(1)
+
+
+def test_filter_grows_past_capacity():
+    index = DedupIndex("test", capacity=100, batch_size=7)
+    index.add_many((i, None) for i in range(1000))
+
+    assert index.bloom.capacity >= 1000
+    assert all(index.contains(i) for i in range(1000))
+    assert not index.contains(1000)
+
+
+def test_confirmed_keys_are_cached_up_to_cache_size(tmp_path):
+    path = str(tmp_path / "dedup.sqlite")
+    index = DedupIndex("a", path, batch_size=2)
+    index.add_many((i, None) for i in range(5))
+    index.close()
+
+    reopened = DedupIndex("a", path, cache_size=3)
+    records = [{"record_id": i} for i in range(6)]
+    assert reopened.filter_unseen(records) == [{"record_id": 5}]
+    assert len(reopened.confirmed) == 3
+    # served from the cache: the exact index is not consulted again
+    reopened.db.execute("DELETE FROM synced_records")
+    assert reopened.filter_unseen(records[2:]) == [{"record_id": 5}]
+
+    assert reopened.discard([4]) == 0
+    assert reopened.filter_unseen(records[2:]) == [{"record_id": 4}, {"record_id": 5}]
+
+
+@pytest.mark.asyncio
+async def test_sqlite_source_full_scan_dedup_survives_restart(tmp_path):
+    db = str(tmp_path / "src.sqlite")
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE users (record_id TEXT, name TEXT)")
+    conn.executemany("INSERT INTO users VALUES (?, ?)", [("a", "A"), ("b", "B")])
+    conn.commit()
+
+    dedup_path = str(tmp_path / "dedup.sqlite")
+    source = SQLiteSource(db, "users", dedup_path=dedup_path)
+    assert [r["record_id"] for r in await source.fetch_new_records()] == ["a", "b"]
+    # not acked, e.g. the sink write failed: delivered again
+    assert [r["record_id"] for r in await source.fetch_new_records()] == ["a", "b"]
+    await source.ack()
+    assert await source.fetch_new_records() == []
+    source.dedup.close()
+
+    conn.execute("INSERT INTO users VALUES ('c', 'C')")
+    conn.commit()
+    conn.close()
+    restarted = SQLiteSource(db, "users", dedup_path=dedup_path)
+    assert [r["record_id"] for r in await restarted.fetch_new_records()] == ["c"]
+
+
+@pytest.mark.asyncio
+async def test_file_source_json_array_is_marked_on_ack(tmp_path):
+    path = tmp_path / "source.json"
+    path.write_text(json.dumps([{"record_id": 1}, {"record_id": 2}, {"record_id": 1}]))
+    source = FileSource(str(path), dedup_path=str(tmp_path / "dedup.sqlite"))
+    assert [r["record_id"] for r in await source.fetch_new_records()] == [1, 2]
+    assert [r["record_id"] for r in await source.fetch_new_records()] == [1, 2]
+    await source.ack()
+
+    path.write_text(json.dumps([{"record_id": 1}, {"record_id": 2}, {"record_id": 3}]))
+    assert [r["record_id"] for r in await source.fetch_new_records()] == [3]
+    await source.close()
+
+
+@pytest.mark.asyncio
+async def test_file_sink_converts_legacy_id_index(tmp_path):
+    path = tmp_path / "sink.jsonl"
+    path.write_text(json.dumps({"record_id": 1}) + "\n")
+    (tmp_path / "sink.jsonl.ids").write_text("1\n")
+
+    sink = FileSink(str(path))
+    await sink.write_records([{"record_id": 1}, {"record_id": 2}])
+    await sink.close()
+
+    assert [json.loads(line)["record_id"] for line in path.read_text().splitlines()] == [1, 2]
+    assert (tmp_path / "sink.jsonl.ids").read_bytes().startswith(b"SQLite format 3")
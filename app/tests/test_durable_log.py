@@ -0,0 +1,174 @@
+import asyncio
+import os
+import pytest
+from app.services.durable_log import DurableLog
+from app.services.queue import QueueManager
+
+
+@pytest.mark.asyncio
+async def test_append_assigns_offsets_and_replays_unacked(tmp_path):
+    log = DurableLog(str(tmp_path))
+    offsets = [await log.append({"record_id": str(i)}) for i in range(3)]
+    assert offsets == [0, 1, 2]
+    log.ack([0])
+    await log.close()
+
+    reopened = DurableLog(str(tmp_path))
+    assert [offset for offset, _ in reopened.replay()] == [1, 2]
+    assert await reopened.append({"record_id": "3"}) == 3
+    await reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_appends_are_group_committed(tmp_path):
+    log = DurableLog(str(tmp_path))
+    writes = []
+    original = log._write
+    log._write = lambda first, data: (writes.append(first), original(first, data))
+    offsets = await asyncio.gather(*(log.append({"record_id": str(i)}) for i in range(50)))
+    await log.close()
+    assert sorted(offsets) == list(range(50))
+    assert len(writes) < 50
+
+
+@pytest.mark.asyncio
+async def test_out_of_order_acks_advance_contiguous_prefix(tmp_path):
+    log = DurableLog(str(tmp_path))
+    for i in range(4):
+        await log.append({"record_id": str(i)})
+    log.ack([1, 2])
+    assert log.committed == -1
+    log.ack([0])
+    assert log.committed == 2
+    await log.close()
+
+
+@pytest.mark.asyncio
+async def test_torn_tail_is_truncated_on_recovery(tmp_path):
+    log = DurableLog(str(tmp_path))
+    await log.append({"record_id": "a"})
+    await log.close()
+    segment = os.path.join(str(tmp_path), os.listdir(str(tmp_path))[0])
+    with open(segment, "a") as f:
+        f.write('[1, {"record_id": "b"')
+
+    reopened = DurableLog(str(tmp_path))
+    assert [record["record_id"] for _, record in reopened.replay()] == ["a"]
+    assert await reopened.append({"record_id": "c"}) == 1
+    await reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_committed_segments_are_deleted(tmp_path):
+    log = DurableLog(str(tmp_path), segment_bytes=1)
+    for i in range(3):
+        await log.append({"record_id": str(i)})
+    assert len(log.segments) == 3
+    log.ack([0, 1])
+    assert len(log.segments) == 1
+    await log.close()
+
+
+@pytest.mark.asyncio
+async def test_durable_queue_replays_records_not_acked(tmp_path):
+    qm = QueueManager(durable_dir=str(tmp_path))
+    for i in range(3):
+        await qm.put("salesforce", {"record_id": str(i)})
+    batch = qm.flush("salesforce", batch_size=2)
+    qm.ack("salesforce", batch.offsets)
+    await qm.close()
+
+    restarted = QueueManager(durable_dir=str(tmp_path))
+    assert [r["record_id"] for r in restarted.get_pending("salesforce")] == ["2"]
+    await restarted.close()
+
+
+@pytest.mark.asyncio
+async def test_replay_is_read_lazily_within_maxsize(tmp_path):
+    qm = QueueManager(durable_dir=str(tmp_path))
+    for i in range(5):
+        await qm.put("salesforce", {"record_id": str(i)})
+    await qm.close()
+
+    restarted = QueueManager(maxsize=2, policy="reject", durable_dir=str(tmp_path))
+    queue = restarted.queue("salesforce")
+    assert [r["record_id"] for r in restarted.get_pending("salesforce")] == ["0", "1"]
+    assert len(queue) == 5 and queue.full()
+
+    assert [r["record_id"] for r in restarted.flush("salesforce", batch_size=2)] == ["0", "1"]
+    assert [r["record_id"] for r in restarted.get_pending("salesforce")] == ["2", "3"]
+    restarted.flush("salesforce", batch_size=2)
+    assert [r["record_id"] for r in restarted.get_pending("salesforce")] == ["4"]
+    # the backlog is in memory, so new records may follow it
+    await restarted.put("salesforce", {"record_id": "5"})
+    assert [r["record_id"] for r in restarted.flush("salesforce", batch_size=2)] == ["4", "5"]
+    await restarted.close()
+
+
+@pytest.mark.asyncio
+async def test_replay_acks_offsets_missing_from_the_log(tmp_path):
+    log = DurableLog(str(tmp_path))
+    await log.append({"record_id": "a"})
+    log.next_offset += 1  # offset 1 was lost in a failed group commit
+    await log.append({"record_id": "c"})
+    await log.close()
+
+    reopened = DurableLog(str(tmp_path))
+    assert [offset for offset, _ in reopened.replay()] == [0, 2]
+    reopened.ack([0, 2])
+    assert reopened.committed == 2
+    await reopened.close()
+
+
+class FullDisk:
+    """
+    A segment file whose next write stops partway with ENOSPC.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.failed = False
+
+    def write(self, data):
+        if self.failed:
+            return self.file.write(data)
+        self.failed = True
+        self.file.write(data[:7])
+        self.file.flush()
+        raise OSError(28, "No space left on device")
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+@pytest.mark.asyncio
+async def test_a_torn_write_does_not_take_later_records_with_it(tmp_path):
+    log = DurableLog(str(tmp_path))
+    await log.append({"record_id": "a"})
+    log.file = FullDisk(log.file)
+    with pytest.raises(OSError):
+        await log.append({"record_id": "b"})
+    await log.append({"record_id": "c"})
+    await log.close()
+
+    reopened = DurableLog(str(tmp_path))
+    assert [(offset, record["record_id"]) for offset, record in reopened.replay()] == [(0, "a"), (2, "c")]
+    assert await reopened.append({"record_id": "d"}) == 3
+    await reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_replay_skips_torn_lines_inside_a_segment(tmp_path):
+    log = DurableLog(str(tmp_path))
+    await log.append({"record_id": "a"})
+    # offset 1 was torn by a failed write that could not be cut off
+    log.file.write('[1, {"record_\n')
+    log.next_offset += 1
+    await log.append({"record_id": "c"})
+    await log.close()
+
+    reopened = DurableLog(str(tmp_path))
+    assert [(offset, record["record_id"]) for offset, record in reopened.replay()] == [(0, "a"), (2, "c")]
+    reopened.ack([0, 2])
+    assert reopened.committed == 2
+    await reopened.close()
@@ -0,0 +1,70 @@
+import json
+import pytest
+from app.systems.file import FileSink
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+@pytest.mark.asyncio
+async def test_jsonl_sink_appends_batches_and_dedups(tmp_path):
+    path = str(tmp_path / "sink.jsonl")
+    sink = FileSink(path, fsync_every=2)
+
+    await sink.write_records([{"record_id": 1}, {"record_id": 2}, {"record_id": 1}])
+    await sink.write_record({"record_id": 2})
+    await sink.write_record({"record_id": 3})
+    await sink.close()
+
+    assert [r["record_id"] for r in read_jsonl(path)] == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_jsonl_sink_index_persists_across_instances(tmp_path):
+    path = str(tmp_path / "sink.jsonl")
+    sink = FileSink(path)
+    await sink.write_records([{"record_id": "a"}, {"record_id": "b"}])
+    await sink.close()
+
+    reopened = FileSink(path)
+    await reopened.write_records([{"record_id": "b"}, {"record_id": "c"}])
+    await reopened.close()
+
+    assert [r["record_id"] for r in read_jsonl(path)] == ["a", "b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_jsonl_sink_rebuilds_missing_index(tmp_path):
+    path = tmp_path / "sink.jsonl"
+    path.write_text(json.dumps({"record_id": 7}) + "\n")
+
+    sink = FileSink(str(path))
+    await sink.write_records([{"record_id": 7}, {"record_id": 8}])
+    await sink.close()
+
+    assert [r["record_id"] for r in read_jsonl(path)] == [7, 8]
+    assert (tmp_path / "sink.jsonl.ids").exists()
+
+
+@pytest.mark.asyncio
+async def test_sinks_apply_change_operations(tmp_path):
+    path = str(tmp_path / "sink.jsonl")
+    sink = FileSink(path)
+    await sink.write_records([{"record_id": 1, "name": "a"}, {"record_id": 2, "name": "b"}])
+    await sink.write_records([{"record_id": 1, "name": "a2", "operation": "update"},
+                              {"record_id": 2, "operation": "delete"}])
+    await sink.write_records([{"record_id": 2, "name": "b2", "operation": "create"}])
+    await sink.close()
+    # the JSONL file is a change log: updates and deletes are appended, a deleted record can come back
+    assert [(r["record_id"], r.get("operation")) for r in read_jsonl(path)] == \
+        [(1, None), (2, None), (1, "update"), (2, "delete"), (2, "create")]
+
+    path = tmp_path / "sink.json"
+    sink = FileSink(str(path))
+    for record in ({"record_id": 1, "name": "a"}, {"record_id": 2, "name": "b"},
+                   {"record_id": 1, "name": "a2", "operation": "update"}, {"record_id": 2, "operation": "delete"}):
+        await sink.write_record(record)
+    # the JSON array holds current state
+    assert json.loads(path.read_text()) == [{"record_id": 1, "name": "a2"}]
@@ -0,0 +1,177 @@
+import json
+import os
+import pytest
+from app.systems.file import FileSource
+
+
+def append(path, records, sep="\n"):
+    with open(path, "a") as f:
+        f.write("".join(json.dumps(r) + sep for r in records))
+
+
+@pytest.mark.asyncio
+async def test_jsonl_source_reads_only_appended_records(tmp_path):
+    path = str(tmp_path / "source.jsonl")
+    append(path, [{"record_id": 1}, {"record_id": 2}])
+
+    source = FileSource(path)
+    assert [r["record_id"] for r in await source.fetch_new_records()] == [1, 2]
+    await source.ack()
+    assert await source.fetch_new_records() == []
+
+    append(path, [{"record_id": 3}])
+    with open(path, "a") as f:
+        f.write('{"record_id": 4')  # half-written line
+    assert [r["record_id"] for r in await source.fetch_new_records()] == [3]
+    await source.ack()
+
+    with open(path, "a") as f:
+        f.write("}\n")
+    assert [r["record_id"] for r in await source.fetch_new_records()] == [4]
+    await source.ack()
+
+
+@pytest.mark.asyncio
+async def test_concatenated_json_source(tmp_path):
+    path = str(tmp_path / "source.json")
+    with open(path, "w") as f:
+        f.write('{"record_id": "é1"} {"record_id": "b"}\n{"record_id": ')
+
+    source = FileSource(path, format="json-stream", chunk_size=7)
+    assert [r["record_id"] for r in await source.fetch_new_records()] == ["é1", "b"]
+    await source.ack()
+
+    with open(path, "a") as f:
+        f.write('"c"}')
+    assert [r["record_id"] for r in await source.fetch_new_records()] == ["c"]
+    await source.ack()
+
+
+@pytest.mark.asyncio
+async def test_concatenated_json_source_skips_malformed_values(tmp_path):
+    path = str(tmp_path / "source.json")
+    with open(path, "w") as f:
+        f.write('{"record_id": 1} {"record_id": x} 42 [1] {"record_id": 2} {"record_id": 3, "n": tr')
+
+    source = FileSource(path, format="json-stream", chunk_size=5)
+    assert [r["record_id"] for r in await source.fetch_new_records()] == [1, 2]
+    await source.ack()
+
+    with open(path, "a") as f:
+        f.write('ue}')
+    assert [r["record_id"] for r in await source.fetch_new_records()] == [3]
+    await source.ack()
+    await source.close()
+    assert source.file is None
+
+
+@pytest.mark.asyncio
+async def test_jsonl_source_handles_rotation_and_truncation(tmp_path):
+    path = str(tmp_path / "source.jsonl")
+    append(path, [{"record_id": 1}])
+
+    source = FileSource(path)
+    assert len(await source.fetch_new_records()) == 1
+    await source.ack()
+
+    # rotate: the tail of the old file is drained before following the new one
+    append(path, [{"record_id": 2}])
+    os.rename(path, path + ".1")
+    append(path, [{"record_id": 3}])
+    assert [r["record_id"] for r in await source.fetch_new_records()] == [2, 3]
+    await source.ack()
+
+    # truncate in place
+    with open(path, "w") as f:
+        f.write("")
+    assert await source.fetch_new_records() == []
+    await source.ack()
+    append(path, [{"record_id": 4}])
+    assert [r["record_id"] for r in await source.fetch_new_records()] == [4]
+    await source.ack()
+
+
+@pytest.mark.asyncio
+async def test_jsonl_source_resumes_from_checkpoint(tmp_path):
+    path = str(tmp_path / "source.jsonl")
+    checkpoint = str(tmp_path / "checkpoint.json")
+    append(path, [{"record_id": 1}, {"record_id": 2}, {"record_id": 3}])
+
+    source = FileSource(path, checkpoint_path=checkpoint, max_records_per_poll=2)
+    assert [r["record_id"] for r in await source.fetch_new_records()] == [1, 2]
+    await source.ack()
+
+    restarted = FileSource(path, checkpoint_path=checkpoint)
+    assert [r["record_id"] for r in await restarted.fetch_new_records()] == [3]
+    await restarted.ack()
+
+
+@pytest.mark.asyncio
+async def test_unacked_records_are_read_again_also_after_restart_and_rotation(tmp_path):
+    path = str(tmp_path / "source.jsonl")
+    checkpoint = str(tmp_path / "checkpoint.json")
+    append(path, [{"record_id": 1}, {"record_id": 2}])
+
+    source = FileSource(path, checkpoint_path=checkpoint)
+    assert [r["record_id"] for r in await source.fetch_new_records()] == [1, 2]
+    assert [r["record_id"] for r in await source.fetch_new_records()] == [1, 2]
+    restarted = FileSource(path, checkpoint_path=checkpoint)
+    assert [r["record_id"] for r in await restarted.fetch_new_records()] == [1, 2]
+    await restarted.ack()
+
+    append(path, [{"record_id": 3}])
+    os.rename(path, path + ".1")
+    append(path, [{"record_id": 4}])
+    assert [r["record_id"] for r in await restarted.fetch_new_records()] == [3, 4]
+    # the rotated file is kept open until its records are acked
+    assert [r["record_id"] for r in await restarted.fetch_new_records()] == [3, 4]
+    await restarted.ack()
+    assert restarted.committed_file is None
+    assert await restarted.fetch_new_records() == []
+    await restarted.close()
+    await source.close()
+
+
+@pytest.mark.asyncio
+async def test_file_poller_redelivers_after_a_failed_sink_write(tmp_path):
+    from app.services.pollers.file_poller import FilePoller
+
+    class FailsOnceSink:
+        def __init__(self):
+            self.failed = False
+            self.written = []
+
+        async def write_records(self, records):
+            if not self.failed:
+                self.failed = True
+                raise OSError("disk full")
+            self.written.extend(record["record_id"] for record in records)
+
+    path = str(tmp_path / "source.jsonl")
+    append(path, [{"record_id": 1}, {"record_id": 2}])
+    rules = tmp_path / "rules.json"
+    rules.write_text(json.dumps({"mappings": {"record_id": "record_id"}}))
+    sink = FailsOnceSink()
+    poller = FilePoller(FileSource(path, checkpoint_path=str(tmp_path / "checkpoint.json")), sink,
+                        rules_path=str(rules))
+
+    with pytest.raises(OSError):
+        await poller.poll_once()
+    assert await poller.poll_once() == 2
+    assert sink.written == [1, 2]
+    assert await poller.poll_once() == 0
+
+
+@pytest.mark.asyncio
+async def test_rotation_before_the_first_ack_is_read_again(tmp_path):
+    path = str(tmp_path / "source.jsonl")
+    append(path, [{"record_id": 1}])
+    source = FileSource(path)
+    assert [r["record_id"] for r in await source.fetch_new_records()] == [1]
+    os.rename(path, path + ".1")
+    append(path, [{"record_id": 2}])
+    assert [r["record_id"] for r in await source.fetch_new_records()] == [1, 2]
+    assert [r["record_id"] for r in await source.fetch_new_records()] == [1, 2]
+    await source.ack()
+    assert await source.fetch_new_records() == []
+    await source.close()
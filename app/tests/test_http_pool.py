@@ -0,0 +1,56 @@
+import asyncio
+import pytest
+import respx
+import httpx
+from app.crms.http import CRMHttpPool
+from app.crms.salesforce import SalesforceCRM
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_one_client_per_crm():
+    pool = CRMHttpPool()
+    client = pool.client("salesforce")
+    assert pool.client("salesforce") is client
+    assert pool.client("outreach") is not client
+
+    await pool.shutdown()
+    assert client.is_closed
+    assert pool.client("salesforce") is not client
+    await pool.shutdown()
+
+
+def test_pool_keeps_one_client_per_event_loop():
+    pool = CRMHttpPool()
+
+    async def lookup():
+        return pool.client("salesforce")
+
+    loop = asyncio.new_event_loop()
+    first = loop.run_until_complete(lookup())
+    assert loop.run_until_complete(lookup()) is first
+    loop.close()
+
+    second = asyncio.run(lookup())
+    assert second is not first
+    # the client of the closed loop is not kept around
+    assert list(pool.clients.values()) == [second]
+
+
+def test_pool_settings_fall_back_to_http_section():
+    settings = CRMHttpPool().settings("salesforce")
+    assert settings["max_connections"] == 100
+    assert settings["http2"] is False
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_crm_pushes_share_the_pooled_client():
+    route = respx.post("https://fake.salesforce.com/sobjects/Account").mock(
+        return_value=httpx.Response(201, json={"id": "001ABC"})
+    )
+    crm = SalesforceCRM(config={})
+    client = crm.http_client
+    for _ in range(3):
+        await crm.push_actual({"FirstName": "John"})
+    assert route.call_count == 3
+    assert crm.http_client is client
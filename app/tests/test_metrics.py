@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.testclient import TestClient
+from app.main import app
+from app.utils.metrics import MetricsRegistry
+
+
+def test_counter_sums_per_thread_cells():
+    registry = MetricsRegistry()
+    counter = registry.counter("events", "Events", ("crm",))
+
+    def work(_):
+        child = counter.labels("salesforce")
+        for _ in range(10000):
+            child.inc()
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(work, range(8)))
+    assert counter.labels(crm="salesforce").value() == 80000
+    assert 'events_total{crm="salesforce"} 80000' in registry.render()
+
+
+def test_histogram_and_gauge_render_in_text_format():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5):
+        histogram.labels("push").observe(value)
+    depth = {"n": 3}
+    registry.gauge("depth", "Depth", ("crm",)).labels("outreach").set_function(lambda: depth["n"])
+
+    text = registry.render()
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{stage="push",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{stage="push",le="1"} 2' in text
+    assert 'latency_seconds_bucket{stage="push",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{stage="push"} 3' in text
+    assert 'depth{crm="outreach"} 3' in text
+
+
+def test_metrics_endpoint_reports_sync_counters():
+    client = TestClient(app)
+    client.post("/v1/sync/", json={"operation": "create", "record_id": "m1",
+                                   "data": {"email": "a@b.c"}, "crm": "salesforce"})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "sync_records_enqueued_total" in response.text
+    assert 'sync_queue_depth{crm="salesforce"}' in response.text
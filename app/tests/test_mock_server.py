@@ -0,0 +1,78 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from app.crms import base, outreach, salesforce
+from app.crms.http import http_pool
+from app.crms.mock_server import MockSettings, create_app
+from app.crms.outreach import OutreachCRM
+from app.crms.salesforce import SalesforceCRM
+
+
+def test_mock_crm_url_environment_variable_points_the_plugins(monkeypatch):
+    monkeypatch.setenv("MOCK_CRM_URL", "http://127.0.0.1:9000/")
+    assert base.mock_server_url() == "http://127.0.0.1:9000"
+    monkeypatch.delenv("MOCK_CRM_URL")
+    assert base.mock_server_url() is None
+
+
+def test_salesforce_collection_and_paginated_query():
+    client = TestClient(create_app(MockSettings(page_size=2)))
+    payload = {"records": [{"attributes": {"type": "Account"}, "Name": f"n{i}"} for i in range(5)]}
+    results = client.post("/salesforce/composite/sobjects", json=payload).json()
+    assert all(result["success"] for result in results)
+
+    page = client.get("/salesforce/query").json()
+    names = [record["Name"] for record in page["records"]]
+    while not page["done"]:
+        page = client.get(page["nextRecordsUrl"]).json()
+        names += [record["Name"] for record in page["records"]]
+    assert names == [f"n{i}" for i in range(5)]
+
+
+def test_per_token_quota_answers_429_with_retry_after():
+    client = TestClient(create_app(MockSettings(quota=2, quota_window=30)))
+    headers = {"Authorization": "Bearer a"}
+    assert [client.post("/outreach/prospects", json={}, headers=headers).status_code for _ in range(3)] == [201, 201, 429]
+    throttled = client.post("/outreach/prospects", json={}, headers=headers)
+    assert 1 <= int(throttled.headers["Retry-After"]) <= 30
+    # quotas are per token
+    assert client.post("/outreach/prospects", json={}, headers={"Authorization": "Bearer b"}).status_code == 201
+
+
+def test_failure_knobs_can_change_while_running():
+    client = TestClient(create_app(MockSettings(seed=1)))
+    assert client.put("/_mock/settings", json={"error_rate": 1.0}).status_code == 200
+    assert client.post("/salesforce/sobjects/Account", json={}).status_code == 503
+    client.put("/_mock/settings", json={"error_rate": 0.0, "item_error_rate": 1.0})
+    bulk = client.post("/outreach/prospects/bulk", json={"data": [{"attributes": {}}] * 3}).json()
+    assert all("errors" in item for item in bulk["data"])
+    assert client.put("/_mock/settings", json={"latency_distribution": "bimodal"}).status_code == 400
+    assert client.get("/_mock/stats").json()["responses"]["POST /salesforce/sobjects/{sobject} 503"] == 1
+
+
+@pytest.mark.asyncio
+async def test_plugins_push_and_pull_through_the_mock_server(monkeypatch):
+    app = create_app(MockSettings(page_size=50))
+    for module in (base, salesforce, outreach):
+        monkeypatch.setattr(module, "mock_server_url", lambda: "http://mock")
+    transport = httpx.ASGITransport(app=app)
+    monkeypatch.setattr(http_pool, "client", lambda crm: httpx.AsyncClient(transport=transport))
+
+    crm = SalesforceCRM(config={})
+    assert crm.api_url == "http://mock/salesforce"
+    results = await crm.push_batch([{"Name": f"n{i}"} for i in range(120)])
+    assert all(result.success for result in results)
+    pulled = await crm.pull()
+    assert pulled == [{"Name": f"n{i}"} for i in range(120)]
+
+    # same shape as the in-process mock store
+    monkeypatch.setattr(salesforce, "mock_server_url", lambda: None)
+    offline = SalesforceCRM(config={})
+    monkeypatch.setattr(SalesforceCRM, "mock_store", [])
+    await offline.push_batch([{"Name": "n0"}])
+    assert await offline.pull() == [{"Name": "n0"}]
+
+    prospects = OutreachCRM(config={})
+    results = await prospects.push_batch([{"firstName": f"p{i}"} for i in range(3)])
+    assert all(result.success for result in results)
+    assert len(app.state.mock.records["outreach"]) == 3
@@ -37,3 +37,63 @@ async def test_outreach_push_failure():
     }
     with pytest.raises(Exception):
         await crm.push(data)
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_outreach_push_batch_uses_bulk_endpoint():
+    route = respx.post("https://api.outreach.io/api/v2/prospects/bulk").mock(
+        return_value=httpx.Response(200, json={"data": [
+            {"type": "prospect", "id": "1"},
+            {"errors": [{"detail": "Email already taken"}]},
+        ]})
+    )
+
+    crm = OutreachCRM(config={})
+    results = await crm.push_batch([{"firstName": "A"}, {"firstName": "B"}])
+
+    assert route.call_count == 1
+    assert [r.success for r in results] == [True, False]
+    assert results[1].error == "Email already taken"
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_outreach_push_batch_fails_records_missing_from_the_response():
+    respx.post("https://api.outreach.io/api/v2/prospects/bulk").mock(
+        return_value=httpx.Response(200, json={"data": [{"type": "prospect", "id": "1"}]})
+    )
+
+    crm = OutreachCRM(config={})
+    results = await crm.push_batch([{"firstName": "A"}, {"firstName": "B"}, {"firstName": "C"}])
+
+    assert [r.success for r in results] == [True, False, False]
+    assert "no result" in results[2].error
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_outreach_push_batch_falls_back_to_single_pushes():
+    respx.post("https://api.outreach.io/api/v2/prospects/bulk").mock(return_value=httpx.Response(405))
+    single = respx.post("https://api.outreach.io/api/v2/prospects").mock(
+        side_effect=[httpx.Response(201, json={}), httpx.Response(500, json={})]
+    )
+
+    crm = OutreachCRM(config={})
+    results = await crm.push_batch([{"firstName": "A"}, {"firstName": "B"}])
+
+    assert single.call_count == 2
+    assert sorted(r.success for r in results) == [False, True]
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_outreach_push_batch_reports_retry_after_of_a_429():
+    respx.post("https://api.outreach.io/api/v2/prospects/bulk").mock(
+        return_value=httpx.Response(429, headers={"Retry-After": "7"})
+    )
+
+    crm = OutreachCRM(config={})
+    results = await crm.push_batch([{"firstName": "A"}, {"firstName": "B"}])
+
+    assert [(r.success, r.retry_after) for r in results] == [(False, 7.0), (False, 7.0)]
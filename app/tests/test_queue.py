@@ -1,5 +1,6 @@
+import asyncio
 import pytest
-from app.services.queue import QueueManager
+from app.services.queue import QueueManager, QueueFullError
 
 
 def test_enqueue_and_flush():
@@ -19,3 +20,80 @@ def test_multiple_crm_queues():
     qm.enqueue("hubspot", {"record_id": "b"})
     assert len(qm.get_pending("salesforce")) == 1
     assert len(qm.get_pending("hubspot")) == 1
+
+
+def test_flush_returns_records_in_order():
+    qm = QueueManager()
+    for i in range(5):
+        qm.enqueue("outreach", {"record_id": str(i)})
+    batch = qm.flush("outreach", batch_size=3)
+    assert [r["record_id"] for r in batch] == ["0", "1", "2"]
+    assert qm.size("outreach") == 2
+
+
+def test_reject_policy_raises_when_full():
+    qm = QueueManager(maxsize=2, policy="reject")
+    qm.enqueue("salesforce", {"record_id": "a"})
+    qm.enqueue("salesforce", {"record_id": "b"})
+    with pytest.raises(QueueFullError):
+        qm.enqueue("salesforce", {"record_id": "c"})
+    assert qm.depths() == {"salesforce": 2}
+
+
+@pytest.mark.asyncio
+async def test_block_policy_waits_for_room_in_fifo_order():
+    qm = QueueManager(maxsize=1, policy="block")
+    await qm.put("salesforce", {"record_id": "a"})
+
+    waiters = [asyncio.create_task(qm.put("salesforce", {"record_id": rid})) for rid in ("b", "c")]
+    await asyncio.sleep(0)
+    assert not any(w.done() for w in waiters)
+
+    assert [r["record_id"] for r in qm.flush("salesforce", 1)] == ["a"]
+    await asyncio.sleep(0)
+    assert [r["record_id"] for r in qm.flush("salesforce", 1)] == ["b"]
+    await asyncio.sleep(0)
+    assert [r["record_id"] for r in qm.flush("salesforce", 1)] == ["c"]
+    await asyncio.gather(*waiters)
+
+
+@pytest.mark.asyncio
+async def test_block_policy_times_out():
+    qm = QueueManager(maxsize=1, policy="block")
+    await qm.put("salesforce", {"record_id": "a"})
+    with pytest.raises(QueueFullError):
+        await qm.put("salesforce", {"record_id": "b"}, timeout=0.01)
+    assert qm.size("salesforce") == 1
+
+
+def test_spill_policy_overflows_to_disk_in_order(tmp_path):
+    qm = QueueManager(maxsize=2, policy="spill", spill_dir=str(tmp_path))
+    for i in range(5):
+        qm.enqueue("salesforce", {"record_id": i})
+    assert qm.size("salesforce") == 5
+    assert len(qm.get_pending("salesforce")) == 2
+
+    flushed = []
+    while qm.size("salesforce"):
+        flushed.extend(r["record_id"] for r in qm.flush("salesforce", 2))
+    assert flushed == [0, 1, 2, 3, 4]
+    assert not (tmp_path / "salesforce.jsonl").exists()
+
+
+def test_retry_backs_off_exponentially_and_honours_retry_after():
+    qm = QueueManager()
+    queue = qm.queue("outreach")
+    queue.max_attempts, queue.retry_backoff, queue.max_retry_backoff = 10, 1.0, 3.0
+    assert qm.backoff("outreach") == 0
+
+    qm.retry("outreach", [(None, {"record_id": "a"}, 0)])
+    assert 0.9 < qm.backoff("outreach") <= 1.0
+    queue.retry_at = 0.0
+    qm.retry("outreach", [(None, {"record_id": "a"}, 1)])
+    assert 1.9 < qm.backoff("outreach") <= 2.0
+    queue.retry_at = 0.0
+    qm.retry("outreach", [(None, {"record_id": "a"}, 5)])
+    assert 2.9 < qm.backoff("outreach") <= 3.0
+    queue.retry_at = 0.0
+    qm.retry("outreach", [(None, {"record_id": "a"}, 0)], retry_after=10)
+    assert 9.9 < qm.backoff("outreach") <= 10.0
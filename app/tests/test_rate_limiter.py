@@ -0,0 +1,57 @@
+import asyncio
+import pytest
+from app.utils.rate_limiter import TokenBucketRateLimiter, RateLimitTimeout, customer_limits
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_allows_burst_then_refills():
+    clock = FakeClock()
+    limiter = TokenBucketRateLimiter(max_requests=2, window=2, clock=clock)
+    assert limiter.allow("a") and limiter.allow("a")
+    assert not limiter.allow("a")
+    clock.now = 1.0  # one token back at 1 token/s
+    assert limiter.allow("a")
+    assert not limiter.allow("a")
+
+
+def test_keys_have_independent_limits():
+    clock = FakeClock()
+    limiter = TokenBucketRateLimiter(max_requests=1, window=1, clock=clock)
+    limiter.configure("customer1:salesforce", 3, 10)
+    assert limiter.allow("default:salesforce")
+    assert not limiter.allow("default:salesforce")
+    assert all(limiter.allow("customer1:salesforce") for _ in range(3))
+    assert not limiter.allow("customer1:salesforce")
+
+
+def test_customer_limits_fall_back_to_default_section():
+    assert customer_limits("surya") == (5, 10.0)
+    assert customer_limits("unknown-customer") == (10, 10.0)
+
+
+@pytest.mark.asyncio
+async def test_acquire_waits_for_capacity_in_fifo_order():
+    limiter = TokenBucketRateLimiter(max_requests=1, window=0.05)
+    order = []
+
+    async def worker(i):
+        await limiter.acquire("k")
+        order.append(i)
+
+    await asyncio.gather(*(worker(i) for i in range(4)))
+    assert order == [0, 1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_acquire_times_out_without_taking_tokens():
+    limiter = TokenBucketRateLimiter(max_requests=1, window=10)
+    await limiter.acquire("k")
+    with pytest.raises(RateLimitTimeout):
+        await limiter.acquire("k", timeout=0.01)
@@ -0,0 +1,64 @@
+import os
+import uuid
+import pytest
+import redis.asyncio as redis
+from app.utils.rate_limiter import RateLimitTimeout
+from app.utils.redis_state import RedisCircuitBreaker, RedisTokenBucketRateLimiter, build_circuit_breaker
+
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/15")
+
+
+@pytest.fixture
+async def redis_server():
+    client = redis.from_url(REDIS_URL, socket_connect_timeout=0.2, decode_responses=True)
+    try:
+        await client.ping()
+    except (redis.RedisError, OSError):
+        await client.aclose()
+        pytest.skip(f"no redis-server at {REDIS_URL}")
+    yield client
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_local_buckets_when_redis_is_down():
+    client = redis.from_url("redis://127.0.0.1:1/0", socket_connect_timeout=0.1)
+    limiter = RedisTokenBucketRateLimiter(client, max_requests=2, window=60)
+    await limiter.acquire("customer1:salesforce")
+    await limiter.acquire("customer1:salesforce")
+    assert limiter.offline_until > 0
+    assert not limiter.allow("customer1:salesforce")
+    await client.aclose()
+
+
+def test_breaker_mirror_follows_remote_state():
+    client = redis.from_url("redis://127.0.0.1:1/0")
+    breaker = RedisCircuitBreaker("customer1:salesforce", client, failure_threshold=2, recovery_timeout=60)
+    breaker.apply({"state": "OPEN", "failures": "2", "opened_at": "9999999999"})
+    assert not breaker.allow_request()
+    breaker.apply({"state": "CLOSED", "failures": "0"})
+    assert breaker.allow_request()
+
+
+@pytest.mark.asyncio
+async def test_replicas_share_one_bucket(redis_server):
+    prefix = f"test:{uuid.uuid4().hex}"
+    replicas = [RedisTokenBucketRateLimiter(redis_server, prefix=prefix, max_requests=3, window=60)
+                for _ in range(2)]
+    for i in range(3):
+        await replicas[i % 2].acquire("customer1:salesforce", timeout=1)
+    with pytest.raises(RateLimitTimeout):
+        await replicas[1].acquire("customer1:salesforce", timeout=0.01)
+
+
+@pytest.mark.asyncio
+async def test_breaker_state_is_shared_through_limiter_checks(redis_server):
+    prefix = f"test:{uuid.uuid4().hex}"
+    first, second = (RedisTokenBucketRateLimiter(redis_server, prefix=prefix, max_requests=100, window=1)
+                     for _ in range(2))
+    opener = build_circuit_breaker("k", first, failure_threshold=1, recovery_timeout=60)
+    watcher = build_circuit_breaker("k", second, failure_threshold=1, recovery_timeout=60)
+    opener.record_failure()
+    await next(iter(opener.tasks))
+    await second.acquire("k")
+    assert not watcher.allow_request()
@@ -0,0 +1,194 @@
+import json
+import os
+import time
+import pytest
+from app.core.constants import DEFAULT_VECTORIZE_MIN_ROWS
+from app.services.rules_compiler import compile_rules
+from app.services.rules_engine import RulesEngine
+from app.services.rules_registry import RulesRegistry
+
+RULES = {
+    "salesforce": {"required_fields": ["email"], "disallow_if": {"do_not_sync": True}},
+    "filters": {"status": "active", "region": "emea"},
+    "mappings": {"record_id": "record_id", "full_name": "name", "email_address": "email"},
+}
+
+
+def test_should_sync_applies_per_crm_rules():
+    compiled = compile_rules(RULES)
+    assert compiled.should_sync("salesforce", {"data": {"email": "a@b.com"}})
+    assert not compiled.should_sync("salesforce", {"data": {"email": ""}})
+    assert not compiled.should_sync("salesforce", {"data": {"email": "a@b.com", "do_not_sync": True}})
+    assert compiled.should_sync("outreach", {"data": {}})
+
+
+def test_match_requires_every_filter():
+    compiled = compile_rules(RULES)
+    assert compiled.match({"status": "active", "region": "emea"})
+    assert not compiled.match({"status": "active", "region": "apac"})
+    assert compile_rules({}).match({"anything": 1})
+
+
+def test_transform_projects_present_fields():
+    compiled = compile_rules(RULES)
+    record = {"record_id": "1", "full_name": "Ada", "email_address": "ada@x.io", "extra": True}
+    assert compiled.transform(record) == {"record_id": "1", "name": "Ada", "email": "ada@x.io"}
+    assert compiled.transform({"record_id": "2"}) == {"record_id": "2"}
+
+
+def test_snapshot_is_isolated_from_caller_edits_and_swapped_on_update(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(RULES))
+    engine = RulesEngine(str(path))
+    before = engine.compiled
+
+    rules = dict(RULES, filters={"status": "archived"})
+    engine.update_rules(rules)
+    rules["filters"]["status"] = "mutated"
+    assert engine.compiled is not before
+    assert engine.match({"status": "archived"})
+    assert before.match({"status": "active", "region": "emea"})
+
+
+def test_batch_apis_match_per_record_evaluation():
+    compiled = compile_rules(RULES)
+    records = [
+        {"record_id": "1", "full_name": "Ada", "email_address": "a@x", "status": "active", "region": "emea"},
+        {"record_id": "2", "full_name": "Bob", "status": "active", "region": "apac"},
+        {"record_id": "3", "status": "active", "region": "emea"},
+    ]
+    mask = compiled.match_batch(records)
+    assert list(mask) == [compiled.match(r) for r in records]
+    expected = [compiled.transform(r) for r in records if compiled.match(r)]
+    assert compiled.transform_batch(records, mask) == expected
+    assert compiled.select_batch(records) == expected
+    # a batch where every mapped field is present takes the single-comprehension path
+    assert compiled.select_batch(records[:2]) == [compiled.transform(records[0])]
+    assert compile_rules({"mappings": {"a": "b"}}).select_batch([{"a": 1}, {"c": 2}]) == [{"b": 1}, {}]
+
+
+def test_columnar_batch_selects_and_renames_columns():
+    compiled = compile_rules(RULES)
+    columns = {
+        "record_id": ["1", "2", "3"],
+        "full_name": ["Ada", "Bob", "Cy"],
+        "status": ["active", "active", "archived"],
+        "region": ["emea", "apac", "emea"],
+    }
+    mask = compiled.match_batch(columns)
+    assert list(mask) == [True, False, False]
+    projected = compiled.transform_batch(columns, mask)
+    assert {key: list(values) for key, values in projected.items()} == {"record_id": ["1"], "name": ["Ada"]}
+
+
+def test_columnar_batch_vectorized_path():
+    np = pytest.importorskip("numpy")
+    compiled = compile_rules(RULES)
+    rows = DEFAULT_VECTORIZE_MIN_ROWS
+    columns = {
+        "record_id": [str(i) for i in range(rows)],
+        "status": ["active" if i % 2 else "archived" for i in range(rows)],
+        "region": np.array(["emea"] * rows),
+    }
+    mask = compiled.match_batch(columns)
+    assert isinstance(mask, np.ndarray)
+    assert int(mask.sum()) == rows // 2
+    assert list(compiled.transform_batch(columns, mask)["record_id"][:2]) == ["1", "3"]
+
+
+def test_engines_on_one_path_share_hot_reloaded_snapshots(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(RULES))
+    registry = RulesRegistry()
+    first = registry.snapshot(str(path))
+    slot = registry.slot(str(path))
+
+    updated = registry.update(str(path), dict(RULES, filters={"status": "archived"}))
+    assert updated.version == first.version + 1
+    assert slot.snapshot is updated
+    assert registry.snapshot(str(path)).compiled.match({"status": "archived"})
+
+    path.write_text(json.dumps(dict(RULES, filters={"status": "deleted"})))
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+    registry.refresh()
+    assert registry.snapshot(str(path)).compiled.match({"status": "deleted"})
+
+    path.write_text("{not json")
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 2_000_000))
+    registry.refresh()
+    assert registry.snapshot(str(path)).compiled.match({"status": "deleted"})
+
+
+def test_operators_compile_to_predicates():
+    compiled = compile_rules({"filters": {
+        "region": {"in": ["emea", "apac"]},
+        "age": {"gte": 18, "lt": 65},
+        "email": {"prefix": "ops-"},
+        "any": [{"tier": "gold"}, {"spend": {"gt": 1000}}],
+        "not": {"name": {"regex": "^test"}},
+        "deleted_at": {"is_null": True},
+    }})
+    record = {"region": "emea", "age": 30, "email": "ops-1@x", "tier": "silver", "spend": 5000, "name": "ada"}
+    assert compiled.match(record)
+    assert not compiled.match(dict(record, age="30"))
+    assert not compiled.match(dict(record, spend=10))
+    assert not compiled.match(dict(record, name="test-user"))
+    assert not compiled.match(dict(record, deleted_at="2024-01-01"))
+    assert compiled.match_batch([record, dict(record, region="amer")]) == [True, False]
+    columns = {key: [value] for key, value in record.items()}
+    assert list(compiled.match_batch(columns)) == [True]
+
+
+def test_disallow_if_accepts_operators():
+    compiled = compile_rules({"salesforce": {"disallow_if": {"status": {"in": ["archived", "deleted"]}}}})
+    assert compiled.should_sync("salesforce", {"data": {"status": "active"}})
+    assert not compiled.should_sync("salesforce", {"data": {"status": "deleted"}})
+
+
+@pytest.mark.parametrize("types", [("", ""), ("TEXT", "INTEGER"), ("REAL", "NUMERIC"), ("VARCHAR(10)", "BLOB")])
+def test_pushed_sql_never_rejects_rows_python_accepts(types):
+    import random
+    import sqlite3
+    from app.systems.sqlite import _regexp
+
+    conn = sqlite3.connect(":memory:")
+    conn.create_function("regexp", 2, _regexp)
+    conn.execute(f"CREATE TABLE t (a {types[0]}, b {types[1]})")
+    values = [None, 0, 1, 2.5, "", "x", "xy", "y", "1", "1x"]
+    conn.executemany("INSERT INTO t VALUES (?, ?)", [(a, b) for a in values for b in values])
+    # read back: the column affinity may have converted what was inserted
+    rows = conn.execute("SELECT a, b FROM t").fetchall()
+    columns = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(t)")}
+    leaves = [{"eq": 1}, {"ne": "x"}, {"ne": 1}, {"eq": "1"}, {"in": [1, "x", None]}, {"gte": 1}, {"lt": "y"},
+              {"prefix": "x"}, {"prefix": "1"}, {"regex": "^x"}, {"is_null": True}, {"is_null": False}]
+    random.seed(7)
+    for _ in range(400):
+        a, b = random.choice(leaves), random.choice(leaves)
+        # "c" is not a column: SQLite would read it as the string literal 'c'
+        other = random.choice(["b", "c", "A"])
+        combinator = random.choice(["all", "any", "not"])
+        filters = {"all": [{"a": a}, {other: b}]} if combinator == "all" else \
+            {"any": [{"a": a}, {other: b}]} if combinator == "any" else {"not": {"a": a}, other: b}
+        compiled = compile_rules({"filters": filters})
+        expected = {row for row in rows if compiled.match({"a": row[0], "b": row[1]})}
+        pushed = compiled.pushdown(columns)
+        if pushed is None:
+            continue
+        where, params, _ = pushed
+        selected = set(conn.execute(f"SELECT a, b FROM t WHERE {where}", params).fetchall())
+        assert expected <= selected, (types, filters)
+
+
+def test_pushdown_skips_unknown_columns_and_converting_affinities():
+    compiled = compile_rules({"filters": {"missing": {"is_null": True}, "name": {"ne": 5}, "age": {"eq": "5"}}})
+    assert compiled.pushdown({"name": "TEXT", "age": "INTEGER"}) is None
+    compiled = compile_rules({"filters": {"name": {"ne": "5"}, "age": {"gte": 5}}})
+    assert compiled.pushdown({"name": "TEXT", "age": "INTEGER"}) == ('("age" >= ?) AND ("name" IS NOT ?)', (5, "5"), False)
+
+
+def test_in_accepts_unhashable_values():
+    compiled = compile_rules({"filters": {"tags": {"in": [["a"], "b"]}, "kind": {"in": ["x", "y"]}}})
+    assert compiled.match({"tags": ["a"], "kind": "x"})
+    assert not compiled.match({"tags": "b", "kind": ["x"]})
+    assert not compiled.match({"tags": {"a": 1}, "kind": "x"})
@@ -40,3 +40,37 @@ async def test_salesforce_push_failure():
 
     with pytest.raises(httpx.HTTPStatusError):
         await crm.push_actual(data)
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_salesforce_push_batch_actual_uses_collections():
+    route = respx.post("https://fake.salesforce.com/composite/sobjects").mock(
+        return_value=httpx.Response(200, json=[
+            {"id": "001A", "success": True, "errors": []},
+            {"success": False, "errors": [{"message": "Required field missing"}]},
+        ])
+    )
+
+    crm = SalesforceCRM(config={})
+    results = await crm.push_batch_actual([{"FirstName": "A"}, {"FirstName": "B"}])
+
+    assert route.call_count == 1
+    assert [r.success for r in results] == [True, False]
+    assert results[0].crm_id == "001A"
+    assert results[1].error == "Required field missing"
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_salesforce_push_batch_actual_falls_back_to_single_pushes():
+    respx.post("https://fake.salesforce.com/composite/sobjects").mock(return_value=httpx.Response(404))
+    single = respx.post("https://fake.salesforce.com/sobjects/Account").mock(
+        return_value=httpx.Response(201, json={"id": "001ABC"})
+    )
+
+    crm = SalesforceCRM(config={})
+    results = await crm.push_batch_actual([{"FirstName": "A"}, {"FirstName": "B"}, {"FirstName": "C"}])
+
+    assert single.call_count == 3
+    assert all(r.success for r in results)
@@ -0,0 +1,212 @@
+import json
+import sqlite3
+import pytest
+from app.services.orchestrator import SyncOrchestrator
+from app.services.rules_engine import RulesEngine
+from app.systems.file import FileSource
+from app.systems.sqlite_sink import SQLiteSink
+
+
+def make_db(path, primary_key=True):
+    key = "record_id INTEGER PRIMARY KEY" if primary_key else "record_id INTEGER"
+    conn = sqlite3.connect(path)
+    conn.execute(f"CREATE TABLE users ({key}, name TEXT, email TEXT)")
+    conn.commit()
+    conn.close()
+
+
+def rows(path):
+    conn = sqlite3.connect(path)
+    result = conn.execute("SELECT record_id, name, email FROM users ORDER BY record_id").fetchall()
+    conn.close()
+    return result
+
+
+@pytest.mark.asyncio
+async def test_write_records_ignore_mode_keeps_first_copy(tmp_path):
+    db = str(tmp_path / "sink.sqlite")
+    make_db(db)
+    sink = SQLiteSink(db, "users")
+
+    await sink.write_records([
+        {"record_id": 1, "name": "a"},
+        {"record_id": 2, "name": "b", "email": "b@x.com"},
+        {"record_id": 1, "name": "a2"},
+    ])
+    await sink.write_record({"record_id": 3, "name": "c"})
+    await sink.close()
+
+    assert rows(db) == [(1, "a", None), (2, "b", "b@x.com"), (3, "c", None)]
+    assert len(sink.statements) == 2  # one cached statement per column set
+
+
+@pytest.mark.asyncio
+async def test_write_records_upsert_mode(tmp_path):
+    db = str(tmp_path / "sink.sqlite")
+    make_db(db, primary_key=False)
+    sink = SQLiteSink(db, "users", mode="upsert")
+
+    await sink.write_records([{"record_id": 1, "name": "a", "email": "a@x.com"}])
+    await sink.write_records([{"record_id": 1, "name": "a2"}, {"record_id": 1, "name": "a3"}])
+    await sink.close()
+
+    assert rows(db) == [(1, "a3", "a@x.com")]
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_backfills_into_sqlite_sink(tmp_path):
+    db = str(tmp_path / "sink.sqlite")
+    make_db(db)
+    source_path = tmp_path / "source.jsonl"
+    source_path.write_text("".join(json.dumps(r) + "\n" for r in [
+        {"record_id": 1, "name": "a", "status": "active"},
+        {"record_id": 2, "name": "b", "status": "inactive"},
+    ]))
+    rules_path = tmp_path / "rules.json"
+    rules_path.write_text(json.dumps({"filters": {"status": "active"},
+                                      "mappings": {"record_id": "record_id", "name": "name"}}))
+    sink = SQLiteSink(db, "users")
+    orchestrator = SyncOrchestrator(FileSource(str(source_path)), sink, RulesEngine(str(rules_path)))
+
+    assert await orchestrator.sync_all() == 1
+    conn = sqlite3.connect(db)
+    conn.execute("UPDATE users SET name = 'stale'")
+    conn.commit()
+    conn.close()
+    await orchestrator.sync_all()
+    assert rows(db) == [(1, "stale", None)]
+    # allow_duplicates writes the records again
+    await orchestrator.sync_all(allow_duplicates=True)
+    await sink.close()
+    assert rows(db) == [(1, "a", None)]
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_streams_sources_batch_by_batch(tmp_path):
+    class StreamingSource:
+        async def iter_records(self):
+            for start in range(0, 5, 2):
+                yield [{"record_id": i, "name": f"user{i}"} for i in range(start, min(start + 2, 5))]
+
+        async def fetch_records(self):
+            raise AssertionError("the backfill must not be collected into one list")
+
+    class RecordingSink:
+        def __init__(self):
+            self.batches = []
+
+        async def write_records(self, records, allow_duplicates=False):
+            self.batches.append([record["record_id"] for record in records])
+
+    sink = RecordingSink()
+    assert await SyncOrchestrator(StreamingSource(), sink).sync_all() == 5
+    assert sink.batches == [[0, 1], [2, 3], [4]]
+
+
+@pytest.mark.asyncio
+async def test_connection_uses_wal(tmp_path):
+    db = str(tmp_path / "sink.sqlite")
+    make_db(db)
+    sink = SQLiteSink(db, "users")
+    conn = await sink.connect()
+    cursor = await conn.execute("PRAGMA journal_mode")
+    assert (await cursor.fetchone())[0] == "wal"
+    await sink.close()
+
+
+@pytest.mark.asyncio
+async def test_write_records_applies_operations(tmp_path):
+    db = str(tmp_path / "sink.sqlite")
+    make_db(db, primary_key=False)
+    sink = SQLiteSink(db, "users")
+    await sink.write_records([{"record_id": 1, "name": "a"}, {"record_id": 2, "name": "b"}])
+
+    await sink.write_records([
+        {"record_id": 1, "name": "a2", "operation": "update"},
+        {"record_id": 2, "operation": "delete"},
+        {"record_id": 3, "name": "c", "operation": "create"},
+    ])
+    await sink.close()
+
+    assert rows(db) == [(1, "a2", None), (3, "c", None)]
+
+
+@pytest.mark.asyncio
+async def test_upsert_into_a_table_with_duplicate_keys_names_the_cause(tmp_path):
+    db = str(tmp_path / "sink.sqlite")
+    make_db(db, primary_key=False)
+    conn = sqlite3.connect(db)
+    conn.executemany("INSERT INTO users (record_id, name) VALUES (?, ?)", [(1, "a"), (1, "b")])
+    conn.commit()
+    conn.close()
+
+    sink = SQLiteSink(db, "users", mode="upsert")
+    with pytest.raises(ValueError, match=r"users: 'record_id' is not unique \(1 is stored 2 times\)"):
+        await sink.write_records([{"record_id": 2, "name": "c"}])
+    assert sink.db is None
+
+
+@pytest.mark.asyncio
+async def test_delete_without_the_conflict_key_is_refused(tmp_path):
+    db = str(tmp_path / "sink.sqlite")
+    make_db(db)
+    sink = SQLiteSink(db, "users")
+    await sink.write_records([{"record_id": 1, "name": "a"}])
+
+    with pytest.raises(ValueError, match="delete record has no 'record_id' column"):
+        await sink.write_records([
+            {"record_id": 2, "name": "b"},
+            {"name": "a", "operation": "delete"},
+        ])
+    await sink.close()
+
+    # nothing of the refused batch was written
+    assert rows(db) == [(1, "a", None)]
+
+
+@pytest.mark.asyncio
+async def test_cdc_poller_propagates_changes_to_sink(tmp_path):
+    from app.services.pollers.sqlite_poller import SQLitePoller
+    from app.systems.sqlite import SQLiteSource
+
+    src = str(tmp_path / "src.sqlite")
+    conn = sqlite3.connect(src)
+    conn.execute("CREATE TABLE users (record_id INTEGER, name TEXT, status TEXT)")
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?)", [(1, "a", "active"), (2, "b", "active")])
+    conn.commit()
+    rules = tmp_path / "rules.json"
+    rules.write_text(json.dumps({"filters": {"status": "active"},
+                                 "mappings": {"record_id": "record_id", "name": "name"}}))
+
+    db = str(tmp_path / "sink.sqlite")
+    make_db(db)
+    sink = SQLiteSink(db, "users", mode="upsert")
+    poller = SQLitePoller(SQLiteSource(src, "users", cdc=True), sink, rules_path=str(rules))
+    assert await poller.poll_once() == 2
+    assert rows(db) == [(1, "a", None), (2, "b", None)]
+
+    conn.execute("UPDATE users SET name = 'a2' WHERE record_id = 1")
+    conn.execute("DELETE FROM users WHERE record_id = 2")
+    conn.execute("INSERT INTO users VALUES (3, 'c', 'inactive')")
+    conn.commit()
+    conn.close()
+    assert await poller.poll_once() == 3
+    await sink.close()
+
+    assert rows(db) == [(1, "a2", None)]
+    assert await poller.poll_once() == 0
+
+
+def test_cdc_poller_refuses_sinks_that_cannot_delete(tmp_path):
+    from app.services.pollers.sqlite_poller import SQLitePoller
+    from app.systems.sqlite import SQLiteSource
+
+    class PushOnlyCRM:
+        async def push(self, data):
+            pass
+
+    rules = tmp_path / "rules.json"
+    rules.write_text(json.dumps({"mappings": {"record_id": "record_id"}}))
+    with pytest.raises(ValueError, match="cannot apply deletes"):
+        SQLitePoller(SQLiteSource(str(tmp_path / "src.sqlite"), "users", cdc=True), PushOnlyCRM(),
+                     rules_path=str(rules))
@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+from app.services.status_manager import StatusManager
+
+
+def test_unknown_by_default_and_latest_status_wins():
+    status = StatusManager()
+    assert status.get_status("1") == "unknown"
+    status.set_status("1", "queued")
+    status.set_status("1", "synced")
+    assert status.get_status("1") == "synced"
+    status.set_status("2", "custom_status")
+    assert status.get_status("2") == "custom_status"
+
+
+def test_lru_eviction_bounds_memory():
+    status = StatusManager(max_entries=4, stripes=1)
+    for i in range(10):
+        status.set_status(str(i), "queued")
+    assert len(status) == 4
+    assert status.get_status("0") == "unknown"
+    assert status.get_status("9") == "queued"
+
+
+def test_ttl_expires_entries():
+    status = StatusManager(ttl=-1, stripes=1)
+    status.set_status("1", "synced")
+    assert status.get_status("1") == "unknown"
+
+
+def test_evicted_statuses_are_served_from_spill(tmp_path):
+    path = str(tmp_path / "status.db")
+    status = StatusManager(max_entries=2, stripes=1, spill_path=path)
+    for i in range(5):
+        status.set_status(str(i), "failed" if i == 0 else "synced")
+    assert len(status) == 2
+    assert status.get_status("0") == "failed"
+    assert status.get_status("3") == "synced"
+    status.close()
+
+    reopened = StatusManager(max_entries=2, stripes=1, spill_path=path)
+    assert reopened.get_status("1") == "synced"
+    reopened.close()
+
+
+def test_concurrent_writers_across_stripes():
+    status = StatusManager(max_entries=100_000, stripes=8)
+
+    def write(worker):
+        for i in range(1000):
+            status.set_status(f"{worker}-{i}", "synced")
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(write, range(8)))
+    assert len(status) == 8000
+    assert all(status.get_status(f"{w}-999") == "synced" for w in range(8))
@@ -0,0 +1,191 @@
+import asyncio
+import pytest
+from app.models.record import PushResult
+from app.services.queue import QueueManager
+from app.services.sync_manager import SyncManager
+
+
+class RecordingCRM:
+    def __init__(self):
+        self.batches = []
+
+    def transform(self, record):
+        return record["data"]
+
+    async def push_batch(self, records):
+        self.batches.append(records)
+        return [PushResult(success=True) for _ in records]
+
+
+def make_manager(batch_size, flush_interval):
+    manager = SyncManager()
+    manager.crm = RecordingCRM()
+    manager.crm_plugins = {"outreach": manager.crm}
+    manager.batch_settings = lambda crm: (batch_size, flush_interval)
+    return manager
+
+
+def record(i):
+    return {"record_id": f"r{i}", "data": {"n": i}, "operation": "create", "crm": "outreach"}
+
+
+@pytest.mark.asyncio
+async def test_enqueue_does_not_push_inline():
+    manager = make_manager(batch_size=10, flush_interval=60)
+    await manager.enqueue_sync("outreach", record(1))
+    assert manager.crm.batches == []
+    assert manager.status.get_status("r1") == "queued"
+
+
+@pytest.mark.asyncio
+async def test_flusher_drains_when_batch_is_full():
+    manager = make_manager(batch_size=3, flush_interval=60)
+    manager.start()
+    for i in range(3):
+        await manager.enqueue_sync("outreach", record(i))
+    await asyncio.sleep(0.05)
+
+    assert [len(b) for b in manager.crm.batches] == [3]
+    assert manager.status.get_status("r2") == "synced"
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_flusher_drains_partial_batch_after_interval():
+    manager = make_manager(batch_size=100, flush_interval=0.05)
+    manager.start()
+    await manager.enqueue_sync("outreach", record(1))
+    await asyncio.sleep(0.15)
+
+    assert [len(b) for b in manager.crm.batches] == [1]
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_stop_drains_pending_records():
+    manager = make_manager(batch_size=100, flush_interval=60)
+    manager.start()
+    await manager.enqueue_sync("outreach", record(1))
+    await manager.stop()
+    assert manager.status.get_status("r1") == "synced"
+
+
+class SlowCRM(RecordingCRM):
+    def __init__(self, latency):
+        super().__init__()
+        self.latency = latency
+        self.in_flight = 0
+        self.peak = 0
+
+    async def push_batch(self, records):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        # later updates of a record finish faster, so only the pool's ordering keeps them in order
+        await asyncio.sleep(self.latency / (1 + records[0].get("version", 0)))
+        self.in_flight -= 1
+        return await super().push_batch(records)
+
+
+@pytest.mark.asyncio
+async def test_batches_are_pushed_concurrently():
+    manager = make_manager(batch_size=1, flush_interval=60)
+    manager.crm = manager.crm_plugins["outreach"] = SlowCRM(latency=0.1)
+    for i in range(8):
+        await manager.enqueue_sync("outreach", record(i))
+    await manager.drain("outreach")
+    await manager.pool("outreach").join()
+    assert manager.crm.peak > 1
+    assert all(manager.status.get_status(f"r{i}") == "synced" for i in range(8))
+
+
+@pytest.mark.asyncio
+async def test_updates_to_one_record_keep_their_order():
+    manager = make_manager(batch_size=1, flush_interval=60)
+    manager.crm = manager.crm_plugins["outreach"] = SlowCRM(latency=0.05)
+    for version in range(3):
+        await manager.enqueue_sync("outreach", dict(record(1), data={"version": version}))
+    await manager.drain("outreach")
+    await manager.pool("outreach").join()
+    assert [batch[0]["version"] for batch in manager.crm.batches] == [0, 1, 2]
+
+
+class BrokenCRM(RecordingCRM):
+    async def push_batch(self, records):
+        raise RuntimeError("CRM unreachable")
+
+
+@pytest.mark.asyncio
+async def test_failed_pushes_are_retried_then_acked(tmp_path):
+    manager = make_manager(batch_size=2, flush_interval=60)
+    manager.queue = QueueManager(durable_dir=str(tmp_path))
+    manager.crm = manager.crm_plugins["outreach"] = BrokenCRM()
+    for i in range(2):
+        await manager.enqueue_sync("outreach", record(i))
+    queue = manager.queue.queue("outreach")
+    queue.retry_backoff = 0.05
+    log = queue.log
+
+    await manager.drain("outreach")
+    await manager.pool("outreach").join()
+    # back in the queue and still in the log
+    assert manager.queue.get_pending("outreach") == [record(0), record(1)]
+    assert manager.status.get_status("r1") == "queued"
+    assert log.committed == -1
+
+    for _ in range(2):
+        await asyncio.sleep(manager.queue.backoff("outreach"))
+        await manager.drain("outreach")
+        await manager.pool("outreach").join()
+    # out of attempts: acked with the failure recorded
+    assert manager.queue.size("outreach") == 0
+    assert manager.status.get_status("r1") == "failed"
+    assert log.committed == 1
+    await manager.queue.close()
+
+
+class FlakyCRM(RecordingCRM):
+    async def push_batch(self, records):
+        await super().push_batch(records)
+        return [PushResult(success=record["n"] != 1) for record in records]
+
+
+@pytest.mark.asyncio
+async def test_only_pushed_offsets_are_acked(tmp_path):
+    manager = make_manager(batch_size=3, flush_interval=60)
+    manager.queue = QueueManager(durable_dir=str(tmp_path))
+    manager.crm = manager.crm_plugins["outreach"] = FlakyCRM()
+    for i in range(3):
+        await manager.enqueue_sync("outreach", record(i))
+    await manager.drain("outreach")
+    await manager.pool("outreach").join()
+
+    log = manager.queue.queue("outreach").log
+    assert log.committed == 0 and log.acked == {2}
+    assert manager.queue.get_pending("outreach") == [record(1)]
+    await manager.queue.close()
+
+
+class ThrottledCRM(RecordingCRM):
+    async def push_batch(self, records):
+        await super().push_batch(records)
+        if len(self.batches) == 1:
+            return [PushResult(success=False, error="429", retry_after=0.2) for _ in records]
+        return [PushResult(success=True) for _ in records]
+
+
+@pytest.mark.asyncio
+async def test_flusher_waits_out_retry_after_before_pushing_again():
+    manager = make_manager(batch_size=1, flush_interval=60)
+    manager.crm = manager.crm_plugins["outreach"] = ThrottledCRM()
+    manager.queue.queue("outreach").retry_backoff = 0.01
+    manager.start()
+    await manager.enqueue_sync("outreach", record(1))
+
+    await asyncio.sleep(0.1)
+    # throttled once, then left alone although the flusher was woken by the retry
+    assert len(manager.crm.batches) == 1
+    assert manager.status.get_status("r1") == "queued"
+    await asyncio.sleep(0.2)
+    assert len(manager.crm.batches) == 2
+    assert manager.status.get_status("r1") == "synced"
+    await manager.stop()
@@ -0,0 +1,64 @@
+import json
+import pytest
+from app.services.sync_manager import SyncManager
+from app.tests.test_sync_manager import RecordingCRM
+from app.utils import tracing
+from app.utils.tracing import JsonExporter, OTelExporter, StageSummaryExporter, Tracer, current_span
+
+
+def test_spans_nest_and_export_json(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    summary = StageSummaryExporter()
+    tracer = Tracer(1.0, [JsonExporter(path), summary])
+    with tracer.span("poll.batch", customer="acme") as root:
+        with tracer.span("rules.match") as child:
+            assert current_span() is child
+        with pytest.raises(ValueError):
+            with tracer.span("sink.write"):
+                raise ValueError("boom")
+    assert current_span() is None
+    tracer.flush()
+
+    spans = {span["name"]: span for span in map(json.loads, open(path))}
+    assert spans["rules.match"]["parent_id"] == f"{root.span_id:016x}"
+    assert spans["rules.match"]["trace_id"] == spans["poll.batch"]["trace_id"]
+    assert spans["sink.write"]["customer"] == "acme"
+    assert spans["sink.write"]["error"] == "ValueError: boom"
+    assert summary.summary()["acme"]["slowest"] == "poll.batch"
+
+
+def test_unsampled_traces_export_nothing():
+    summary = StageSummaryExporter()
+    tracer = Tracer(0.0, [summary])
+    with tracer.span("poll.batch") as root:
+        with tracer.span("rules.match") as child:
+            assert not child.sampled
+        tracer.record("queue.wait", root, 0, 1)
+    assert summary.summary() == {}
+
+
+def test_otel_exporter_mirrors_spans():
+    pytest.importorskip("opentelemetry")
+    exporter = OTelExporter()
+    tracer = Tracer(1.0, [exporter])
+    with tracer.span("crm.push_batch", records=2):
+        with tracer.span("crm.http"):
+            pass
+    assert exporter.spans == {}
+
+
+@pytest.mark.asyncio
+async def test_sync_manager_traces_each_stage_per_customer(monkeypatch):
+    summary = StageSummaryExporter()
+    monkeypatch.setattr(tracing.tracer, "sample_rate", 1.0)
+    monkeypatch.setattr(tracing.tracer, "exporters", [summary])
+    manager = SyncManager()
+    manager.crm_plugins = {"outreach": RecordingCRM()}
+    await manager.enqueue_sync("outreach", {"record_id": "t1", "customer_id": "acme", "data": {"n": 1}})
+    await manager.try_flush("outreach", 10)
+    await manager.pool("outreach").join()
+
+    stages = summary.summary()["acme"]["stages"]
+    assert {"sync.enqueue", "rules.should_sync", "queue.put", "queue.wait", "crm.transform",
+            "crm.push_batch"} <= set(stages)
+    assert manager.traced == {}
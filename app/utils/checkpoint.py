@@ -0,0 +1,37 @@
+import json
+import os
+from typing import Any, Optional
+
+
+class CheckpointStore:
+    """
+    Persists small per-source progress markers (high-water marks, file offsets)
+    in a JSON file so incremental readers can resume after a restart.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.state = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self.state = json.load(f)
+            except json.JSONDecodeError:
+                self.state = {}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.state.get(key, default)
+
+    def set(self, key: str, value: Any):
+        self.state[key] = value
+        self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # write-then-rename so a crash never leaves a half-written checkpoint
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,292 @@
+"""
+Persistent record de-duplication shared by sources, pollers and sinks.
+
+A DedupIndex remembers which (pipeline, record_id, version) keys have been synced. Lookups
+go through an in-memory Bloom filter first, so a key that was never seen is rejected
+without touching disk; only possible hits are confirmed against the exact SQLite index,
+and the most recently confirmed keys are kept in memory, so re-reading rows that were
+synced (a full-scan source polling its table) stays off disk too.
+The Bloom filter is rebuilt from SQLite when an index is opened, so it survives restarts
+while RAM stays at about 1.2 bytes per key (at the default 1% false-positive rate).
+
+    index = DedupIndex.from_config("sqlite:data/demo.sqlite:users")
+    new = index.filter_unseen(records)
+    ...                        # deliver them
+    index.add_records(new)     # only then remember them as synced
+
+Record IDs are compared as strings, so 7 and "7" are the same record.
+"""
+import math
+import os
+import sqlite3
+from itertools import islice
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from app.core.config import ConfigManager
+from app.core.constants import DEFAULT_DEDUP_CAPACITY, DEFAULT_DEDUP_ERROR_RATE, DEFAULT_DEDUP_BATCH, \
+    DEFAULT_DEDUP_CACHE
+from app.core.logger import logger
+
+Key = Tuple[str, str]
+MASK_32 = (1 << 32) - 1
+LOOKUP_CHUNK = 500  # keys per exact-lookup query, below SQLite's bound parameter limit
+
+
+def make_key(record_id, version=None) -> Key:
+    return str(record_id), "" if version is None else str(version)
+
+
+def _record_key(record: Dict, version_field: Optional[str], id_field: str) -> Optional[Key]:
+    rid = record.get(id_field)
+    if rid is None or rid == "":
+        return None
+    return make_key(rid, record.get(version_field) if version_field else None)
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter using double hashing over Python's string hash. The hash is
+    salted per process, which is fine because the filter is never persisted.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_DEDUP_CAPACITY, error_rate: float = DEFAULT_DEDUP_ERROR_RATE):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def add(self, key: Key):
+        h = hash(key)
+        h1, h2 = h & MASK_32, ((h >> 32) & MASK_32) | 1
+        bits, size = self.bits, self.size
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % size
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: Key) -> bool:
+        # the probe loop is inlined: most misses stop at the first or second bit
+        h = hash(key)
+        h1, h2 = h & MASK_32, ((h >> 32) & MASK_32) | 1
+        bits, size = self.bits, self.size
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class DedupIndex:
+    """
+    Exact set of synced keys for one pipeline, stored in SQLite (in memory when `path` is None)
+    behind a Bloom filter. New keys are written in batches of `batch_size`; until then they are
+    held in a small pending set. When more keys are stored than `capacity`, the filter is
+    rebuilt at twice the size so the false-positive rate stays near `error_rate`. Up to
+    `cache_size` keys known to be stored are remembered, oldest evicted first.
+    """
+
+    def __init__(self, pipeline: str, path: Optional[str] = None, capacity: int = DEFAULT_DEDUP_CAPACITY,
+                 error_rate: float = DEFAULT_DEDUP_ERROR_RATE, batch_size: int = DEFAULT_DEDUP_BATCH,
+                 cache_size: int = DEFAULT_DEDUP_CACHE):
+        self.pipeline = pipeline
+        self.path = path
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS synced_records (pipeline TEXT NOT NULL, record_id TEXT NOT NULL, "
+            "version TEXT NOT NULL, PRIMARY KEY (pipeline, record_id, version)) WITHOUT ROWID"
+        )
+        self.error_rate = error_rate
+        self.batch_size = batch_size
+        self.pending: Set[Key] = set()
+        self.cache_size = cache_size
+        self.confirmed: Dict[Key, None] = {}  # insertion-ordered, so the oldest key is first
+        self.lock = Lock()
+        self.count = self.db.execute(
+            "SELECT COUNT(*) FROM synced_records WHERE pipeline = ?", (pipeline,)
+        ).fetchone()[0]
+        self.bloom = self._build_filter(max(capacity, self.count * 2))
+        if self.count:
+            logger.info(f"[Dedup] Loaded {self.count} synced keys for {pipeline}")
+
+    @classmethod
+    def from_config(cls, pipeline: str, path: Optional[str] = None) -> "DedupIndex":
+        """
+        An index stored at `path`, or at the [dedup] path of config.ini when not given.
+        """
+        config = ConfigManager.get_instance()
+        return cls(
+            pipeline,
+            path=path or config.get("dedup", "path", fallback=None) or None,
+            capacity=int(config.get("dedup", "capacity", fallback=DEFAULT_DEDUP_CAPACITY)),
+            error_rate=float(config.get("dedup", "error_rate", fallback=DEFAULT_DEDUP_ERROR_RATE)),
+            cache_size=int(config.get("dedup", "cache_size", fallback=DEFAULT_DEDUP_CACHE)),
+        )
+
+    def _build_filter(self, capacity: int) -> BloomFilter:
+        bloom = BloomFilter(capacity, self.error_rate)
+        rows = self.db.execute("SELECT record_id, version FROM synced_records WHERE pipeline = ?", (self.pipeline,))
+        for row in rows:
+            bloom.add(row)
+        for key in self.pending:
+            bloom.add(key)
+        return bloom
+
+    def _stored(self, keys: List[Key]) -> Set[Key]:
+        """
+        The subset of `keys` present on disk or pending.
+        """
+        found = {key for key in keys if key in self.pending}
+        lookup = list({key[0] for key in keys if key not in found})
+        wanted = set(keys)
+        stored = []
+        for start in range(0, len(lookup), LOOKUP_CHUNK):
+            chunk = lookup[start:start + LOOKUP_CHUNK]
+            rows = self.db.execute(
+                f"SELECT record_id, version FROM synced_records WHERE pipeline = ? "
+                f"AND record_id IN ({', '.join('?' * len(chunk))})",
+                (self.pipeline, *chunk),
+            )
+            stored.extend(row for row in rows if row in wanted)
+        found.update(stored)
+        self._remember(stored)
+        return found
+
+    def _seen(self, keys: Iterable[Key]) -> Set[Key]:
+        """
+        The subset of `keys` already synced: cached and pending keys first, then the Bloom
+        filter hits confirmed on disk.
+        """
+        confirmed, pending, bloom = self.confirmed, self.pending, self.bloom
+        seen, candidates = set(), []
+        for key in keys:
+            if key in confirmed or key in pending:
+                seen.add(key)
+            elif key in bloom:
+                candidates.append(key)
+        if candidates:
+            seen.update(self._stored(candidates))
+        return seen
+
+    def _remember(self, keys: Iterable[Key]):
+        if not self.cache_size:
+            return
+        confirmed = self.confirmed
+        for key in keys:
+            confirmed[key] = None
+        overflow = len(confirmed) - self.cache_size
+        if overflow > 0:
+            for key in list(islice(confirmed, overflow)):
+                del confirmed[key]
+
+    def contains(self, record_id, version=None) -> bool:
+        key = make_key(record_id, version)
+        with self.lock:
+            return bool(self._seen([key]))
+
+    def add(self, record_id, version=None) -> bool:
+        """
+        Marks a key as synced; returns False when it already was.
+        """
+        return bool(self.add_many([(record_id, version)]))
+
+    def add_many(self, keys: Iterable[Tuple]) -> List[Key]:
+        """
+        Marks (record_id, version) pairs as synced; returns the ones that were new.
+        """
+        keys = [make_key(*key) for key in keys]
+        with self.lock:
+            stored = self._seen(keys)
+            return self._insert(key for key in keys if key not in stored)
+
+    def add_records(self, records: List[Dict], version_field: Optional[str] = None,
+                    id_field: str = "record_id") -> List[Key]:
+        keys = (_record_key(record, version_field, id_field) for record in records)
+        return self.add_many(key for key in keys if key is not None)
+
+    def filter_unseen(self, records: List[Dict], version_field: Optional[str] = None, mark: bool = False,
+                      id_field: str = "record_id", keep_unkeyed: bool = False) -> List[Dict]:
+        """
+        Records whose key has not been synced, first occurrence only, in their original order.
+        Records without an ID are dropped unless `keep_unkeyed`. With `mark`, the returned
+        records are recorded as synced in the same pass.
+        """
+        keys = [_record_key(record, version_field, id_field) for record in records]
+        with self.lock:
+            # re-read records are mostly cached, so those skip the Bloom filter and the set copy
+            confirmed, bloom = self.confirmed, self.bloom
+            candidates = [key for key in keys if key is not None and key not in confirmed and key in bloom]
+            stored = self._stored(candidates) if candidates else set()
+            unseen, new_keys, batch = [], [], set()
+            for key, record in zip(keys, records):
+                if key is None:
+                    if keep_unkeyed:
+                        unseen.append(record)
+                    continue
+                if key in confirmed or key in stored or key in batch:
+                    continue
+                batch.add(key)
+                new_keys.append(key)
+                unseen.append(record)
+            if mark:
+                self._insert(new_keys)
+        return unseen
+
+    def discard(self, record_ids: Iterable) -> int:
+        """
+        Forgets every version of `record_ids`, e.g. after a delete; returns how many keys were removed.
+        Their Bloom filter bits stay set, which only costs an exact lookup.
+        """
+        ids = {str(rid) for rid in record_ids}
+        with self.lock:
+            pending = {key for key in self.pending if key[0] in ids}
+            self.pending -= pending
+            for key in [key for key in self.confirmed if key[0] in ids]:
+                del self.confirmed[key]
+            removed = len(pending)
+            for rid in ids:
+                removed += self.db.execute("DELETE FROM synced_records WHERE pipeline = ? AND record_id = ?",
+                                           (self.pipeline, rid)).rowcount
+            self.db.commit()
+            self.count -= removed
+        return removed
+
+    def _insert(self, keys: Iterable[Key]) -> List[Key]:
+        added = []
+        for key in keys:
+            if key in self.pending:
+                continue
+            self.pending.add(key)
+            self.bloom.add(key)
+            added.append(key)
+        self.count += len(added)
+        if len(self.pending) >= self.batch_size:
+            self._flush()
+        if self.count > self.bloom.capacity:
+            self.bloom = self._build_filter(max(self.bloom.capacity, self.count) * 2)
+        return added
+
+    def _flush(self):
+        if self.pending:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO synced_records VALUES (?, ?, ?)",
+                [(self.pipeline, rid, version) for rid, version in self.pending],
+            )
+            self.db.commit()
+            self._remember(self.pending)
+            self.pending = set()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.db.close()
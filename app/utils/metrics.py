@@ -0,0 +1,276 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format (served at /metrics).
+
+Recording never takes a lock: every thread writes to its own cell of a metric and the
+cells are only summed when the registry is scraped. Label children are cached, so the
+hot path is a dict lookup plus an in-place add.
+
+    PUSHED.labels("salesforce", "acme").inc(len(batch))
+    with STAGE_LATENCY.labels("push", "salesforce").time():
+        ...
+"""
+import bisect
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Cells:
+    """
+    One mutable list per writing thread; only its owner writes to it.
+    """
+
+    __slots__ = ("size", "cells")
+
+    def __init__(self, size: int):
+        self.size = size
+        self.cells: Dict[int, list] = {}
+
+    def local(self) -> list:
+        cell = self.cells.get(threading.get_ident())
+        if cell is None:
+            # setdefault is atomic, so a racing scrape never sees a half-registered cell
+            cell = self.cells.setdefault(threading.get_ident(), [0] * self.size)
+        return cell
+
+    def totals(self) -> list:
+        totals = [0] * self.size
+        for cell in list(self.cells.values()):
+            for i, value in enumerate(cell):
+                totals[i] += value
+        return totals
+
+
+class CounterChild:
+    __slots__ = ("cells",)
+
+    def __init__(self):
+        self.cells = _Cells(1)
+
+    def inc(self, amount: float = 1):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        self.cells.local()[0] += amount
+
+    def value(self) -> float:
+        return self.cells.totals()[0]
+
+
+class GaugeChild:
+    __slots__ = ("current", "function")
+
+    def __init__(self):
+        self.current = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self.current = value
+
+    def set_function(self, function: Callable[[], float]):
+        """
+        Reads the value from `function` at scrape time instead of tracking it on every change.
+        """
+        self.function = function
+
+    def value(self) -> float:
+        return self.function() if self.function is not None else self.current
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child: "HistogramChild"):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class HistogramChild:
+    __slots__ = ("buckets", "cells")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # one slot per bucket (+Inf last), then sum and count
+        self.cells = _Cells(len(buckets) + 3)
+
+    def observe(self, value: float):
+        cell = self.cells.local()
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        totals = self.cells.totals()
+        counts = totals[:-2]
+        cumulative, running = [], 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, totals[-2], totals[-1]
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children: Dict[tuple, object] = {}
+        self.lock = threading.Lock()
+
+    def labels(self, *values, **kwargs):
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        child = self.children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self.lock:
+                child = self.children.get(values)
+                if child is None:
+                    child = self.children[values] = self._child()
+        return child
+
+    def _child(self):
+        raise NotImplementedError
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _child(self):
+        return CounterChild()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}_total{_format_labels(self.labelnames, values)} {_format_value(child.value())}"
+                for values, child in list(self.children.items())]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def _child(self):
+        return GaugeChild()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for values, child in list(self.children.items()):
+            try:
+                value = child.value()
+            except Exception:
+                continue  # a failing callback must not break the scrape
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _child(self):
+        return HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def samples(self) -> List[str]:
+        lines = []
+        names = self.labelnames + ("le",)
+        for values, child in list(self.children.items()):
+            cumulative, total, count = child.snapshot()
+            for bound, running in zip(self.buckets + (math.inf,), cumulative):
+                labels = _format_labels(names, values + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {running}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in list(self.metrics.values())) + "\n"
+
+
+registry = MetricsRegistry()
+
+ENQUEUED = registry.counter("sync_records_enqueued", "Records accepted into a CRM queue", ("crm", "customer"))
+PUSHED = registry.counter("sync_records_pushed", "Records pushed to a CRM successfully", ("crm", "customer"))
+FAILED = registry.counter("sync_records_failed", "Records that failed to transform or push", ("crm", "customer"))
+RATE_LIMITED = registry.counter("sync_records_rate_limited",
+                                "Records dropped after waiting too long for rate limit capacity", ("crm", "customer"))
+SKIPPED = registry.counter("sync_records_skipped_by_rule", "Records the sync rules rejected", ("crm", "customer"))
+QUEUE_DEPTH = registry.gauge("sync_queue_depth", "Records waiting in a CRM queue, spilled ones included", ("crm",))
+BREAKER_STATE = registry.gauge("sync_circuit_breaker_state",
+                               "Circuit breaker state: 0 closed, 1 half-open, 2 open", ("crm", "customer"))
+STAGE_LATENCY = registry.histogram("sync_stage_duration_seconds",
+                                   "Latency of the poll, rules, transform and push stages", ("stage", "crm"))
+
+BREAKER_STATES = {"CLOSED": 0, "HALF-OPEN": 1, "OPEN": 2}
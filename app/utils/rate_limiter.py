@@ -1,24 +1,126 @@
+import asyncio
 import time
-from collections import defaultdict
+from functools import lru_cache
 from threading import Lock
+from typing import Callable, Dict, Optional, Tuple
+from app.core.constants import DEFAULT_MAX_REQUESTS, DEFAULT_WINDOW_SIZE
+from app.settings.settings import CustomerSettings
 
 
-class SlidingWindowRateLimiter:
-    max_requests = 0
-    window = 0
+class RateLimitTimeout(Exception):
+    """
+    Raised when `acquire` cannot get capacity before its deadline.
+    """
 
-    def __init__(self):
-        self.timestamps = defaultdict(list)
+
+class TokenBucket:
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, rate: float, now: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = now
+
+
+class TokenBucketRateLimiter:
+    """
+    Per-key token buckets: a key may burst up to `max_requests` and refills at
+    `max_requests / window` tokens per second. `allow` is O(1) regardless of traffic.
+
+    `allow` answers immediately; `acquire` waits for capacity instead, serving waiters of a
+    key in FIFO order and sleeping exactly until the next token is due (no polling).
+
+    Keys without explicit limits (see `configure`) use the defaults passed at construction.
+    """
+
+    def __init__(self, max_requests: int = DEFAULT_MAX_REQUESTS, window: float = DEFAULT_WINDOW_SIZE,
+                 clock: Callable[[], float] = time.monotonic):
+        self.default_limits = (max_requests, window)
+        self.limits: Dict[str, Tuple[int, float]] = {}
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.waiters: Dict[str, asyncio.Lock] = {}
+        self.clock = clock
         self.lock = Lock()
 
-    def allow(self, key: str):
-        now = time.time()
+    def configure(self, key: str, max_requests: int, window: float):
+        """
+        Sets the limits for a key. The current bucket is kept when the limits are unchanged.
+        """
         with self.lock:
-            timestamps = self.timestamps[key]
-            # remove timestamps outside window
-            self.timestamps[key] = [ts for ts in timestamps if now - ts <= SlidingWindowRateLimiter.window]
-            if len(self.timestamps[key]) < SlidingWindowRateLimiter.max_requests:
-                self.timestamps[key].append(now)
-                return True
-            else:
-                return False
+            if self.limits.get(key) == (max_requests, window):
+                return
+            self.limits[key] = (max_requests, window)
+            self.buckets.pop(key, None)
+
+    def _bucket(self, key: str, now: float) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            max_requests, window = self.limits.get(key, self.default_limits)
+            bucket = TokenBucket(float(max_requests), max_requests / window if window else float("inf"), now)
+            self.buckets[key] = bucket
+        return bucket
+
+    def _take(self, key: str, cost: float) -> float:
+        """
+        Takes `cost` tokens if available and returns 0, otherwise returns the seconds until they are.
+        """
+        now = self.clock()
+        with self.lock:
+            bucket = self._bucket(key, now)
+            if cost > bucket.capacity:
+                raise ValueError(f"Cost {cost} exceeds the burst capacity of '{key}' ({bucket.capacity:g})")
+            bucket.tokens = min(bucket.capacity, bucket.tokens + (now - bucket.updated) * bucket.rate)
+            bucket.updated = now
+            if bucket.tokens >= cost:
+                bucket.tokens -= cost
+                return 0.0
+            return (cost - bucket.tokens) / bucket.rate
+
+    async def _take_async(self, key: str, cost: float) -> float:
+        # hook for shared backends, see app/utils/redis_state.py
+        return self._take(key, cost)
+
+    def allow(self, key: str, cost: float = 1) -> bool:
+        return self._take(key, cost) == 0.0
+
+    async def acquire(self, key: str, cost: float = 1, timeout: Optional[float] = None):
+        """
+        Waits until `cost` tokens are available for `key` and takes them.
+        Raises RateLimitTimeout when they would not be available within `timeout` seconds.
+        """
+        deadline = None if timeout is None else self.clock() + timeout
+        waiters = self.waiters.get(key)
+        if waiters is None:
+            waiters = self.waiters.setdefault(key, asyncio.Lock())
+        try:
+            # asyncio.Lock hands over to waiters in arrival order
+            await asyncio.wait_for(waiters.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise RateLimitTimeout(f"Timed out after {timeout}s waiting for rate limit '{key}'")
+        try:
+            while True:
+                delay = await self._take_async(key, cost)
+                if not delay:
+                    return
+                if deadline is not None and self.clock() + delay > deadline:
+                    raise RateLimitTimeout(f"Rate limit '{key}' has no capacity within {timeout}s")
+                await asyncio.sleep(delay)
+        finally:
+            waiters.release()
+
+
+@lru_cache(maxsize=None)
+def customer_limits(customer_id: Optional[str]) -> Tuple[int, float]:
+    """
+    (max_requests, window_size) for a customer from customer_settings.toml, falling back to [default].
+    Loaded once per customer; without a customer the service-wide defaults apply.
+    """
+    if not customer_id:
+        return DEFAULT_MAX_REQUESTS, float(DEFAULT_WINDOW_SIZE)
+    default = CustomerSettings.settings.get("default") or {}
+    settings = CustomerSettings.settings.get(customer_id) or default
+    return (
+        int(settings.get("max_requests", default.get("max_requests", DEFAULT_MAX_REQUESTS))),
+        float(settings.get("window_size", default.get("window_size", DEFAULT_WINDOW_SIZE))),
+    )
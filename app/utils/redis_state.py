@@ -0,0 +1,188 @@
+import asyncio
+import time
+from typing import Dict, Optional
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+from app.core.config import ConfigManager
+from app.core.constants import DEFAULT_REDIS_URL, DEFAULT_REDIS_TIMEOUT, DEFAULT_REDIS_RETRY_INTERVAL
+from app.core.logger import logger
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.rate_limiter import TokenBucketRateLimiter
+
+# Token bucket kept in a hash {tokens, ts}; uses the Redis clock so every replica agrees.
+# Returns "0" when the tokens were taken, otherwise the seconds until they will be available.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local delay = 0
+if tokens >= cost then
+  tokens = tokens - cost
+else
+  delay = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return tostring(delay)
+"""
+
+BREAKER_FAILURE_SCRIPT = """
+local failures = redis.call('HINCRBY', KEYS[1], 'failures', 1)
+if failures >= tonumber(ARGV[1]) then
+  redis.call('HSET', KEYS[1], 'state', 'OPEN', 'opened_at', redis.call('TIME')[1])
+end
+return failures
+"""
+
+_client: Optional[redis.Redis] = None
+
+
+def redis_settings() -> dict:
+    config = ConfigManager.get_instance()
+    return {
+        "enabled": config.get("redis", "enabled", fallback="false").lower() == "true",
+        "url": config.get("redis", "url", fallback=DEFAULT_REDIS_URL),
+        "timeout": float(config.get("redis", "timeout", fallback=DEFAULT_REDIS_TIMEOUT)),
+    }
+
+
+def redis_client() -> redis.Redis:
+    global _client
+    if _client is None:
+        settings = redis_settings()
+        _client = redis.from_url(settings["url"], socket_timeout=settings["timeout"],
+                                 socket_connect_timeout=settings["timeout"], decode_responses=True)
+    return _client
+
+
+class RedisCircuitBreaker(CircuitBreaker):
+    """
+    Circuit breaker whose state is shared by all replicas through a Redis hash.
+
+    `allow_request` stays synchronous and reads a local mirror; failures and successes are
+    published to Redis in the background, and the mirror is refreshed from the same round-trip
+    that checks the rate limit (see RedisTokenBucketRateLimiter.acquire).
+    """
+
+    def __init__(self, name: str, client: redis.Redis, failure_threshold=5, recovery_timeout=60,
+                 prefix: str = "record_sync"):
+        super().__init__(failure_threshold=failure_threshold, recovery_timeout=recovery_timeout)
+        self.client = client
+        self.key = f"{prefix}:breaker:{name}"
+        self.failure_script = client.register_script(BREAKER_FAILURE_SCRIPT)
+        self.tasks = set()
+
+    def apply(self, state: Dict[str, str]):
+        """
+        Updates the local mirror from the Redis hash.
+        """
+        with self.lock:
+            remote = state.get("state", "CLOSED")
+            if remote == "OPEN":
+                if self.state != "HALF-OPEN":
+                    self.state = "OPEN"
+                self.last_failure_time = float(state.get("opened_at", time.time()))
+            else:
+                self.state = "CLOSED"
+                self.last_failure_time = None
+            self.failure_count = int(state.get("failures", 0))
+
+    def record_success(self):
+        super().record_success()
+        self._publish(self.client.hset(self.key, mapping={"state": "CLOSED", "failures": 0, "opened_at": 0}))
+
+    def record_failure(self):
+        super().record_failure()
+        self._publish(self.failure_script(keys=[self.key], args=[self.failure_threshold]))
+
+    def _publish(self, command):
+        try:
+            task = asyncio.get_running_loop().create_task(command)
+        except RuntimeError:
+            command.close()  # no loop to publish from, the local state still applies
+            return
+        self.tasks.add(task)
+        task.add_done_callback(self._published)
+
+    def _published(self, task: asyncio.Task):
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"[CircuitBreaker] Could not publish state to Redis for {self.key}: {task.exception()}")
+
+
+class RedisTokenBucketRateLimiter(TokenBucketRateLimiter):
+    """
+    Token buckets shared by all replicas: each `acquire` runs an atomic Lua script in Redis,
+    pipelined with a read of the key's circuit breaker, so a check costs one round-trip.
+
+    While Redis is unreachable the limiter falls back to the local per-process buckets and
+    retries Redis after `retry_interval` seconds. `allow` is always local.
+    """
+
+    def __init__(self, client: redis.Redis, prefix: str = "record_sync",
+                 retry_interval: float = DEFAULT_REDIS_RETRY_INTERVAL, **kwargs):
+        super().__init__(**kwargs)
+        self.client = client
+        self.prefix = prefix
+        self.retry_interval = retry_interval
+        self.bucket_script = client.register_script(TOKEN_BUCKET_SCRIPT)
+        self.breakers: Dict[str, RedisCircuitBreaker] = {}
+        self.offline_until = 0.0
+
+    def attach_breaker(self, key: str, breaker: RedisCircuitBreaker):
+        self.breakers[key] = breaker
+
+    async def _take_remote(self, key: str, cost: float) -> float:
+        max_requests, window = self.limits.get(key, self.default_limits)
+        if cost > max_requests:
+            raise ValueError(f"Cost {cost} exceeds the burst capacity of '{key}' ({max_requests})")
+        rate = max_requests / window if window else max_requests * 1e9
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            await self.bucket_script(keys=[f"{self.prefix}:bucket:{key}"], args=[max_requests, rate, cost],
+                                     client=pipe)
+            breaker = self.breakers.get(key)
+            if breaker:
+                pipe.hgetall(breaker.key)
+            results = await pipe.execute()
+        if breaker:
+            breaker.apply(results[1])
+        return float(results[0])
+
+    async def _take_async(self, key: str, cost: float) -> float:
+        if self.clock() >= self.offline_until:
+            try:
+                return await self._take_remote(key, cost)
+            except (RedisError, OSError) as e:
+                logger.warning(f"[RateLimiter] Redis unavailable ({e}), using local buckets "
+                               f"for {self.retry_interval}s")
+                self.offline_until = self.clock() + self.retry_interval
+        return self._take(key, cost)
+
+
+def build_rate_limiter() -> TokenBucketRateLimiter:
+    """
+    The shared Redis limiter when `[redis] enabled = true` in config.ini, otherwise a local one.
+    """
+    if redis_settings()["enabled"]:
+        return RedisTokenBucketRateLimiter(redis_client())
+    return TokenBucketRateLimiter()
+
+
+def build_circuit_breaker(name: str, limiter: TokenBucketRateLimiter, failure_threshold=5,
+                          recovery_timeout=60) -> CircuitBreaker:
+    """
+    A breaker shared through Redis when the limiter is, refreshed alongside `limiter` checks on `name`.
+    """
+    if isinstance(limiter, RedisTokenBucketRateLimiter):
+        breaker = RedisCircuitBreaker(name, limiter.client, failure_threshold=failure_threshold,
+                                      recovery_timeout=recovery_timeout, prefix=limiter.prefix)
+        limiter.attach_breaker(name, breaker)
+        return breaker
+    return CircuitBreaker(failure_threshold=failure_threshold, recovery_timeout=recovery_timeout)
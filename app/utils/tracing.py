@@ -0,0 +1,311 @@
+"""
+Sampled tracing of the sync pipeline: poller → rules → queue → rate limiter → CRM.
+
+Spans nest through a contextvar, so any code awaited inside a span (including tasks it
+creates) becomes a child. The sampling decision is made once per trace at its root span;
+an unsampled trace costs a contextvar lookup per span and exports nothing.
+
+    with tracer.span("crm.push", crm="salesforce", customer="acme", records=len(batch)):
+        ...
+
+Exporters are configured in the [tracing] section of config.ini:
+
+- json:    one JSON object per finished span, appended to `json_path`
+- otel:    re-emits spans through the OpenTelemetry API (requires opentelemetry-api)
+- summary: in-process count / total / max per customer and span name, served by
+           GET /v1/sync/traces/summary to find the slowest stage per customer
+"""
+import json
+import os
+import random
+import time
+from contextvars import ContextVar
+from threading import Lock
+from typing import Dict, List, Optional
+from app.core.config import ConfigManager
+from app.core.constants import DEFAULT_TRACE_SAMPLE_RATE, DEFAULT_TRACE_JSON_PATH, DEFAULT_TRACE_FLUSH_SPANS
+from app.core.logger import logger
+
+
+class Span:
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "customer", "attributes",
+                 "start_ns", "end_ns", "error", "token")
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"], attributes: dict):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else random.getrandbits(128)
+        self.span_id = random.getrandbits(64)
+        self.parent_id = parent.span_id if parent else None
+        # spans inherit the customer so every stage can be attributed to one
+        self.customer = attributes.get("customer") or (parent.customer if parent else None)
+        self.attributes = attributes
+        self.start_ns = 0
+        self.end_ns = 0
+        self.error: Optional[str] = None
+        self.token = None
+
+    @property
+    def sampled(self) -> bool:
+        return True
+
+    @property
+    def duration(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self.start_ns = time.time_ns()
+        self.token = _current.set(self)
+        self.tracer.started(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current.reset(self.token)
+        self.tracer.finished(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": f"{self.trace_id:032x}",
+            "span_id": f"{self.span_id:016x}",
+            "parent_id": f"{self.parent_id:016x}" if self.parent_id is not None else None,
+            "customer": self.customer,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _Unsampled:
+    """
+    Stands in for every span of an unsampled trace; as a root it marks the trace as unsampled
+    so its children do not roll the dice again.
+    """
+
+    __slots__ = ("root", "token")
+
+    def __init__(self, root: bool):
+        self.root = root
+        self.token = None
+
+    sampled = False
+    customer = None
+
+    def set(self, key: str, value):
+        pass
+
+    def __enter__(self):
+        if self.root:
+            self.token = _current.set(_UNSAMPLED)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.root:
+            _current.reset(self.token)
+
+
+_UNSAMPLED = _Unsampled(root=False)
+_current: ContextVar = ContextVar("sync_trace_span", default=None)
+
+
+def current_span():
+    return _current.get()
+
+
+class Exporter:
+    def on_start(self, span: Span):
+        pass
+
+    def on_end(self, span: Span):
+        pass
+
+    def flush(self):
+        pass
+
+
+class JsonExporter(Exporter):
+    """
+    Appends finished spans as JSON lines, written out every `flush_spans` spans.
+    """
+
+    def __init__(self, path: str = DEFAULT_TRACE_JSON_PATH, flush_spans: int = DEFAULT_TRACE_FLUSH_SPANS):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.flush_spans = flush_spans
+        self.pending: List[str] = []
+        self.lock = Lock()
+
+    def on_end(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self.lock:
+            self.pending.append(line)
+            if len(self.pending) < self.flush_spans:
+                return
+            lines, self.pending = self.pending, []
+        self._write(lines)
+
+    def flush(self):
+        with self.lock:
+            lines, self.pending = self.pending, []
+        self._write(lines)
+
+    def _write(self, lines: List[str]):
+        if lines:
+            with open(self.path, "a") as f:
+                f.write("\n".join(lines) + "\n")
+
+
+class OTelExporter(Exporter):
+    """
+    Mirrors spans into OpenTelemetry, keeping our parent/child links, so any OTel SDK
+    exporter (OTLP, Jaeger, ...) configured by the process receives them.
+    """
+
+    def __init__(self, tracer_provider=None):
+        try:
+            from opentelemetry import trace
+        except ImportError as e:
+            raise RuntimeError("The otel trace exporter requires the opentelemetry-api package") from e
+        self.trace = trace
+        self.tracer = trace.get_tracer("record-sync", tracer_provider=tracer_provider)
+        self.spans: Dict[int, object] = {}
+
+    def on_start(self, span: Span):
+        parent = self.spans.get(span.parent_id)
+        context = self.trace.set_span_in_context(parent) if parent is not None else None
+        self.spans[span.span_id] = self.tracer.start_span(span.name, context=context, start_time=span.start_ns)
+
+    def on_end(self, span: Span):
+        otel_span = self.spans.pop(span.span_id, None)
+        if otel_span is None:
+            otel_span = self.tracer.start_span(span.name, start_time=span.start_ns)
+        for key, value in span.attributes.items():
+            if isinstance(value, (str, bool, int, float)):
+                otel_span.set_attribute(key, value)
+        if span.customer:
+            otel_span.set_attribute("customer", span.customer)
+        if span.error:
+            otel_span.set_status(self.trace.Status(self.trace.StatusCode.ERROR, span.error))
+        otel_span.end(end_time=span.end_ns)
+
+
+class StageSummaryExporter(Exporter):
+    """
+    Running count / total / max duration per (customer, span name).
+    """
+
+    def __init__(self):
+        self.stages: Dict[tuple, list] = {}
+        self.lock = Lock()
+
+    def on_end(self, span: Span):
+        key = (span.customer or "default", span.name)
+        duration = span.duration
+        with self.lock:
+            stage = self.stages.get(key)
+            if stage is None:
+                self.stages[key] = [1, duration, duration]
+            else:
+                stage[0] += 1
+                stage[1] += duration
+                stage[2] = max(stage[2], duration)
+
+    def summary(self) -> Dict[str, dict]:
+        """
+        Per customer: every stage's count, total and mean/max seconds, plus the slowest stage by total time.
+        """
+        with self.lock:
+            stages = {key: list(value) for key, value in self.stages.items()}
+        customers: Dict[str, dict] = {}
+        for (customer, name), (count, total, longest) in stages.items():
+            entry = customers.setdefault(customer, {"stages": {}, "slowest": None})
+            entry["stages"][name] = {"count": count, "total_s": total, "mean_s": total / count, "max_s": longest}
+        for entry in customers.values():
+            entry["slowest"] = max(entry["stages"], key=lambda name: entry["stages"][name]["total_s"])
+        return customers
+
+    def reset(self):
+        with self.lock:
+            self.stages.clear()
+
+
+class Tracer:
+    def __init__(self, sample_rate: float = 0.0, exporters: Optional[List[Exporter]] = None):
+        self.sample_rate = sample_rate
+        self.exporters: List[Exporter] = list(exporters or [])
+
+    def span(self, name: str, **attributes):
+        parent = _current.get()
+        if parent is None:
+            if not self.exporters or random.random() >= self.sample_rate:
+                return _Unsampled(root=True)
+            return Span(self, name, None, attributes)
+        if not parent.sampled:
+            return _UNSAMPLED
+        return Span(self, name, parent, attributes)
+
+    def record(self, name: str, parent, start_ns: int, end_ns: int, **attributes):
+        """
+        Exports a span that already happened, e.g. the time a record spent queued.
+        """
+        if parent is None or not parent.sampled:
+            return
+        span = Span(self, name, parent, attributes)
+        span.start_ns, span.end_ns = start_ns, end_ns
+        self.started(span)
+        self.finished(span)
+
+    def started(self, span: Span):
+        for exporter in self.exporters:
+            try:
+                exporter.on_start(span)
+            except Exception as e:
+                logger.warning(f"[Tracing] {type(exporter).__name__} failed on span start: {e}")
+
+    def finished(self, span: Span):
+        for exporter in self.exporters:
+            try:
+                exporter.on_end(span)
+            except Exception as e:
+                logger.warning(f"[Tracing] {type(exporter).__name__} failed on span end: {e}")
+
+    def exporter(self, kind: type) -> Optional[Exporter]:
+        return next((exporter for exporter in self.exporters if isinstance(exporter, kind)), None)
+
+    def flush(self):
+        for exporter in self.exporters:
+            exporter.flush()
+
+
+def build_tracer() -> Tracer:
+    """
+    A tracer from the [tracing] section of config.ini; without `enabled = true` nothing is sampled.
+    """
+    config = ConfigManager.get_instance()
+    if config.get("tracing", "enabled", fallback="false").lower() != "true":
+        return Tracer()
+    exporters: List[Exporter] = []
+    for kind in config.get("tracing", "exporters", fallback="summary").split(","):
+        kind = kind.strip()
+        if kind == "json":
+            exporters.append(JsonExporter(config.get("tracing", "json_path", fallback=DEFAULT_TRACE_JSON_PATH)))
+        elif kind == "otel":
+            exporters.append(OTelExporter())
+        elif kind == "summary":
+            exporters.append(StageSummaryExporter())
+        elif kind:
+            raise ValueError(f"Unsupported trace exporter: {kind}")
+    sample_rate = float(config.get("tracing", "sample_rate", fallback=DEFAULT_TRACE_SAMPLE_RATE))
+    logger.info(f"[Tracing] Sampling {sample_rate:.2%} of traces to {[type(e).__name__ for e in exporters]}")
+    return Tracer(sample_rate, exporters)
+
+
+tracer = build_tracer()
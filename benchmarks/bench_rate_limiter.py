@@ -0,0 +1,36 @@
+"""
+Per-call cost of TokenBucketRateLimiter.allow across many keys.
+
+    python -m benchmarks.bench_rate_limiter [--keys 10000] [--calls 1000000]
+"""
+import argparse
+import random
+import time
+from app.utils.rate_limiter import TokenBucketRateLimiter
+
+
+def bench_allow(keys: int, calls: int) -> float:
+    limiter = TokenBucketRateLimiter(max_requests=100, window=1)
+    names = [f"customer{i}:salesforce" for i in range(keys)]
+    for name in names:
+        limiter.allow(name)  # create the buckets up front
+    sequence = [random.choice(names) for _ in range(calls)]
+
+    start = time.perf_counter()
+    for name in sequence:
+        limiter.allow(name)
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=10_000)
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    per_call = bench_allow(args.keys, args.calls)
+    print(f"allow(): {per_call * 1e9:.0f} ns/call over {args.keys} keys ({args.calls} calls)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Synthetic record fixtures for the benchmark suite, generated once per size and reused.
+
+    python -m benchmarks.fixtures --records 1000000 [--workdir benchmarks/.fixtures]
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import time
+from itertools import islice
+from typing import Dict, Iterator
+
+COLUMNS = ("record_id", "name", "email", "status", "region", "score", "updated_at")
+REGIONS = ("emea", "apac", "amer", "latam")
+CHUNK = 50_000
+
+# keeps about 90% of the records (status = active), maps every column through unchanged
+RULES = {
+    "filters": {"status": "active"},
+    "mappings": {column: column for column in COLUMNS},
+}
+
+
+def make_record(i: int, rng: random.Random) -> Dict:
+    return {
+        "record_id": f"r{i:09d}",
+        "name": f"User {i}",
+        "email": f"user{i}@example.com",
+        "status": "inactive" if rng.random() < 0.1 else "active",
+        "region": REGIONS[i % len(REGIONS)],
+        "score": rng.randrange(1000),
+        "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(1_700_000_000 + i)),
+    }
+
+
+def iter_records(count: int, seed: int = 42) -> Iterator[Dict]:
+    rng = random.Random(seed)
+    return (make_record(i, rng) for i in range(count))
+
+
+def write_sqlite(path: str, count: int, table: str = "users"):
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    db = sqlite3.connect(tmp_path)
+    db.execute("PRAGMA journal_mode=OFF")
+    db.execute("PRAGMA synchronous=OFF")
+    db.execute(f"CREATE TABLE {table} (record_id TEXT PRIMARY KEY, name TEXT, email TEXT, status TEXT, "
+               f"region TEXT, score INTEGER, updated_at TEXT)")
+    insert = f"INSERT INTO {table} VALUES ({', '.join('?' * len(COLUMNS))})"
+    records = iter_records(count)
+    while True:
+        chunk = [tuple(record[column] for column in COLUMNS) for record in islice(records, CHUNK)]
+        if not chunk:
+            break
+        db.executemany(insert, chunk)
+    db.commit()
+    db.close()
+    os.replace(tmp_path, path)
+
+
+def write_jsonl(path: str, count: int):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", buffering=1024 * 1024) as f:
+        for record in iter_records(count):
+            f.write(json.dumps(record) + "\n")
+    os.replace(tmp_path, path)
+
+
+def ensure_fixtures(workdir: str, count: int) -> Dict[str, str]:
+    """
+    Paths of the SQLite and JSONL fixtures holding `count` records, generated if missing.
+    """
+    directory = os.path.join(workdir, str(count))
+    os.makedirs(directory, exist_ok=True)
+    paths = {
+        "sqlite": os.path.join(directory, "users.sqlite"),
+        "jsonl": os.path.join(directory, "source.jsonl"),
+        "rules": os.path.join(directory, "rules.json"),
+    }
+    if not os.path.exists(paths["sqlite"]):
+        write_sqlite(paths["sqlite"], count)
+    if not os.path.exists(paths["jsonl"]):
+        write_jsonl(paths["jsonl"], count)
+    with open(paths["rules"], "w") as f:
+        json.dump(RULES, f)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=10_000)
+    parser.add_argument("--workdir", default=os.path.join("benchmarks", ".fixtures"))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    paths = ensure_fixtures(args.workdir, args.records)
+    print(f"{args.records} records ready in {time.perf_counter() - start:.1f}s: {paths}")
+
+
+if __name__ == "__main__":
+    main()
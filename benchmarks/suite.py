@@ -0,0 +1,420 @@
+"""
+End-to-end and micro benchmarks for the sync pipeline, with results written as JSON.
+
+Every source/sink pair found in sync_config*.json is driven through the real loader,
+its poller (one poll_once() at a time) and, for file sources, SyncOrchestrator. Micro
+benchmarks cover RulesEngine, DedupIndex, QueueManager, TokenBucketRateLimiter and
+CircuitBreaker.
+Each scenario runs in a fresh interpreter, so its peak RSS is its own.
+
+    python -m benchmarks.suite [--records 10000] [--only e2e] [--baseline benchmarks/baseline.json]
+    python -m benchmarks.suite --records 1000000 --save-baseline
+
+Fixtures (10k to 10M records) are cached under --workdir. File paths are benchmarked in
+their JSONL form: legacy JSON-array files are re-read / rewritten in full on every write.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from benchmarks.fixtures import ensure_fixtures
+
+DEFAULT_OUTPUT = os.path.join("benchmarks", "results", "latest.json")
+DEFAULT_BASELINE = os.path.join("benchmarks", "baseline.json")
+DEFAULT_WORKDIR = os.path.join("benchmarks", ".fixtures")
+RUNNABLE_SOURCES = ("sqlite_source", "file_source")
+RUNNABLE_SINKS = ("file_sink",)
+
+
+class Measurement:
+    """
+    Records processed plus per-unit latencies (a record, a call, a poll or a batch).
+    """
+
+    def __init__(self, unit: str):
+        self.unit = unit
+        self.records = 0
+        self.latencies: List[float] = []
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+
+    def stop(self) -> "Measurement":
+        self.elapsed = time.perf_counter() - self.start
+        return self
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def result(self) -> dict:
+        p50, p99 = self.percentile(0.5), self.percentile(0.99)
+        return {
+            "records": self.records,
+            "seconds": round(self.elapsed, 4),
+            "throughput": round(self.records / self.elapsed, 1) if self.elapsed else None,
+            "latency_unit": self.unit,
+            "p50_ms": round(p50 * 1e3, 4) if p50 is not None else None,
+            "p99_ms": round(p99 * 1e3, 4) if p99 is not None else None,
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+# ---------- end-to-end ----------
+
+def discover_pipelines(pattern: str = "sync_config*.json") -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    One scenario per distinct (source type, sink type) pair: {name: config path}, plus {name: skip reason}.
+    """
+    pipelines, skipped = {}, {}
+    for path in sorted(glob.glob(pattern)):
+        with open(path) as f:
+            conf = json.load(f)
+        a_type, b_type = conf["system_a"]["type"], conf["system_b"]["type"]
+        name = f"e2e.{a_type}.{b_type}"
+        if name in pipelines or name in skipped:
+            continue
+        if a_type not in RUNNABLE_SOURCES:
+            skipped[name] = f"{path}: {a_type} needs an external database"
+        elif b_type not in RUNNABLE_SINKS:
+            skipped[name] = f"{path}: {b_type} pushes to a remote CRM"
+        else:
+            pipelines[name] = path
+    return pipelines, skipped
+
+
+def bench_config(config_path: str, fixtures: Dict[str, str], outdir: str, poll_size: int) -> str:
+    """
+    Rewrites a sync config to read the fixtures and write into `outdir`; returns the new config path.
+    """
+    with open(config_path) as f:
+        conf = json.load(f)
+    source, sink = conf["system_a"], conf["system_b"]
+    if source["type"] == "sqlite_source":
+        source.update(db_path=fixtures["sqlite"], table="users", watermark_column="rowid",
+                      max_rows_per_poll=poll_size)
+    else:
+        source.update(path=fixtures["jsonl"], format="jsonl", max_records_per_poll=poll_size)
+    sink.update(path=os.path.join(outdir, "sink.jsonl"), format="jsonl")
+    path = os.path.join(outdir, os.path.basename(config_path))
+    with open(path, "w") as f:
+        json.dump(conf, f)
+    return path
+
+
+async def run_poller(config_path: str, fixtures: Dict[str, str], args) -> Measurement:
+    from app.core.loader import load_systems_from_config
+    from app.services.pollers.file_poller import FilePoller
+    from app.services.pollers.sqlite_poller import SQLitePoller
+
+    outdir = tempfile.mkdtemp(prefix="bench-")
+    try:
+        source, sink = load_systems_from_config(bench_config(config_path, fixtures, outdir, args.poll_size))
+        poller_cls = SQLitePoller if type(source).__name__ == "SQLiteSource" else FilePoller
+        poller = poller_cls(source, sink, rules_path=fixtures["rules"])
+        measurement = Measurement("poll")
+        while True:
+            start = time.perf_counter()
+            read = await poller.poll_once()
+            if not read:
+                break
+            measurement.latencies.append(time.perf_counter() - start)
+            measurement.records += read
+        measurement.stop()
+        if hasattr(sink, "close"):
+            await sink.close()
+        return measurement
+    finally:
+        shutil.rmtree(outdir, ignore_errors=True)
+
+
+async def run_orchestrator(fixtures: Dict[str, str], args) -> Measurement:
+    from app.services.orchestrator import SyncOrchestrator
+    from app.services.rules_engine import RulesEngine
+    from app.systems.file import FileSink, FileSource
+
+    outdir = tempfile.mkdtemp(prefix="bench-")
+    try:
+        sink = FileSink(os.path.join(outdir, "sink.jsonl"))
+        orchestrator = SyncOrchestrator(FileSource(fixtures["jsonl"]), sink, RulesEngine(fixtures["rules"]))
+        measurement = Measurement("sync_all")
+        start = time.perf_counter()
+        await orchestrator.sync_all()
+        measurement.latencies.append(time.perf_counter() - start)
+        measurement.records = args.records
+        await sink.close()
+        return measurement.stop()
+    finally:
+        shutil.rmtree(outdir, ignore_errors=True)
+
+
+# ---------- micro ----------
+
+def timed(measurement: Measurement, calls, op: Callable):
+    latencies = measurement.latencies
+    clock = time.perf_counter
+    for call in calls:
+        start = clock()
+        op(call)
+        latencies.append(clock() - start)
+    measurement.records += len(latencies)
+
+
+async def micro_rules_engine(fixtures, args) -> Measurement:
+    from app.services.rules_engine import RulesEngine
+    from benchmarks.bench_rules_engine import RULES, make_records
+
+    path = os.path.join(tempfile.mkdtemp(prefix="bench-"), "rules.json")
+    with open(path, "w") as f:
+        json.dump(RULES, f)
+    engine = RulesEngine(path)
+    records = make_records(args.ops)
+    measurement = Measurement("record")
+    timed(measurement, records,
+          lambda record: engine.should_sync("salesforce", record) and engine.match(record)
+          and engine.transform(record))
+    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+    return measurement.stop()
+
+
+async def micro_rules_engine_batch(fixtures, args) -> Measurement:
+    from app.services.rules_engine import RulesEngine
+    from benchmarks.bench_rules_engine import make_records
+
+    engine = RulesEngine(fixtures["rules"])
+    records = make_records(args.ops)
+    batches = [records[start:start + 1000] for start in range(0, len(records), 1000)]
+    measurement = Measurement("batch of 1000")
+    timed(measurement, batches, engine.select_batch)
+    measurement.records = len(records)
+    return measurement.stop()
+
+
+async def micro_dedup_full_scan(fixtures, args) -> Measurement:
+    from app.utils.dedup import DedupIndex
+
+    # a full-scan source re-reading a table whose rows were all synced: every key is a
+    # Bloom filter hit that has to be confirmed
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    path = os.path.join(workdir, "dedup.sqlite")
+    records = [{"record_id": str(i), "name": f"user{i}"} for i in range(args.ops)]
+    index = DedupIndex("bench", path)
+    index.add_records(records)
+    index.close()
+    index = DedupIndex("bench", path)
+    measurement = Measurement("poll")
+    timed(measurement, range(5), lambda _: index.filter_unseen(records))
+    measurement.records = 5 * len(records)
+    measurement.stop()
+    index.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return measurement
+
+
+async def micro_queue(fixtures, args) -> Measurement:
+    from app.services.queue import QueueManager
+
+    queue = QueueManager(maxsize=args.ops + 1, policy="reject", durable_dir="")
+    records = [{"record_id": str(i)} for i in range(args.ops)]
+    measurement = Measurement("record")
+    timed(measurement, records, lambda record: queue.enqueue("salesforce", record))
+    while queue.size("salesforce"):
+        queue.flush("salesforce", 100)
+    return measurement.stop()
+
+
+async def micro_rate_limiter(fixtures, args) -> Measurement:
+    from app.utils.rate_limiter import TokenBucketRateLimiter
+
+    limiter = TokenBucketRateLimiter(max_requests=10 ** 9, window=1)
+    keys = [f"customer{i % 1000}:salesforce" for i in range(args.ops)]
+    measurement = Measurement("call")
+    timed(measurement, keys, limiter.allow)
+    return measurement.stop()
+
+
+async def micro_circuit_breaker(fixtures, args) -> Measurement:
+    from app.utils.circuit_breaker import CircuitBreaker
+
+    breaker = CircuitBreaker()
+
+    def call(_):
+        if breaker.allow_request():
+            breaker.record_success()
+
+    measurement = Measurement("call")
+    timed(measurement, range(args.ops), call)
+    return measurement.stop()
+
+
+MICRO = {
+    "micro.rules_engine": micro_rules_engine,
+    "micro.rules_engine.batch": micro_rules_engine_batch,
+    "micro.dedup.full_scan": micro_dedup_full_scan,
+    "micro.queue.enqueue": micro_queue,
+    "micro.rate_limiter.allow": micro_rate_limiter,
+    "micro.circuit_breaker": micro_circuit_breaker,
+}
+
+
+def scenarios() -> Tuple[Dict[str, Callable], Dict[str, str]]:
+    pipelines, skipped = discover_pipelines()
+    runs: Dict[str, Callable] = {}
+    for name, path in pipelines.items():
+        runs[name] = lambda fixtures, args, path=path: run_poller(path, fixtures, args)
+    runs["orchestrator.file_source.file_sink"] = run_orchestrator
+    runs.update(MICRO)
+    return runs, skipped
+
+
+def run_scenario(name: str, args):
+    """
+    Child side: runs one scenario in this process and writes its result to --result-file.
+    """
+    from app.core.logger import logger
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    runs, _ = scenarios()
+    fixtures = ensure_fixtures(args.workdir, args.records)
+    measurement = asyncio.run(runs[name](fixtures, args))
+    with open(args.result_file, "w") as f:
+        json.dump(measurement.result(), f)
+
+
+def run_isolated(name: str, args) -> dict:
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        result_file = os.path.join(tmp, "result.json")
+        command = [sys.executable, "-m", "benchmarks.suite", "--run", name, "--records", str(args.records),
+                   "--ops", str(args.ops), "--poll-size", str(args.poll_size), "--workdir", args.workdir,
+                   "--result-file", result_file]
+        completed = subprocess.run(command)
+        if completed.returncode != 0:
+            return {"error": f"exited with {completed.returncode}"}
+        with open(result_file) as f:
+            return json.load(f)
+
+
+# ---------- reporting ----------
+
+def metadata(args) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "records": args.records,
+        "ops": args.ops,
+        "poll_size": args.poll_size,
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """
+    Scenarios whose throughput fell, or p99 latency rose, by more than `tolerance` against the baseline.
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before or "error" in result or "error" in before:
+            continue
+        if before.get("throughput") and result["throughput"] < before["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['throughput']:.0f} -> {result['throughput']:.0f}/s")
+        if before.get("p99_ms") and result["p99_ms"] and result["p99_ms"] > before["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {before['p99_ms']:.3f} -> {result['p99_ms']:.3f} ms")
+    return regressions
+
+
+def print_table(results: Dict[str, dict], baseline: Dict[str, dict]):
+    print(f"{'scenario':<40} {'records/s':>12} {'p50 ms':>10} {'p99 ms':>10} {'rss MB':>8} {'vs base':>8}")
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name:<40} {result['error']}")
+            continue
+        before = baseline.get(name, {}).get("throughput")
+        delta = f"{(result['throughput'] / before - 1) * 100:+.1f}%" if before and result["throughput"] else ""
+        print(f"{name:<40} {result['throughput'] or 0:>12.0f} {result['p50_ms'] or 0:>10.3f} "
+              f"{result['p99_ms'] or 0:>10.3f} {result['peak_rss_mb']:>8.1f} {delta:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=10_000, help="fixture size for end-to-end runs")
+    parser.add_argument("--ops", type=int, default=200_000, help="calls per micro benchmark")
+    parser.add_argument("--poll-size", type=int, default=10_000, help="max records read per poll")
+    parser.add_argument("--only", default="", help="run scenarios whose name contains this")
+    parser.add_argument("--list", action="store_true", help="list scenarios and exit")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="fixture cache")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed regression vs the baseline")
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_scenario(args.run, args)
+        return
+
+    runs, skipped = scenarios()
+    names = [name for name in runs if args.only in name]
+    if args.list:
+        print("\n".join(names))
+        for name, reason in skipped.items():
+            print(f"{name} (skipped: {reason})")
+        return
+
+    ensure_fixtures(args.workdir, args.records)
+    results = {}
+    for name in names:
+        print(f"running {name} ...", file=sys.stderr)
+        results[name] = run_isolated(name, args)
+    for name, reason in skipped.items():
+        print(f"skipped {name}: {reason}", file=sys.stderr)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    print_table(results, baseline)
+
+    report = {"meta": metadata(args), "results": results, "skipped": skipped}
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {args.output}")
+    if args.save_baseline:
+        shutil.copyfile(args.output, args.baseline)
+        print(f"baseline saved to {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("regressions against the baseline:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()